@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: query embedding throughput
+Compares one-at-a-time encoding, micro-batched encoding and cached repeats
+for the configured embedding providers. Throughput is reported both per
+wall-clock second and per CPU-second (queries/second per core).
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tools.tacnode_embeddings import EmbeddingService, EmbeddingCache, create_embedding_provider
+
+WORDS = ["revenue", "customer", "churn", "region", "quarterly", "product", "latency",
+         "inventory", "forecast", "support", "ticket", "premium", "growth", "order"]
+
+def make_queries(count: int, distinct: int) -> list:
+    queries = []
+    for i in range(count):
+        n = i % distinct
+        queries.append(" ".join(WORDS[(n * k) % len(WORDS)] for k in range(1, 7)) + f" #{n}")
+    return queries
+
+async def run(service: EmbeddingService, queries: list, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with semaphore:
+            await service.embed(text)
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    await asyncio.gather(*(one(q) for q in queries))
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+
+    return {
+        "qps": len(queries) / wall,
+        "qps_per_core": len(queries) / cpu if cpu else float("inf"),
+        "batches": service.batches
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure query embedding throughput")
+    parser.add_argument("--providers", default=os.getenv("EMBEDDINGS_PROVIDER", "hashing"),
+                        help="Comma-separated: hashing, sentence-transformers, bedrock")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    print("📊 EMBEDDING BENCHMARK: unbatched vs micro-batched vs cached")
+    print("=" * 78)
+    print(f"Queries: {args.queries:,}, concurrency: {args.concurrency}, CPU cores: {os.cpu_count()}")
+
+    rows = []
+    for name in args.providers.split(","):
+        provider = create_embedding_provider(name.strip())
+        queries = make_queries(args.queries, args.queries)
+
+        unbatched = EmbeddingService(provider, EmbeddingCache(max_entries=0), max_batch_size=1, max_wait_ms=0)
+        batched = EmbeddingService(provider, EmbeddingCache(max_entries=args.queries),
+                                   max_batch_size=args.batch_size)
+
+        rows.append((provider.model_id, "unbatched", await run(unbatched, queries, args.concurrency)))
+        rows.append((provider.model_id, "micro-batched", await run(batched, queries, args.concurrency)))
+        # Same queries again: every one is served from the cache
+        rows.append((provider.model_id, "cached repeat", await run(batched, queries, args.concurrency)))
+
+    print()
+    print(f"{'Model':<36} {'Mode':<14} {'QPS':>10} {'QPS/core':>10} {'Batches':>8}")
+    print("-" * 78)
+    for model, mode, r in rows:
+        print(f"{model:<36} {mode:<14} {r['qps']:>10.0f} {r['qps_per_core']:>10.0f} {r['batches']:>8}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
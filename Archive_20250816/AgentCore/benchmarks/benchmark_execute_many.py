@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sequential execute_query vs TacnodeClient.execute_many
+Runs the five-query dashboard from query_tacnode_data.py both ways and
+reports end-to-end latency
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+from aiohttp import web
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tools.tacnode_tools import TacnodeClient
+
+# Same five queries as the dashboard in query_tacnode_data.py
+DASHBOARD_QUERIES = [
+    "SELECT * FROM test ORDER BY created_date DESC",
+    "SELECT category, COUNT(*) as count, AVG(value) as avg_value, SUM(value) as total_value FROM test WHERE is_active = true GROUP BY category ORDER BY total_value DESC",
+    "SELECT name, description, value, category, created_date FROM test WHERE is_active = true AND created_date > CURRENT_DATE - INTERVAL '5 days' ORDER BY created_date DESC",
+    "SELECT name, value, category, is_active FROM test WHERE value > 100 ORDER BY value DESC",
+    "SELECT DATE(created_date) as date, COUNT(*) as records, AVG(value) as avg_value FROM test GROUP BY DATE(created_date) ORDER BY date DESC",
+]
+
+async def start_stub_server(latency_ms: float, batch: bool) -> web.AppRunner:
+    """Start a local HTTP server that mimics the Tacnode query API with fixed latency"""
+
+    async def query(request):
+        await asyncio.sleep(latency_ms / 1000)
+        return web.json_response({
+            "data": [{"ok": 1}],
+            "columns": ["ok"],
+            "row_count": 1,
+            "execution_time_ms": latency_ms
+        })
+
+    async def query_batch(request):
+        payload = await request.json()
+        # A batch still pays one round trip plus a little per-statement work
+        await asyncio.sleep(latency_ms / 1000 + 0.002 * len(payload["queries"]))
+        return web.json_response({
+            "results": [
+                {"data": [{"ok": 1}], "columns": ["ok"], "row_count": 1, "execution_time_ms": 2}
+                for _ in payload["queries"]
+            ]
+        })
+
+    app = web.Application()
+    app.router.add_post("/api/v1/query", query)
+    if batch:
+        app.router.add_post("/api/v1/query/batch", query_batch)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8765).start()
+    return runner
+
+async def time_sequential(client: TacnodeClient) -> float:
+    start = time.perf_counter()
+    for query in DASHBOARD_QUERIES:
+        await client.execute_query(query)
+    return (time.perf_counter() - start) * 1000
+
+async def time_execute_many(client: TacnodeClient, concurrency: int, use_batch: bool) -> float:
+    start = time.perf_counter()
+    results = await client.execute_many(DASHBOARD_QUERIES, concurrency=concurrency, use_batch=use_batch)
+    elapsed = (time.perf_counter() - start) * 1000
+    failed = [r for r in results if not r["success"]]
+    if failed:
+        print(f"   ⚠️  {len(failed)} queries failed: {failed[0]['error']}")
+    return elapsed
+
+async def run_benchmark(endpoint: str, api_key: str, iterations: int, concurrency: int):
+    scenarios = [
+        ("Sequential execute_query", lambda c: time_sequential(c)),
+        (f"execute_many (concurrency={concurrency})", lambda c: time_execute_many(c, concurrency, False)),
+        ("execute_many (batch request)", lambda c: time_execute_many(c, concurrency, True)),
+    ]
+
+    results = {}
+    async with TacnodeClient(endpoint, api_key) as client:
+        # Warm up the connection pool so the first scenario is not penalised
+        await client.execute_query("SELECT 1")
+
+        for name, scenario in scenarios:
+            samples = [await scenario(client) for _ in range(iterations)]
+            results[name] = samples
+
+    baseline = statistics.median(results[scenarios[0][0]])
+    print(f"{'Scenario':<40} {'p50 ms':>10} {'p95 ms':>10} {'speedup':>10}")
+    print("-" * 74)
+    for name, samples in results.items():
+        p50 = statistics.median(samples)
+        p95 = sorted(samples)[int(len(samples) * 0.95) - 1]
+        print(f"{name:<40} {p50:>10.1f} {p95:>10.1f} {baseline / p50:>9.1f}x")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the five-query dashboard")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=40.0,
+                        help="Simulated per-request server latency for the local stub")
+    parser.add_argument("--no-batch", action="store_true",
+                        help="Stub server does not expose the batch endpoint")
+    parser.add_argument("--live", action="store_true",
+                        help="Run against TACNODE_ENDPOINT instead of the local stub")
+    args = parser.parse_args()
+
+    print("📊 DASHBOARD LATENCY BENCHMARK")
+    print("=" * 74)
+
+    runner = None
+    if args.live:
+        endpoint = os.getenv("TACNODE_ENDPOINT", "")
+        api_key = os.getenv("TACNODE_API_KEY", "")
+        if not endpoint or not api_key:
+            print("❌ TACNODE_ENDPOINT and TACNODE_API_KEY must be set for --live")
+            return
+        print(f"Target: {endpoint}")
+    else:
+        runner = await start_stub_server(args.latency_ms, batch=not args.no_batch)
+        endpoint, api_key = "http://127.0.0.1:8765", "benchmark"
+        print(f"Target: local stub ({args.latency_ms:.0f} ms per request, "
+              f"batch endpoint {'disabled' if args.no_batch else 'enabled'})")
+
+    print(f"Queries: {len(DASHBOARD_QUERIES)}, iterations: {args.iterations}")
+    print()
+
+    try:
+        await run_benchmark(endpoint, api_key, args.iterations, args.concurrency)
+    finally:
+        if runner:
+            await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
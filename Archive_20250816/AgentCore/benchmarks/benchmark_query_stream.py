@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak RSS of execute_query vs execute_query_stream on a large scan
+A local stub serves an N-row result set; each client mode runs in its own
+process so peak RSS is measured independently
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+from aiohttp import web
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+PORT = 8766
+ENDPOINT = f"http://127.0.0.1:{PORT}"
+
+def run_stub_server(rows: int):
+    """Serve a `rows`-row query response, generated and written in chunks"""
+
+    async def query(request):
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        await response.write(b'{"columns": ["id", "name", "value", "category"], "data": [')
+
+        chunk = []
+        for i in range(rows):
+            row = {"id": i, "name": f"record_{i}", "value": i * 1.5, "category": f"Category {i % 3 + 1}"}
+            chunk.append(("," if i else "") + json.dumps(row))
+            if len(chunk) == 10000:
+                await response.write("".join(chunk).encode())
+                chunk = []
+        if chunk:
+            await response.write("".join(chunk).encode())
+
+        await response.write(f'], "row_count": {rows}, "execution_time_ms": 0}}'.encode())
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/v1/query", query)
+    web.run_app(app, host="127.0.0.1", port=PORT, print=None)
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def run_client(mode: str, max_rows: int):
+    from tools.tacnode_tools import TacnodeClient
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    row_count = 0
+    total_value = 0.0
+
+    async with TacnodeClient(ENDPOINT, "benchmark") as client:
+        if mode == "materialized":
+            result = await client.execute_query("SELECT * FROM big_table")
+            # What the tool wrapper does with the result
+            payload = json.dumps({"data": result["data"][:max_rows]}, indent=2)
+            for row in result["data"]:
+                row_count += 1
+                total_value += row["value"]
+        else:
+            rows = []
+            async for batch in client.execute_query_stream("SELECT * FROM big_table", batch_size=1000):
+                for row in batch:
+                    row_count += 1
+                    total_value += row["value"]
+                    if len(rows) < max_rows:
+                        rows.append(row)
+            payload = json.dumps({"data": rows}, indent=2)
+
+    print(json.dumps({
+        "mode": mode,
+        "rows": row_count,
+        "seconds": time.perf_counter() - start,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+        "payload_bytes": len(payload)
+    }))
+
+def measure(mode: str, max_rows: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, "--client", mode, "--max-rows", str(max_rows)],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS for streaming vs materialized queries")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--max-rows", type=int, default=100,
+                        help="Rows kept by the simulated tool wrapper")
+    parser.add_argument("--client", choices=["materialized", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        asyncio.run(run_client(args.client, args.max_rows))
+        return
+
+    print("📊 STREAMING QUERY MEMORY BENCHMARK")
+    print("=" * 78)
+    print(f"{'Rows':>10} {'Mode':<14} {'Peak RSS MB':>12} {'Δ vs start MB':>14} {'Seconds':>9} {'Rows/s':>12}")
+    print("-" * 78)
+
+    for rows in args.rows:
+        server = multiprocessing.Process(target=run_stub_server, args=(rows,), daemon=True)
+        server.start()
+        time.sleep(1.0)
+        try:
+            for mode in ("materialized", "stream"):
+                m = measure(mode, args.max_rows)
+                print(f"{m['rows']:>10,} {mode:<14} {m['peak_rss_mb']:>12.1f} "
+                      f"{m['peak_rss_mb'] - m['baseline_rss_mb']:>14.1f} "
+                      f"{m['seconds']:>9.2f} {m['rows'] / m['seconds']:>12,.0f}")
+        finally:
+            server.terminate()
+            server.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark: base-table GROUP BY vs incrementally maintained rollups
+Runs the agent runtime's summary and trend aggregations against a growing
+`bench_rollup` table, once as a full scan and once through the rollup, and
+measures the write overhead the rollup triggers add to inserts.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+import asyncpg
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tools.tacnode_tools import TacnodeClient
+from tools.tacnode_rollups import RollupManager, RollupSpec
+
+TABLE = "bench_rollup"
+
+SPECS = [
+    RollupSpec(name=f"{TABLE}_by_category", table=TABLE, group_by="category",
+               measures=["value"], where="is_active = true"),
+    RollupSpec(name=f"{TABLE}_by_date", table=TABLE, group_by="DATE(created_date)",
+               group_alias="date", measures=["value"], watermark_column="created_date"),
+]
+
+# (label, group_by, aggregate, column, where) as tacnode_aggregation_query would route them
+QUERIES = [
+    ("summary", "category", "SUM", "value", "is_active = true"),
+    ("trend", "DATE(created_date)", "AVG", "value", None),
+]
+
+INSERT_BATCH = """
+INSERT INTO {table} (name, value, category, created_date, is_active)
+SELECT 'record_' || g, (g % 1000) * 1.5, 'Category ' || (g % 20 + 1),
+       NOW() - (g % 720) * INTERVAL '1 hour', g % 5 <> 0
+FROM generate_series($1::int, $2::int) g
+"""
+
+async def create_table(conn):
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE} CASCADE")
+    await conn.execute(f"""
+        CREATE TABLE {TABLE} (
+            id SERIAL PRIMARY KEY,
+            name TEXT,
+            value NUMERIC,
+            category TEXT,
+            created_date TIMESTAMP DEFAULT NOW(),
+            is_active BOOLEAN DEFAULT true
+        )
+    """)
+
+def base_query(group_by: str, function: str, column: str, where) -> str:
+    where_clause = f"WHERE {where}" if where else ""
+    return f"""
+    SELECT {group_by}, {function}({column}) as {function.lower()}_value
+    FROM {TABLE} {where_clause}
+    GROUP BY {group_by}
+    ORDER BY {function}({column}) DESC
+    LIMIT 100
+    """
+
+async def time_query(client: TacnodeClient, sql: str, iterations: int) -> float:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = await client.execute_query(sql)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+    return statistics.median(latencies)
+
+async def time_inserts(conn, start_id: int, batches: int, batch_size: int) -> float:
+    """Median milliseconds per batch INSERT"""
+    latencies = []
+    for b in range(batches):
+        lo = start_id + b * batch_size
+        begin = time.perf_counter()
+        await conn.execute(INSERT_BATCH.format(table=TABLE), lo, lo + batch_size - 1)
+        latencies.append((time.perf_counter() - begin) * 1000)
+    return statistics.median(latencies)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare base-table aggregation with rollups")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", "postgresql://postgres@localhost:5432/postgres"))
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--insert-batch", type=int, default=100)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print("📊 ROLLUP BENCHMARK: base-table GROUP BY vs trigger-maintained rollup")
+    print("=" * 78)
+
+    conn = await asyncpg.connect(args.dsn)
+    client = TacnodeClient("", "", transport="postgres", dsn=args.dsn)
+    rows_loaded = 0
+    read_results = []
+    write_results = []
+
+    try:
+        await create_table(conn)
+        async with client:
+            manager = RollupManager(client, mode="trigger")
+            for spec in SPECS:
+                manager.register(spec)
+
+            for size in sizes:
+                # Grow the table without the triggers; install_all rebuilds the rollups
+                for spec in SPECS:
+                    for suffix in ("_ins", "_upd", "_del"):
+                        await conn.execute(f"DROP TRIGGER IF EXISTS {spec.rollup_table}{suffix} ON {TABLE}")
+                await conn.execute(INSERT_BATCH.format(table=TABLE), rows_loaded + 1, size)
+                rows_loaded = size
+                await conn.execute(f"ANALYZE {TABLE}")
+
+                # Write overhead: plain table first, then with the rollup triggers installed
+                plain = await time_inserts(conn, rows_loaded + 1, 10, args.insert_batch)
+                rows_loaded += 10 * args.insert_batch
+
+                await manager.install_all(rebuild=True)
+                maintained = await time_inserts(conn, rows_loaded + 1, 10, args.insert_batch)
+                rows_loaded += 10 * args.insert_batch
+                write_results.append((size, plain, maintained))
+
+                for label, group_by, function, column, where in QUERIES:
+                    routed_sql, _ = await manager.route(TABLE, group_by, function, column, where)
+                    base_ms = await time_query(client, base_query(group_by, function, column, where), args.iterations)
+                    rollup_ms = await time_query(client, routed_sql, args.iterations)
+                    read_results.append((size, label, base_ms, rollup_ms))
+                print(f"  measured {size:,} rows")
+        await client.close()
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE} CASCADE")
+        await conn.execute(f"DROP TABLE IF EXISTS rollup_{TABLE}_by_category, rollup_{TABLE}_by_date")
+        await conn.close()
+
+    print()
+    print(f"{'Rows':>10} {'Query':<10} {'Base p50 ms':>12} {'Rollup p50 ms':>14} {'Speedup':>9}")
+    print("-" * 78)
+    for size, label, base_ms, rollup_ms in read_results:
+        print(f"{size:>10,} {label:<10} {base_ms:>12.2f} {rollup_ms:>14.2f} {base_ms / rollup_ms:>8.1f}x")
+
+    print()
+    print(f"INSERT of {args.insert_batch} rows (median of 10 batches)")
+    print(f"{'Rows':>10} {'Plain ms':>10} {'With rollups ms':>16} {'Overhead':>10}")
+    print("-" * 78)
+    for size, plain, maintained in write_results:
+        print(f"{size:>10,} {plain:>10.2f} {maintained:>16.2f} {maintained - plain:>+9.2f}ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
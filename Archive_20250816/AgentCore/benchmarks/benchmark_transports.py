@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTTP JSON API vs direct PostgreSQL wire transport
+Both transports run the tool templates against the same local Postgres. The
+HTTP side goes through a minimal JSON query API shim so that only the
+transport differs.
+"""
+
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+import asyncpg
+from aiohttp import web
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tools.tacnode_tools import TacnodeClient, _to_positional
+
+PORT = 8767
+
+# The SQL the tacnode_data_freshness and tacnode_aggregation_query tools generate
+TEMPLATES = {
+    "data_freshness": """
+    SELECT
+        MAX(created_date) as latest_record,
+        MIN(created_date) as earliest_record,
+        COUNT(*) as total_records,
+        COUNT(*) FILTER (WHERE created_date > NOW() - INTERVAL '1 hour') as records_last_hour,
+        COUNT(*) FILTER (WHERE created_date > NOW() - INTERVAL '1 day') as records_last_day
+    FROM bench_test
+    """,
+    "aggregation": """
+    SELECT
+        category,
+        SUM(value) as sum_value
+    FROM bench_test
+    GROUP BY category
+    ORDER BY SUM(value) DESC
+    LIMIT 100
+    """,
+    "point_lookup": "SELECT id, name, value, category FROM bench_test WHERE id = %(id)s",
+}
+
+async def prepare_table(dsn: str, rows: int):
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute("DROP TABLE IF EXISTS bench_test")
+        await conn.execute("""
+            CREATE TABLE bench_test (
+                id SERIAL PRIMARY KEY,
+                name TEXT,
+                value NUMERIC,
+                category TEXT,
+                created_date TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        await conn.execute("""
+            INSERT INTO bench_test (name, value, category, created_date)
+            SELECT 'record_' || g, (g % 1000) * 1.5, 'Category ' || (g % 3 + 1),
+                   NOW() - (g % 240) * INTERVAL '1 hour'
+            FROM generate_series(1, $1) g
+        """, rows)
+        await conn.execute("ANALYZE bench_test")
+    finally:
+        await conn.close()
+
+async def start_http_shim(dsn: str) -> tuple:
+    """JSON query API in front of Postgres, shaped like Tacnode's /api/v1/query"""
+    pool = await asyncpg.create_pool(dsn, min_size=4, max_size=10)
+
+    async def query(request):
+        payload = await request.json()
+        sql, args = _to_positional(payload["query"], payload.get("parameters"))
+        start = time.perf_counter()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(sql, *args)
+        data = [dict(r) for r in rows]
+        return web.json_response({
+            "data": data,
+            "columns": list(data[0].keys()) if data else [],
+            "row_count": len(data),
+            "execution_time_ms": (time.perf_counter() - start) * 1000
+        }, dumps=lambda o: json.dumps(o, default=str))
+
+    app = web.Application()
+    app.router.add_post("/api/v1/query", query)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    return runner, pool
+
+async def measure(client: TacnodeClient, name: str, iterations: int, concurrency: int, rows: int) -> dict:
+    sql = TEMPLATES[name]
+
+    def params(i):
+        return {"id": i % rows + 1} if name == "point_lookup" else None
+
+    # Sequential latency
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        result = await client.execute_query(sql, params(i))
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+
+    # Concurrent throughput
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await client.execute_query(sql, params(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations * 4)))
+    throughput = iterations * 4 / (time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+        "qps": throughput
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare HTTP and wire transports")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", "postgresql://postgres@localhost:5432/postgres"))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print("📊 TRANSPORT BENCHMARK: HTTP JSON API vs PostgreSQL wire")
+    print("=" * 78)
+    print(f"Rows: {args.rows:,}, iterations: {args.iterations}, concurrency: {args.concurrency}")
+
+    await prepare_table(args.dsn, args.rows)
+    runner, shim_pool = await start_http_shim(args.dsn)
+
+    clients = {
+        "http": TacnodeClient(f"http://127.0.0.1:{PORT}", "benchmark"),
+        "postgres": TacnodeClient("", "", transport="postgres", dsn=args.dsn,
+                                  pool_min_size=4, pool_max_size=10),
+    }
+
+    results = {}
+    try:
+        for transport, client in clients.items():
+            async with client:
+                await client.execute_query("SELECT 1")
+                for name in TEMPLATES:
+                    results[(name, transport)] = await measure(
+                        client, name, args.iterations, args.concurrency, args.rows
+                    )
+            await client.close()
+    finally:
+        await runner.cleanup()
+        await shim_pool.close()
+
+    print()
+    print(f"{'Template':<16} {'Transport':<10} {'p50 ms':>9} {'p95 ms':>9} {'QPS':>10} {'p50 speedup':>12}")
+    print("-" * 78)
+    for name in TEMPLATES:
+        http = results[(name, "http")]
+        for transport in clients:
+            r = results[(name, transport)]
+            print(f"{name:<16} {transport:<10} {r['p50']:>9.2f} {r['p95']:>9.2f} "
+                  f"{r['qps']:>10.0f} {http['p50'] / r['p50']:>11.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
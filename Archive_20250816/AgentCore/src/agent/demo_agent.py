@@ -5,15 +5,21 @@ Demonstrates integration of AWS Bedrock AgentCore, Strands SDK, and Tacnode Cont
 """
 
 import os
+import json
+import time
+import uuid
+import hashlib
 import asyncio
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 
 from strands import Agent
 from strands.tools.mcp import MCPClient
 from mcp import stdio_client, StdioServerParameters
 
+from agent.plan_cache import PlanCache, is_replayable
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,6 +33,25 @@ class AgentConfig:
     tacnode_mcp_token: str = os.getenv("TACNODE_MCP_TOKEN", "")
     max_iterations: int = 10
     timeout: int = 300
+    # NL-to-SQL plan cache: recurring questions replay the SQL tool call that answered them
+    plan_cache_enabled: bool = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+    plan_cache_size: int = int(os.getenv("PLAN_CACHE_SIZE", "256"))
+    plan_cache_ttl: int = int(os.getenv("PLAN_CACHE_TTL_SECONDS", "86400"))
+    schema_check_interval: int = int(os.getenv("PLAN_CACHE_SCHEMA_CHECK_SECONDS", "60"))
+    # MCP tool that runs SQL; unset, it is picked from the server's tools (see SQL_TOOL_NAMES)
+    sql_tool_name: Optional[str] = os.getenv("PLAN_CACHE_SQL_TOOL") or None
+    sql_argument: str = "sql"
+
+# SQL tool names of the TACNode MCP servers this agent is used with, in order of preference
+SQL_TOOL_NAMES = ("execute_sql", "query", "executeQuery")
+
+# Fingerprint of every user table's columns; any DDL changes it
+SCHEMA_FINGERPRINT_SQL = """
+SELECT md5(string_agg(table_schema || '.' || table_name || '.' || column_name || ':' || data_type,
+                      ',' ORDER BY table_schema, table_name, ordinal_position)) AS fingerprint
+FROM information_schema.columns
+WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
+"""
 
 class TacnodeAgent:
     """
@@ -36,7 +61,10 @@ class TacnodeAgent:
     def __init__(self, config: AgentConfig):
         self.config = config
         self.agent = None
+        self.answer_agent = None
         self.mcp_client = None
+        self.plan_cache = PlanCache(config.plan_cache_size, config.plan_cache_ttl)
+        self._schema_checked_at = 0.0
         
     async def initialize(self):
         """Initialize the agent with Tacnode MCP tools"""
@@ -59,6 +87,12 @@ class TacnodeAgent:
                 tools = await self.mcp_client.list_tools()
                 logger.info(f"Loaded {len(tools)} tools from Tacnode MCP server")
                 
+                if self.config.plan_cache_enabled and not self.config.sql_tool_name:
+                    self.config.sql_tool_name = self._find_sql_tool(tools)
+                    if not self.config.sql_tool_name:
+                        logger.warning("No SQL tool among the MCP tools; plan cache disabled")
+                        self.config.plan_cache_enabled = False
+                
                 # Create agent with system prompt and tools
                 self.agent = Agent(
                     model=self.config.model_id,
@@ -67,12 +101,43 @@ class TacnodeAgent:
                     max_iterations=self.config.max_iterations
                 )
                 
+                # Plan cache hits only need the results summarized, so no tools
+                self.answer_agent = Agent(
+                    model=self.config.model_id,
+                    system_prompt=self._get_system_prompt(),
+                    tools=[]
+                )
+                
             logger.info("Agent initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize agent: {e}")
             raise
     
+    def _find_sql_tool(self, tools) -> Optional[str]:
+        """The first of SQL_TOOL_NAMES the MCP server offers that takes ``sql_argument``"""
+        arguments = {
+            tool.tool_name: tool.tool_spec.get("inputSchema", {}).get("json", {}).get("properties", {})
+            for tool in tools
+        }
+        return next((name for name in SQL_TOOL_NAMES
+                     if name in arguments and self.config.sql_argument in arguments[name]), None)
+    
+    def _plan_key(self, user_input: str, session_id: Optional[str]) -> tuple:
+        """
+        Plan cache key for ``user_input``.
+
+        A question opening a conversation means the same in any session. A
+        follow-up ("same for last week") depends on the turns before it, so its
+        key also carries the session and a digest of the conversation so far.
+        """
+        if not self.agent.messages:
+            return self.plan_cache.key(user_input)
+        conversation = hashlib.sha256(
+            json.dumps(self.agent.messages, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        return self.plan_cache.key(user_input, {"session": session_id, "conversation": conversation})
+    
     def _get_system_prompt(self) -> str:
         """Get the system prompt for the agent"""
         return """
@@ -122,16 +187,41 @@ class TacnodeAgent:
         try:
             logger.info(f"Processing query: {user_input}")
             
-            # Process the query with the agent
+            plan_status = "disabled"
             async with self.mcp_client:
-                response = await self.agent.arun(user_input)
+                response = None
+                if self.config.plan_cache_enabled:
+                    await self._refresh_schema_version()
+                    key = self._plan_key(user_input, session_id)
+                    plan = self.plan_cache.get(key)
+                    plan_status = "miss"
+                    if plan:
+                        response = await self._answer_from_plan(user_input, plan)
+                        if response is None:
+                            # The cached SQL no longer works; plan from scratch
+                            self.plan_cache.invalidate(key)
+                        else:
+                            plan_status = "hit"
+                            # The exchange belongs to the conversation the next turn builds on
+                            self.agent.messages.extend([
+                                {"role": "user", "content": [{"text": user_input}]},
+                                {"role": "assistant", "content": [{"text": str(response)}]}
+                            ])
+                
+                if response is None:
+                    first_message = len(self.agent.messages)
+                    response = await self.agent.arun(user_input)
+                    if self.config.plan_cache_enabled:
+                        self._record_plan(key, self.agent.messages[first_message:])
                 
             # Extract metadata
             metadata = {
                 "session_id": session_id,
                 "model_used": self.config.model_id,
                 "tools_available": len(await self.mcp_client.list_tools()) if self.mcp_client else 0,
-                "response_length": len(response) if response else 0
+                "response_length": len(response) if response else 0,
+                "plan_cache": plan_status,
+                "plan_cache_stats": self.plan_cache.stats()
             }
             
             logger.info("Query processed successfully")
@@ -150,6 +240,70 @@ class TacnodeAgent:
                 "status": "error"
             }
     
+    async def _call_sql_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """Call a Tacnode MCP tool directly; returns its text output, or None on failure"""
+        result = await self.mcp_client.call_tool_async(
+            tool_use_id=str(uuid.uuid4()), name=tool_name, arguments=arguments
+        )
+        if result.get("status") != "success":
+            return None
+        return "\n".join(item.get("text", "") for item in result.get("content", []))
+    
+    async def _refresh_schema_version(self):
+        """Re-read the schema fingerprint at most every schema_check_interval seconds"""
+        if time.monotonic() - self._schema_checked_at < self.config.schema_check_interval:
+            return
+        
+        try:
+            fingerprint = await self._call_sql_tool(
+                self.config.sql_tool_name, {self.config.sql_argument: SCHEMA_FINGERPRINT_SQL}
+            )
+        except Exception as e:
+            logger.warning(f"Schema fingerprint check failed: {e}")
+            fingerprint = None
+        
+        if fingerprint is not None:
+            self.plan_cache.set_schema_version(fingerprint)
+            self._schema_checked_at = time.monotonic()
+    
+    async def _answer_from_plan(self, user_input: str, plan) -> Optional[str]:
+        """Run the cached SQL and have the model summarize it in a single turn"""
+        try:
+            data = await self._call_sql_tool(plan.tool_name, plan.arguments)
+        except Exception as e:
+            logger.warning(f"Cached plan failed: {e}")
+            return None
+        if data is None:
+            return None
+        
+        logger.info(f"Plan cache hit, skipped {plan.planning_turns} planning tool calls")
+        self.answer_agent.messages = []
+        return await self.answer_agent.arun(
+            f"{user_input}\n\n"
+            f"This SQL was run against Tacnode Context Lake to answer the question:\n"
+            f"{plan.arguments[self.config.sql_argument]}\n\n"
+            f"Result:\n{data}\n\n"
+            f"Answer the question from this result."
+        )
+    
+    def _record_plan(self, key: tuple, messages: List[Dict[str, Any]]):
+        """Cache the last successful read-only SQL tool call from an agent run"""
+        calls = {}
+        succeeded = []
+        for message in messages:
+            for block in message.get("content", []):
+                if "toolUse" in block and block["toolUse"].get("name") == self.config.sql_tool_name:
+                    calls[block["toolUse"]["toolUseId"]] = block["toolUse"]
+                elif "toolResult" in block and block["toolResult"].get("status") == "success":
+                    succeeded.append(block["toolResult"]["toolUseId"])
+        
+        for tool_use_id in reversed(succeeded):
+            call = calls.get(tool_use_id)
+            sql = call.get("input", {}).get(self.config.sql_argument) if call else None
+            if sql and is_replayable(sql):
+                self.plan_cache.put(key, call["name"], call["input"], planning_turns=len(calls))
+                return
+    
     async def health_check(self) -> Dict[str, Any]:
         """
         Perform a health check of the agent and its dependencies
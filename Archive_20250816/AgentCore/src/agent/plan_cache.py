@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+NL-to-SQL Plan Cache
+Remembers the SQL an agent settled on for a question so recurring questions
+can skip the multi-turn planning loop
+"""
+
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Numbers and quoted strings are parameters; everything else is the question's shape
+_PARAMETER = re.compile(r"'[^']*'|\"[^\"]*\"|\b\d+(?:\.\d+)?\b")
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|CREATE|DROP|ALTER|TRUNCATE|GRANT)\b", re.IGNORECASE)
+
+def normalize_question(question: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Split a question into a normalized template and its parameters.
+
+    "Top 5 products in 'EMEA'?" and "top 5 products in 'EMEA'" give the same
+    key; "Top 10 ..." keeps the same template but different parameters.
+    """
+    parameters = tuple(p.strip("'\"").lower() for p in _PARAMETER.findall(question))
+    template = _PARAMETER.sub(" _param_ ", question.lower())
+    template = re.sub(r"[^\w\s]", " ", template)
+    template = re.sub(r"\s+", " ", template).strip()
+    return template, parameters
+
+def is_replayable(sql: str) -> bool:
+    """Only read-only statements are safe to re-run without the agent deciding to"""
+    return bool(_READ_ONLY.match(sql)) and not _WRITES.search(sql)
+
+@dataclass
+class CachedPlan:
+    """The final SQL tool call that answered a question"""
+    tool_name: str
+    arguments: Dict[str, Any]
+    schema_version: str
+    planning_turns: int = 1
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+class PlanCache:
+    """
+    LRU cache of question -> final SQL tool call, scoped to a schema version.
+
+    Entries recorded under an older schema version are never returned, and
+    ``set_schema_version`` drops everything when the fingerprint changes.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.schema_version: Optional[str] = None
+        self._plans: "OrderedDict[tuple, CachedPlan]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.planning_turns_saved = 0
+
+    @staticmethod
+    def key(question: str, parameters: Optional[Dict[str, Any]] = None) -> tuple:
+        template, question_parameters = normalize_question(question)
+        extra = tuple(sorted((str(k), str(v)) for k, v in (parameters or {}).items()))
+        return template, question_parameters, extra
+
+    def set_schema_version(self, fingerprint: str):
+        """Record the current schema fingerprint, invalidating every plan if it moved"""
+        version = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+        if self.schema_version is not None and version != self.schema_version:
+            logger.info(f"Schema changed ({self.schema_version} -> {version}), dropping {len(self._plans)} cached plans")
+            self.invalidate_all()
+        self.schema_version = version
+
+    def get(self, key: tuple) -> Optional[CachedPlan]:
+        plan = self._plans.get(key)
+        if plan is not None and (
+            plan.schema_version != self.schema_version
+            or time.time() - plan.created_at > self.ttl_seconds
+        ):
+            self.invalidate(key)
+            plan = None
+
+        if plan is None or self.schema_version is None:
+            self.misses += 1
+            return None
+
+        self._plans.move_to_end(key)
+        plan.hits += 1
+        self.hits += 1
+        # A hit still makes one tool call; every other planning call is skipped
+        self.planning_turns_saved += max(plan.planning_turns - 1, 0)
+        return plan
+
+    def put(self, key: tuple, tool_name: str, arguments: Dict[str, Any], planning_turns: int = 1):
+        if self.schema_version is None:
+            return
+        self._plans[key] = CachedPlan(tool_name, dict(arguments), self.schema_version, planning_turns)
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+
+    def invalidate(self, key: tuple):
+        if self._plans.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def invalidate_all(self):
+        self.invalidations += len(self._plans)
+        self._plans.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._plans),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "planning_turns_saved": self.planning_turns_saved,
+            "schema_version": self.schema_version
+        }
@@ -0,0 +1,404 @@
+"""
+Tacnode Change Feed
+Per-table change events used to invalidate agent-side caches precisely
+"""
+
+import re
+import json
+import time
+import asyncio
+import inspect
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, Iterable, Set
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+CHANGE_CHANNEL = "tacnode_changes"
+
+# Wildcard table name: subscribers receive every event, and caches drop everything
+ALL_TABLES = "*"
+
+# Statement-level so a bulk write sends one notification, not one per row
+TRIGGER_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION tacnode_notify_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGE_CHANNEL}', json_build_object(
+        'table', TG_TABLE_NAME,
+        'schema', TG_TABLE_SCHEMA,
+        'operation', TG_OP,
+        'txid', txid_current()
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGER_SQL = """
+CREATE OR REPLACE TRIGGER tacnode_change_notify
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+FOR EACH STATEMENT EXECUTE FUNCTION tacnode_notify_change()
+"""
+
+# Schema changes invalidate everything; event triggers need superuser, so this is optional
+DDL_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION tacnode_notify_ddl() RETURNS event_trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANGE_CHANNEL}', json_build_object(
+        'table', '{ALL_TABLES}', 'operation', 'DDL', 'txid', txid_current()
+    )::text);
+END;
+$$ LANGUAGE plpgsql;
+DROP EVENT TRIGGER IF EXISTS tacnode_ddl_notify;
+CREATE EVENT TRIGGER tacnode_ddl_notify ON ddl_command_end
+EXECUTE FUNCTION tacnode_notify_ddl()
+"""
+
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+def tables_in_query(query: str) -> Set[str]:
+    """Best-effort list of tables a SQL statement reads or writes"""
+    return {name.split(".")[-1].lower() for name in _TABLE_PATTERN.findall(query)}
+
+@dataclass
+class ChangeEvent:
+    """A change to one table (or ALL_TABLES when the feed may have missed events)"""
+    table: str
+    operation: str
+    source: str
+    txid: Optional[int] = None
+    timestamp: float = field(default_factory=time.time)
+
+class ChangeFeed(ABC):
+    """Base change feed: fans change events out to subscribers"""
+
+    def __init__(self):
+        self._subscribers: List[tuple] = []
+        self.events_published = 0
+
+    def subscribe(self, callback: Callable[[ChangeEvent], Any],
+                  tables: Optional[Iterable[str]] = None) -> Callable[[], None]:
+        """
+        Register a callback for change events.
+
+        Args:
+            callback: Sync or async callable receiving a ChangeEvent
+            tables: Only deliver events for these tables (all tables if omitted)
+
+        Returns:
+            Function that removes the subscription
+        """
+        entry = (set(t.lower() for t in tables) if tables else None, callback)
+        self._subscribers.append(entry)
+        return lambda: self._subscribers.remove(entry)
+
+    async def publish(self, event: ChangeEvent):
+        """Deliver an event to every matching subscriber"""
+        self.events_published += 1
+        logger.debug(f"Change event: {event.table} {event.operation} ({event.source})")
+
+        for tables, callback in list(self._subscribers):
+            if tables is not None and event.table != ALL_TABLES and event.table not in tables:
+                continue
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Change subscriber failed for {event.table}: {e}")
+
+    @abstractmethod
+    async def start(self):
+        """Begin delivering change events"""
+
+    @abstractmethod
+    async def stop(self):
+        """Stop delivering change events and release connections"""
+
+class NotifyChangeFeed(ChangeFeed):
+    """Change feed driven by table triggers and PostgreSQL LISTEN/NOTIFY"""
+
+    def __init__(self, dsn: str, channel: str = CHANGE_CHANNEL, reconnect_delay: float = 5.0):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.conn: Optional[asyncpg.Connection] = None
+        self._stopping = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    async def install_triggers(self, tables: Iterable[str], include_ddl: bool = False):
+        """Create the notify trigger on each table (idempotent)"""
+        conn = await asyncpg.connect(self.dsn)
+        try:
+            await conn.execute(TRIGGER_FUNCTION_SQL)
+            for table in tables:
+                await conn.execute(TRIGGER_SQL.format(table=table))
+                logger.info(f"Installed change trigger on {table}")
+
+            if include_ddl:
+                try:
+                    await conn.execute(DDL_TRIGGER_SQL)
+                    logger.info("Installed DDL change event trigger")
+                except asyncpg.InsufficientPrivilegeError:
+                    logger.warning("Skipping DDL event trigger: requires superuser; cached schema info then expires only by TTL")
+        finally:
+            await conn.close()
+
+    async def start(self):
+        """Connect and LISTEN on the change channel"""
+        self._stopping = False
+        self.conn = await asyncpg.connect(self.dsn)
+        self.conn.add_termination_listener(self._on_terminated)
+        await self.conn.add_listener(self.channel, self._on_notify)
+        logger.info(f"Listening for Tacnode changes on '{self.channel}'")
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self.conn and not self.conn.is_closed():
+            await self.conn.remove_listener(self.channel, self._on_notify)
+            await self.conn.close()
+        self.conn = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring malformed change notification: {payload}")
+            return
+
+        event = ChangeEvent(
+            table=str(data.get("table", ALL_TABLES)).lower(),
+            operation=data.get("operation", "UNKNOWN"),
+            source="notify",
+            txid=data.get("txid")
+        )
+        asyncio.get_running_loop().create_task(self.publish(event))
+
+    def _on_terminated(self, connection):
+        if self._stopping:
+            return
+        logger.warning("Change feed connection lost, reconnecting")
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._stopping:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self.start()
+            except Exception as e:
+                logger.warning(f"Change feed reconnect failed: {e}")
+                continue
+
+            # Notifications sent while disconnected are lost, so everything may be stale
+            await self.publish(ChangeEvent(table=ALL_TABLES, operation="RESYNC", source="notify"))
+            return
+
+class PollingChangeFeed(ChangeFeed):
+    """
+    Change feed for HTTP-only setups: polls a per-table watermark.
+
+    A table's watermark is its insert/update/delete counters from
+    ``pg_stat_user_tables``, its relfilenode (moved by TRUNCATE) and a
+    fingerprint of its columns, so writes and ALTER TABLE both move it without
+    scanning the table. Creating or dropping a table changes a fingerprint of
+    the schema's table list, which is reported as a change to ALL_TABLES.
+    A backend that goes idle after a write flushes its statistics up to ten
+    seconds later, so a change can take that long plus ``interval`` to be
+    reported; the notify feed reports it at commit.
+    """
+
+    def __init__(self, client, tables: Iterable[str], interval: float = 5.0, owns_client: bool = False):
+        """
+        Args:
+            client: TacnodeClient used for polling
+            tables: Names of the tables to watch
+            interval: Seconds between polls
+            owns_client: Enter ``client`` on start and exit it on stop; otherwise
+                it must already be inside an open ``async with``
+        """
+        super().__init__()
+        self.client = client
+        self.tables = [name.lower() for name in tables]
+        self.interval = interval
+        self.owns_client = owns_client
+        self.watermarks: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _watermark_query(self) -> str:
+        names = ", ".join("'" + name.replace("'", "''") + "'" for name in self.tables)
+        return f"""
+        SELECT c.relname AS table_name, c.relfilenode::bigint AS relfilenode,
+               s.n_tup_ins, s.n_tup_upd, s.n_tup_del,
+               (SELECT md5(string_agg(a.attname || ':' || format_type(a.atttypid, a.atttypmod) || ':' ||
+                                      a.attnotnull::text || ':' || COALESCE(pg_get_expr(d.adbin, d.adrelid), ''),
+                                      ',' ORDER BY a.attnum))
+                FROM pg_attribute a
+                LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+                WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped) AS columns
+        FROM pg_class c
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE c.relname IN ({names}) AND pg_table_is_visible(c.oid)
+        UNION ALL
+        SELECT '{ALL_TABLES}', NULL, NULL, NULL, NULL,
+               md5(string_agg(relname || ':' || relkind::text, ',' ORDER BY relname))
+        FROM pg_class
+        WHERE relnamespace = 'public'::regnamespace AND relkind IN ('r', 'p', 'v', 'm', 'f')
+        """
+
+    async def poll_once(self) -> List[ChangeEvent]:
+        """Check every table's watermark and publish an event for each one that moved"""
+        result = await self.client.execute_query(self._watermark_query())
+        if not result["success"]:
+            logger.warning(f"Watermark poll failed: {result.get('error')}")
+            return []
+
+        rows = {row["table_name"]: row for row in result["data"]}
+        events = []
+        for name in [ALL_TABLES] + self.tables:
+            # A dropped table has no row; that moves its watermark too
+            row = rows.get(name)
+            watermark = tuple(sorted((k, str(v)) for k, v in row.items())) if row else None
+            previous = self.watermarks.get(name, "unset")
+            self.watermarks[name] = watermark
+
+            # The first poll only establishes the baseline
+            if previous != "unset" and previous != watermark:
+                operation = "DDL" if name == ALL_TABLES else "CHANGED"
+                events.append(ChangeEvent(table=name, operation=operation, source="poll"))
+
+        for event in events:
+            await self.publish(event)
+        return events
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Change poll failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            if self.owns_client:
+                await self.client.__aenter__()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Polling {len(self.tables)} tables for changes every {self.interval}s")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            if self.owns_client:
+                await self.client.__aexit__(None, None, None)
+                await self.client.close()
+
+class TableCache:
+    """
+    LRU cache whose entries are tagged with the tables they were derived from.
+
+    Entries can live for a long TTL because a subscribed ChangeFeed evicts
+    exactly the entries that depend on a changed table. A change that arrives
+    while a result is being computed has nothing to evict yet, so callers take
+    ``generation(tables)`` before running the query and pass it to ``set``,
+    which drops the result if one of those tables changed in the meantime.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._by_table: Dict[str, Set[Any]] = {}
+        # Invalidations per table, and in total (what ALL_TABLES entries depend on)
+        self._generations: Dict[str, int] = {}
+        self._changes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def generation(self, tables: Iterable[str]) -> tuple:
+        """Snapshot of the invalidation counters an entry derived from ``tables`` depends on"""
+        tables = set(t.lower() for t in tables) or {ALL_TABLES}
+        if ALL_TABLES in tables:
+            return (self._changes,)
+        return (self._generations.get(ALL_TABLES, 0),) + tuple(self._generations.get(t, 0) for t in sorted(tables))
+
+    def set(self, key: Any, value: Any, tables: Iterable[str], generation: Optional[tuple] = None):
+        """Store ``value``; skipped when ``generation`` (taken before computing it) is outdated"""
+        tables = set(t.lower() for t in tables) or {ALL_TABLES}
+        if generation is not None and generation != self.generation(tables):
+            return
+        self._remove(key)
+        self._entries[key] = (value, time.monotonic(), tables)
+        for table in tables:
+            self._by_table.setdefault(table, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_table(self, table: str) -> int:
+        """Drop every entry derived from ``table`` (everything for ALL_TABLES)"""
+        table = table.lower()
+        self._generations[table] = self._generations.get(table, 0) + 1
+        self._changes += 1
+        if table == ALL_TABLES:
+            keys = list(self._entries)
+        else:
+            keys = list(self._by_table.get(table, ())) + list(self._by_table.get(ALL_TABLES, ()))
+
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def on_change(self, event: ChangeEvent):
+        """ChangeFeed subscriber callback"""
+        removed = self.invalidate_table(event.table)
+        if removed:
+            logger.info(f"Invalidated {removed} cached results after {event.operation} on {event.table}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+    def _remove(self, key: Any):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry[2]:
+            keys = self._by_table.get(table)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
@@ -0,0 +1,315 @@
+"""
+Tacnode Embeddings
+Pluggable embedding providers with micro-batching and a content-hash embedding cache
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingProvider(ABC):
+    """Base provider: turns a batch of texts into float32 vectors"""
+
+    model_id: str = "unknown"
+    dimension: int = 0
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking batch encode; returns an array of shape (len(texts), dimension)"""
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        # Model inference is CPU/network bound, so keep it off the event loop
+        return await asyncio.to_thread(self.encode, texts)
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Deterministic feature-hashing embedder for offline runs and tests.
+
+    Tokens and token bigrams are hashed into signed buckets and the result is
+    L2-normalized, so texts sharing words land close together without any model.
+    """
+
+    def __init__(self, dimension: int = 1536):
+        self.dimension = dimension
+        self.model_id = f"hashing-{dimension}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = re.findall(r"\w+", text.lower())
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimension
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+class SentenceTransformerEmbedder(EmbeddingProvider):
+    """Local CPU sentence-transformers model (requires the sentence-transformers package)"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu", batch_size: int = 64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "sentence-transformers is required for the local embedding provider: "
+                "pip install sentence-transformers"
+            ) from e
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.model_id = f"sentence-transformers/{model_name}"
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+
+class BedrockTitanEmbedder(EmbeddingProvider):
+    """Amazon Bedrock Titan text embeddings"""
+
+    def __init__(self, model_id: str = "amazon.titan-embed-text-v1",
+                 region_name: Optional[str] = None, max_concurrency: int = 8):
+        import boto3
+
+        self.client = boto3.client(
+            "bedrock-runtime",
+            region_name=region_name or os.getenv("AWS_REGION", "us-east-1")
+        )
+        self.model_id = model_id
+        self.dimension = int(os.getenv("EMBEDDINGS_DIMENSION", "1536"))
+        self.max_concurrency = max_concurrency
+
+    def _invoke(self, text: str) -> List[float]:
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps({"inputText": text}),
+            contentType="application/json",
+            accept="application/json"
+        )
+        return json.loads(response["body"].read())["embedding"]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.array([self._invoke(text) for text in texts], dtype=np.float32)
+
+    async def embed_batch(self, texts: List[str]) -> np.ndarray:
+        # Titan takes one input per request, so a batch becomes bounded parallel calls
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(text):
+            async with semaphore:
+                return await asyncio.to_thread(self._invoke, text)
+
+        return np.array(await asyncio.gather(*(one(t) for t in texts)), dtype=np.float32)
+
+def create_embedding_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Build the provider selected by ``name`` or EMBEDDINGS_PROVIDER.
+
+    Supported providers: ``bedrock`` (default, Titan), ``sentence-transformers``,
+    and ``hashing``, which is only meant for offline runs and tests.
+    """
+    name = (name or os.getenv("EMBEDDINGS_PROVIDER", "bedrock")).lower()
+    model = os.getenv("EMBEDDINGS_MODEL")
+
+    if name == "hashing":
+        logger.warning("EMBEDDINGS_PROVIDER=hashing: vector search matches shared words only, not meaning")
+        return HashingEmbedder(int(os.getenv("EMBEDDINGS_DIMENSION", "1536")))
+    if name in ("sentence-transformers", "local"):
+        return SentenceTransformerEmbedder(model or "all-MiniLM-L6-v2")
+    if name == "bedrock":
+        return BedrockTitanEmbedder(model or "amazon.titan-embed-text-v1")
+    raise ValueError(f"Unsupported embedding provider: {name}. Must be one of bedrock, sentence-transformers, hashing")
+
+class EmbeddingCache:
+    """
+    LRU cache of embeddings keyed by a hash of model id and text.
+
+    With ``path`` set, entries are also written to a SQLite file so repeated
+    queries skip the model across restarts.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db: Optional[sqlite3.Connection] = None
+
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+            self.db.commit()
+
+    @staticmethod
+    def key(model_id: str, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        vector = self._entries.get(key)
+        if vector is None and self.db is not None:
+            row = self.db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(key, vector)
+
+        if vector is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def set_many(self, items: Dict[str, np.ndarray]):
+        for key, vector in items.items():
+            self._remember(key, vector)
+
+        if self.db is not None and items:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self.db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class EmbeddingService:
+    """
+    Front door for query embeddings.
+
+    Cache misses from concurrent callers are queued and flushed as one
+    ``embed_batch`` call once ``max_batch_size`` texts are waiting or
+    ``max_wait_ms`` has passed since the first one arrived.
+    """
+
+    def __init__(self, provider: EmbeddingProvider, cache: Optional[EmbeddingCache] = None,
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.provider = provider
+        self.cache = cache or EmbeddingCache()
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: Dict[str, tuple] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self.batches = 0
+        self.encoded_texts = 0
+        self.encode_time_ms = 0.0
+
+    @property
+    def model_id(self) -> str:
+        return self.provider.model_id
+
+    async def embed(self, text: str) -> List[float]:
+        """Embedding for one text, from the cache or the next micro-batch"""
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.key(self.model_id, text) for text in texts]
+        vectors: Dict[str, Any] = {}
+        waiting = []
+
+        for key, text in zip(keys, texts):
+            if key in vectors:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                waiting.append((key, self._enqueue(key, text)))
+
+        for key, future in waiting:
+            vectors[key] = await future
+
+        return [vectors[key].tolist() for key in keys]
+
+    def _enqueue(self, key: str, text: str) -> asyncio.Future:
+        # Identical in-flight texts share one future
+        if key in self._pending:
+            return self._pending[key][1]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = (text, future)
+
+        if self._flush_task is None or self._flush_task.done():
+            self._batch_ready = asyncio.Event()
+            self._flush_task = loop.create_task(self._flush_after_wait())
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_ready.set()
+        return future
+
+    async def _flush_after_wait(self):
+        try:
+            await asyncio.wait_for(self._batch_ready.wait(), timeout=self.max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+
+        while self._pending:
+            batch = dict(list(self._pending.items())[:self.max_batch_size])
+            for key in batch:
+                del self._pending[key]
+            await self._encode_batch(batch)
+
+    async def _encode_batch(self, batch: Dict[str, tuple]):
+        texts = [text for text, _ in batch.values()]
+        start = time.perf_counter()
+        try:
+            encoded = await self.provider.embed_batch(texts)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.encode_time_ms += (time.perf_counter() - start) * 1000
+        self.batches += 1
+        self.encoded_texts += len(texts)
+
+        results = dict(zip(batch.keys(), encoded))
+        self.cache.set_many(results)
+        for key, (_, future) in batch.items():
+            if not future.done():
+                future.set_result(results[key])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_id": self.model_id,
+            "batches": self.batches,
+            "encoded_texts": self.encoded_texts,
+            "avg_batch_size": self.encoded_texts / self.batches if self.batches else 0.0,
+            "encode_time_ms": self.encode_time_ms,
+            "cache": self.cache.stats()
+        }
@@ -0,0 +1,274 @@
+"""
+Tacnode Query Guard
+Bounds agent-generated SQL before it reaches Tacnode: injects or clamps LIMIT on
+row-returning statements and rejects (or tightens) statements whose EXPLAIN cost
+is above a threshold
+"""
+
+import re
+import json
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+READ_KEYWORDS = ("SELECT", "WITH", "VALUES", "TABLE")
+WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "MERGE", "CREATE", "DROP", "ALTER", "TRUNCATE", "COPY"}
+
+# Statements EXPLAIN can cost; anything else (DDL, DO, SET, EXPLAIN itself) passes through
+GUARDED_KEYWORDS = set(READ_KEYWORDS) | {"INSERT", "UPDATE", "DELETE", "MERGE"}
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+def strip_sql(sql: str) -> str:
+    """Remove surrounding whitespace and trailing semicolons"""
+    return sql.strip().rstrip(";").strip()
+
+def skip_quoted(sql: str, i: int) -> Optional[int]:
+    """Index just past the comment, string literal, quoted identifier or dollar-quoted string at ``i`` (None if there is none)"""
+    ch = sql[i]
+    if sql.startswith("--", i):
+        end = sql.find("\n", i)
+        return len(sql) if end == -1 else end + 1
+    if sql.startswith("/*", i):
+        end = sql.find("*/", i + 2)
+        return len(sql) if end == -1 else end + 2
+    if ch in ("'", '"'):
+        end = sql.find(ch, i + 1)
+        while end != -1 and end + 1 < len(sql) and sql[end + 1] == ch:
+            end = sql.find(ch, end + 2)
+        return len(sql) if end == -1 else end + 1
+    if ch == "$":
+        tag = re.match(r"\$[A-Za-z_0-9]*\$", sql[i:])
+        if tag:
+            end = sql.find(tag.group(0), i + len(tag.group(0)))
+            return len(sql) if end == -1 else end + len(tag.group(0))
+    return None
+
+def top_level_words(sql: str) -> List[Tuple[str, int, int]]:
+    """
+    Upper-cased words outside comments, string literals, quoted identifiers and parentheses.
+
+    Returns:
+        ``(word, start, end)`` tuples in order of appearance
+    """
+    words = []
+    depth = 0
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        skipped = skip_quoted(sql, i)
+        if skipped is not None:
+            i = skipped
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0:
+            match = _WORD.match(sql, i)
+            if match and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+                words.append((match.group(0).upper(), match.start(), match.end()))
+                i = match.end()
+                continue
+        i += 1
+    return words
+
+def is_read_only(sql: str) -> bool:
+    """
+    Whether re-running ``sql`` cannot change data, as far as its text shows.
+
+    A read statement qualifies unless a write keyword appears at any depth
+    (data-modifying CTEs, FOR UPDATE) or it is SELECT ... INTO; side effects of
+    functions it calls are not visible here.
+    """
+    sql = strip_sql(sql)
+    words = top_level_words(sql)
+    if not words or words[0][0] not in READ_KEYWORDS or any(w == "INTO" for w, _, _ in words):
+        return False
+    i = 0
+    while i < len(sql):
+        skipped = skip_quoted(sql, i)
+        if skipped is not None:
+            i = skipped
+            continue
+        match = _WORD.match(sql, i)
+        if match and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+            if match.group(0).upper() in WRITE_KEYWORDS:
+                return False
+            i = match.end()
+            continue
+        i += 1
+    return True
+
+@dataclass
+class GuardDecision:
+    """Outcome of checking one statement"""
+    allowed: bool
+    query: str
+    reason: Optional[str] = None
+    estimated_cost: Optional[float] = None
+    estimated_rows: Optional[float] = None
+    limit_injected: bool = False
+    limit_clamped: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class QueryGuard:
+    """
+    Checks SQL before it is executed.
+
+    Row-returning statements without a top-level LIMIT get ``LIMIT max_rows``
+    and larger limits are clamped to it. Every statement is then costed with a
+    cached ``EXPLAIN``; above ``max_cost`` it is rejected, or in ``rewrite``
+    mode its LIMIT is tightened until the plan fits. The reason is returned so
+    the calling agent can reformulate.
+    """
+
+    def __init__(self, max_rows: int = 1000, max_cost: float = 100000.0,
+                 on_expensive: str = "reject", cache_ttl_seconds: float = 300,
+                 cache_size: int = 512):
+        if on_expensive not in ("reject", "rewrite"):
+            raise ValueError(f"Unsupported on_expensive: {on_expensive}. Must be 'reject' or 'rewrite'")
+        self.max_rows = max_rows
+        self.max_cost = max_cost
+        self.on_expensive = on_expensive
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_size = cache_size
+        self._plans: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.rejected = 0
+        self.rewritten = 0
+
+    def apply_limit(self, sql: str, limit: int) -> Tuple[str, bool, bool]:
+        """
+        Inject or clamp the top-level LIMIT of a read statement.
+
+        Returns:
+            ``(sql, injected, clamped)``
+        """
+        words = top_level_words(sql)
+        if not words or words[0][0] not in READ_KEYWORDS:
+            return sql, False, False
+        # UPDATE in FOR [NO KEY] UPDATE is a locking clause, not a write
+        names = [w for i, (w, _, _) in enumerate(words) if i == 0 or words[i - 1][0] not in ("FOR", "KEY")]
+        # A top-level INTO is SELECT ... INTO new_table, which writes
+        if WRITE_KEYWORDS.intersection(names) or "INTO" in names:
+            return sql, False, False
+
+        for index, (word, _, end) in enumerate(words):
+            if word == "LIMIT":
+                match = re.match(r"\s*(\d+|ALL)\b", sql[end:], re.IGNORECASE)
+                if not match:
+                    # LIMIT $1 / LIMIT %s: bound by the caller, leave it
+                    return sql, False, False
+                value = match.group(1)
+                if value.upper() != "ALL" and int(value) <= limit:
+                    return sql, False, False
+                start = end + match.start(1)
+                return sql[:start] + str(limit) + sql[end + match.end(1):], False, True
+            if word == "FETCH":
+                return sql, False, False
+            # Locking clauses must stay last, so put the LIMIT in front of them
+            if word == "FOR" and index + 1 < len(words) and words[index + 1][0] in ("UPDATE", "SHARE", "NO", "KEY"):
+                position = words[index][1]
+                return f"{sql[:position].rstrip()}\nLIMIT {limit}\n{sql[position:]}", True, False
+
+        # On its own line so a trailing -- comment cannot swallow it
+        return f"{sql}\nLIMIT {limit}", True, False
+
+    async def explain(self, client, sql: str, parameters: Optional[Any] = None) -> Optional[Tuple[float, float]]:
+        """``(total cost, plan rows)`` for ``sql``, cached per statement and parameters"""
+        key = (sql, json.dumps(parameters, sort_keys=True, default=str))
+        cached = self._plans.get(key)
+        if cached and time.monotonic() - cached[1] < self.cache_ttl_seconds:
+            self._plans.move_to_end(key)
+            return cached[0]
+
+        result = await client.execute_query(f"EXPLAIN (FORMAT JSON) {sql}", parameters)
+        if not result["success"] or not result["data"]:
+            logger.warning(f"Query guard could not EXPLAIN statement: {result.get('error')}")
+            return None
+
+        plan = next(iter(result["data"][0].values()))
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = (float(plan[0]["Plan"]["Total Cost"]), float(plan[0]["Plan"]["Plan Rows"]))
+
+        self._plans[key] = (estimate, time.monotonic())
+        while len(self._plans) > self.cache_size:
+            self._plans.popitem(last=False)
+        return estimate
+
+    async def check(self, client, query: str, parameters: Optional[Any] = None,
+                    inject_limit: bool = True) -> GuardDecision:
+        """
+        Decide whether ``query`` may run, and in what form.
+
+        Args:
+            client: Anything with an async ``execute_query(sql, parameters)`` returning
+                ``{"success", "data"}`` (e.g. TacnodeClient, unguarded by default); runs the EXPLAIN
+            query: Statement to check
+            parameters: Statement parameters, needed to EXPLAIN placeholders
+            inject_limit: Add/clamp LIMIT (disabled for streaming reads)
+        """
+        sql = strip_sql(query)
+        words = top_level_words(sql)
+        if not words or words[0][0] not in GUARDED_KEYWORDS:
+            return GuardDecision(True, query)
+
+        injected = clamped = False
+        if inject_limit:
+            sql, injected, clamped = self.apply_limit(sql, self.max_rows)
+
+        estimate = await self.explain(client, sql, parameters)
+        if estimate is None:
+            # EXPLAIN itself failing usually means the statement is invalid; let the server report it
+            return GuardDecision(True, sql, limit_injected=injected, limit_clamped=clamped)
+
+        cost, rows = estimate
+        decision = GuardDecision(True, sql, estimated_cost=cost, estimated_rows=rows,
+                                 limit_injected=injected, limit_clamped=clamped)
+        # Only worth telling the agent when the cap is expected to cut rows off
+        if clamped or (injected and rows >= self.max_rows):
+            decision.reason = f"Result capped at {self.max_rows} rows with LIMIT; filter or aggregate to see the rest"
+            self.rewritten += 1
+
+        if cost <= self.max_cost:
+            return decision
+
+        if self.on_expensive == "rewrite" and inject_limit:
+            limit = self.max_rows
+            while limit > 1:
+                limit //= 10
+                candidate, _, _ = self.apply_limit(sql, max(limit, 1))
+                estimate = await self.explain(client, candidate, parameters)
+                if estimate and estimate[0] <= self.max_cost:
+                    self.rewritten += 1
+                    return GuardDecision(
+                        True, candidate,
+                        reason=(f"Estimated cost {cost:,.0f} exceeds {self.max_cost:,.0f}; "
+                                f"LIMIT reduced to {max(limit, 1)}"),
+                        estimated_cost=estimate[0], estimated_rows=estimate[1],
+                        limit_injected=injected, limit_clamped=True
+                    )
+
+        self.rejected += 1
+        return GuardDecision(
+            False, sql,
+            reason=(f"Query rejected: estimated cost {cost:,.0f} (about {rows:,.0f} rows) exceeds the "
+                    f"limit of {self.max_cost:,.0f}. Add selective WHERE filters, aggregate in SQL, "
+                    f"or query fewer rows."),
+            estimated_cost=cost, estimated_rows=rows,
+            limit_injected=injected, limit_clamped=clamped
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_plans": len(self._plans),
+            "rejected": self.rejected,
+            "rewritten": self.rewritten
+        }
@@ -0,0 +1,337 @@
+"""
+Tacnode Rollups
+Incrementally maintained GROUP BY rollups for common aggregation queries
+"""
+
+import re
+import json
+import hashlib
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Aggregates that stay exact under inserts, updates and deletes. MIN/MAX cannot be
+# decremented when rows go away, so those queries always run against the base table.
+ROLLUP_FUNCTIONS = ("COUNT", "SUM", "AVG")
+
+# Bump when the generated tables or triggers change so existing rollups are rebuilt
+ROLLUP_FORMAT_VERSION = 1
+
+def _normalize(expression: str) -> str:
+    return re.sub(r"\s+", "", expression or "").lower()
+
+@dataclass
+class RollupSpec:
+    """A (table, group_by, measures) combination maintained as a rollup table"""
+    name: str
+    table: str
+    group_by: str
+    measures: List[str]
+    group_alias: Optional[str] = None
+    where: Optional[str] = None
+    watermark_column: Optional[str] = None
+
+    def __post_init__(self):
+        if self.group_alias is None:
+            if not re.fullmatch(r"\w+", self.group_by):
+                raise ValueError(f"group_alias is required for group_by expression '{self.group_by}'")
+            self.group_alias = self.group_by
+
+    @property
+    def rollup_table(self) -> str:
+        return f"rollup_{self.name}"
+
+    @property
+    def state_table(self) -> str:
+        return f"rollup_{self.name}_state"
+
+    def fingerprint(self, mode: str) -> str:
+        """Identifies the definition an installed rollup was built from"""
+        definition = json.dumps([ROLLUP_FORMAT_VERSION, mode, asdict(self)], sort_keys=True)
+        return f"rollup:{hashlib.md5(definition.encode()).hexdigest()}"
+
+    def measure_index(self, column: str) -> Optional[int]:
+        for i, measure in enumerate(self.measures):
+            if _normalize(measure) == _normalize(column):
+                return i
+        return None
+
+# Rollups behind the agent runtime's summary and trend templates on the demo `test` table
+DEFAULT_ROLLUPS = [
+    RollupSpec(
+        name="test_active_by_category",
+        table="test",
+        group_by="category",
+        measures=["value"],
+        where="is_active = true"
+    ),
+    RollupSpec(
+        name="test_by_date",
+        table="test",
+        group_by="DATE(created_date)",
+        group_alias="date",
+        measures=["value"],
+        watermark_column="created_date"
+    ),
+]
+
+class RollupManager:
+    """
+    Registers rollups, keeps them up to date and routes matching aggregations to them.
+
+    In ``trigger`` mode statement-level triggers with transition tables apply each
+    INSERT/UPDATE/DELETE to the rollup as a set-based delta. In ``watermark`` mode
+    (for setups that cannot install triggers) ``refresh`` folds in rows whose
+    watermark column is newer than the last refresh; this assumes an append-only
+    table with a monotonically increasing watermark.
+    """
+
+    def __init__(self, client, mode: str = "trigger"):
+        """
+        Args:
+            client: TacnodeClient, opened by the caller, used for all SQL
+            mode: ``trigger`` or ``watermark``
+        """
+        if mode not in ("trigger", "watermark"):
+            raise ValueError(f"Unsupported rollup mode: {mode}. Must be 'trigger' or 'watermark'")
+        self.client = client
+        self.mode = mode
+        self.specs: Dict[str, RollupSpec] = {}
+        # True/False once the catalog was checked (or install ran); missing means not checked yet
+        self.installed: Dict[str, bool] = {}
+        self.routed_queries = 0
+
+    def register(self, spec: RollupSpec):
+        if self.mode == "watermark" and not spec.watermark_column:
+            raise ValueError(f"Rollup '{spec.name}' needs a watermark_column in watermark mode")
+        if self.specs.get(spec.name) != spec:
+            self.installed.pop(spec.name, None)
+        self.specs[spec.name] = spec
+
+    def _measure_columns(self, spec: RollupSpec) -> List[str]:
+        columns = []
+        for i in range(len(spec.measures)):
+            columns += [f"sum_{i}", f"count_{i}"]
+        return columns
+
+    def _delta_select(self, spec: RollupSpec, source: str, sign: str = "", extra_where: str = "") -> str:
+        """Aggregate rows of ``source`` into rollup deltas (negated when sign is '-')"""
+        measures = []
+        for measure in spec.measures:
+            value = f"CAST({measure} AS NUMERIC)"
+            measures += [f"{sign}SUM({value})", f"{sign}COUNT({measure})"]
+
+        conditions = [c for c in (spec.where, extra_where) if c]
+        where = f"WHERE {' AND '.join(f'({c})' for c in conditions)}" if conditions else ""
+        return (
+            f"SELECT {spec.group_by}, {sign}COUNT(*), {', '.join(measures)} "
+            f"FROM {source} {where} GROUP BY 1"
+        )
+
+    def _upsert(self, spec: RollupSpec, delta_select: str) -> str:
+        columns = [spec.group_alias, "row_count"] + self._measure_columns(spec)
+        updates = ["row_count = r.row_count + EXCLUDED.row_count"]
+        for column in self._measure_columns(spec):
+            updates.append(f"{column} = COALESCE(r.{column}, 0) + COALESCE(EXCLUDED.{column}, 0)")
+
+        return (
+            f"INSERT INTO {spec.rollup_table} AS r ({', '.join(columns)}) {delta_select} "
+            f"ON CONFLICT ({spec.group_alias}) DO UPDATE SET {', '.join(updates)}"
+        )
+
+    async def _execute(self, sql: str) -> Dict[str, Any]:
+        result = await self.client.execute_query(sql)
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+        return result
+
+    async def detect(self, spec: RollupSpec) -> bool:
+        """
+        Whether ``spec`` is already installed in the database, built from the
+        same definition and mode, with its triggers (or watermark state) in place.
+        """
+        triggers = [f"{spec.rollup_table}_{event}" for event in ("ins", "upd", "del")]
+        result = await self._execute(f"""
+            SELECT obj_description(to_regclass('{spec.rollup_table}'), 'pg_class') AS fingerprint,
+                   to_regclass('{spec.state_table}') IS NOT NULL AS has_state,
+                   (SELECT COUNT(*) FROM pg_trigger
+                    WHERE tgrelid = to_regclass('{spec.table}') AND NOT tgisinternal
+                      AND tgname IN ({", ".join(f"'{t}'" for t in triggers)})) AS triggers
+        """)
+        row = result["data"][0]
+        if self.mode == "trigger":
+            maintained = row["triggers"] == len(triggers)
+        else:
+            maintained = row["has_state"] and row["triggers"] == 0
+
+        self.installed[spec.name] = row["fingerprint"] == spec.fingerprint(self.mode) and bool(maintained)
+        return self.installed[spec.name]
+
+    async def install(self, spec: RollupSpec, rebuild: bool = False):
+        """
+        Create, backfill and start maintaining one rollup.
+
+        Idempotent: a rollup already installed from the same definition is left
+        as it is unless ``rebuild`` is set.
+        """
+        self.register(spec)
+        if not rebuild and await self.detect(spec):
+            logger.info(f"Rollup '{spec.name}' on {spec.table} is already installed")
+            return
+
+        version = await self._execute("SELECT current_setting('server_version_num')::int AS version")
+        # NULL group keys only conflict with each other from PostgreSQL 15 on
+        nulls = " NULLS NOT DISTINCT" if version["data"][0]["version"] >= 150000 else ""
+        if not nulls:
+            logger.warning(f"Rollup '{spec.name}': server < 15, rows with a NULL group key are not rolled up")
+
+        measure_defs = ", ".join(
+            f"0::numeric AS sum_{i}, 0::bigint AS count_{i}" for i in range(len(spec.measures))
+        )
+        null_filter = f"{spec.group_by} IS NOT NULL" if not nulls else ""
+
+        # One DO block so the table lock, backfill and triggers apply atomically,
+        # which also works over the HTTP transport (no multi-request transaction)
+        statements = [
+            f"LOCK TABLE {spec.table} IN SHARE ROW EXCLUSIVE MODE",
+            f"DROP TABLE IF EXISTS {spec.rollup_table}",
+            f"CREATE TABLE {spec.rollup_table} AS SELECT {spec.group_by} AS {spec.group_alias}, "
+            f"0::bigint AS row_count, {measure_defs} FROM {spec.table} LIMIT 0",
+            f"CREATE UNIQUE INDEX {spec.rollup_table}_key ON {spec.rollup_table} ({spec.group_alias}){nulls}",
+            f"COMMENT ON TABLE {spec.rollup_table} IS '{spec.fingerprint(self.mode)}'",
+            self._upsert(spec, self._delta_select(spec, spec.table, extra_where=null_filter)),
+        ]
+
+        if self.mode == "trigger":
+            apply_new = self._upsert(spec, self._delta_select(spec, "new_rows", extra_where=null_filter))
+            remove_old = self._upsert(spec, self._delta_select(spec, "old_rows", "-", extra_where=null_filter))
+            statements += [
+                f"""CREATE OR REPLACE FUNCTION {spec.rollup_table}_apply() RETURNS trigger AS $fn$
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        {remove_old};
+                        DELETE FROM {spec.rollup_table} WHERE row_count <= 0;
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        {apply_new};
+                    END IF;
+                    RETURN NULL;
+                END;
+                $fn$ LANGUAGE plpgsql""",
+                # Transition tables require one trigger per event
+                f"DROP TRIGGER IF EXISTS {spec.rollup_table}_ins ON {spec.table}",
+                f"CREATE TRIGGER {spec.rollup_table}_ins AFTER INSERT ON {spec.table} "
+                f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {spec.rollup_table}_apply()",
+                f"DROP TRIGGER IF EXISTS {spec.rollup_table}_upd ON {spec.table}",
+                f"CREATE TRIGGER {spec.rollup_table}_upd AFTER UPDATE ON {spec.table} "
+                f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {spec.rollup_table}_apply()",
+                f"DROP TRIGGER IF EXISTS {spec.rollup_table}_del ON {spec.table}",
+                f"CREATE TRIGGER {spec.rollup_table}_del AFTER DELETE ON {spec.table} "
+                f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION {spec.rollup_table}_apply()",
+            ]
+        else:
+            statements += [
+                # Switching from trigger mode: stop triggers from double-applying deltas
+                f"DROP TRIGGER IF EXISTS {spec.rollup_table}_ins ON {spec.table}",
+                f"DROP TRIGGER IF EXISTS {spec.rollup_table}_upd ON {spec.table}",
+                f"DROP TRIGGER IF EXISTS {spec.rollup_table}_del ON {spec.table}",
+                f"DROP TABLE IF EXISTS {spec.state_table}",
+                f"CREATE TABLE {spec.state_table} AS SELECT MAX({spec.watermark_column}) AS watermark, "
+                f"NOW() AS refreshed_at FROM {spec.table}",
+            ]
+
+        body = ";\n".join(statements)
+        await self._execute(f"DO $install$ BEGIN\n{body};\nEND $install$")
+
+        self.installed[spec.name] = True
+        logger.info(f"Installed rollup '{spec.name}' on {spec.table} ({self.mode} mode)")
+
+    async def install_all(self, rebuild: bool = False):
+        for spec in list(self.specs.values()):
+            await self.install(spec, rebuild)
+
+    async def refresh(self, spec: RollupSpec):
+        """Fold rows newer than the stored watermark into a watermark-mode rollup"""
+        if self.mode != "watermark":
+            return
+
+        wm = spec.watermark_column
+        delta = self._delta_select(
+            spec, spec.table,
+            extra_where=f"{wm} <= (SELECT hi FROM bounds) AND "
+                        f"((SELECT watermark FROM {spec.state_table}) IS NULL OR {wm} > (SELECT watermark FROM {spec.state_table}))"
+        )
+        # Data-modifying CTEs always run, so the upsert and the watermark move together
+        await self._execute(f"""
+            WITH bounds AS (SELECT MAX({wm}) AS hi FROM {spec.table}),
+            applied AS ({self._upsert(spec, delta)})
+            UPDATE {spec.state_table}
+            SET watermark = COALESCE((SELECT hi FROM bounds), watermark), refreshed_at = NOW()
+        """)
+
+    def match(self, table: str, group_by: str, aggregate_function: str,
+              aggregate_column: str, where: Optional[str] = None) -> Optional[RollupSpec]:
+        """Find an installed rollup that can answer this aggregation exactly (see ``detect``)"""
+        function = aggregate_function.upper()
+        if function not in ROLLUP_FUNCTIONS:
+            return None
+
+        for spec in self.specs.values():
+            if not self.installed.get(spec.name):
+                continue
+            if _normalize(spec.table) != _normalize(table) or _normalize(spec.group_by) != _normalize(group_by):
+                continue
+            if _normalize(spec.where) != _normalize(where):
+                continue
+            if function == "COUNT" and aggregate_column == "*":
+                return spec
+            if spec.measure_index(aggregate_column) is not None:
+                return spec
+        return None
+
+    def aggregate_expression(self, spec: RollupSpec, aggregate_function: str, aggregate_column: str) -> str:
+        """Rollup column expression equivalent to AGG(column) on the base table"""
+        function = aggregate_function.upper()
+        if function == "COUNT" and aggregate_column == "*":
+            return "row_count"
+
+        i = spec.measure_index(aggregate_column)
+        if function == "COUNT":
+            return f"count_{i}"
+        if function == "SUM":
+            return f"CASE WHEN count_{i} > 0 THEN sum_{i} END"
+        return f"sum_{i} / NULLIF(count_{i}, 0)"
+
+    async def route(self, table: str, group_by: str, aggregate_function: str,
+                    aggregate_column: str, where: Optional[str] = None,
+                    limit: int = 100) -> Optional[tuple]:
+        """
+        Rewrite a tacnode_aggregation_query request to read from a rollup.
+
+        Returns:
+            ``(sql, spec)`` when a rollup matches, otherwise None
+        """
+        # Rollups installed by an earlier process are picked up from the catalog once
+        for unchecked in [s for s in self.specs.values() if s.name not in self.installed]:
+            await self.detect(unchecked)
+
+        spec = self.match(table, group_by, aggregate_function, aggregate_column, where)
+        if spec is None:
+            return None
+
+        await self.refresh(spec)
+        expression = self.aggregate_expression(spec, aggregate_function, aggregate_column)
+        self.routed_queries += 1
+
+        sql = f"""
+        SELECT
+            {spec.group_alias} AS {spec.group_alias},
+            {expression} as {aggregate_function.lower()}_value
+        FROM {spec.rollup_table}
+        WHERE row_count > 0
+        ORDER BY {expression} DESC
+        LIMIT {int(limit)}
+        """
+        return sql, spec
@@ -0,0 +1,192 @@
+"""
+Tacnode Sampling
+Approximate aggregations over TABLESAMPLE with scaled estimates and confidence intervals
+"""
+
+import os
+import json
+import math
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 95% normal-approximation confidence intervals
+CONFIDENCE_LEVEL = 0.95
+CONFIDENCE_Z = 1.96
+
+SAMPLED_FUNCTIONS = ("COUNT", "SUM", "AVG")
+
+class LatencyEstimator:
+    """
+    Predicts query latency from the planner's EXPLAIN cost.
+
+    The milliseconds-per-cost-unit factor starts from TACNODE_MS_PER_COST_UNIT
+    and is recalibrated from every exact query that is actually run.
+    """
+
+    def __init__(self, ms_per_cost: Optional[float] = None, smoothing: float = 0.3):
+        self.ms_per_cost = ms_per_cost or float(os.getenv("TACNODE_MS_PER_COST_UNIT", "0.015"))
+        self.smoothing = smoothing
+
+    async def plan_cost(self, client, query: str) -> Optional[float]:
+        """Planner total cost for ``query``, or None if EXPLAIN is unavailable"""
+        result = await client.execute_query(f"EXPLAIN (FORMAT JSON) {query}")
+        if not result["success"] or not result["data"]:
+            logger.warning(f"EXPLAIN failed, cannot estimate latency: {result.get('error')}")
+            return None
+
+        plan = next(iter(result["data"][0].values()))
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return float(plan[0]["Plan"]["Total Cost"])
+
+    def estimate_ms(self, cost: float) -> float:
+        return cost * self.ms_per_cost
+
+    def observe(self, cost: float, elapsed_ms: float):
+        """Fold a measured (cost, latency) pair into the calibration"""
+        if cost > 0 and elapsed_ms > 0:
+            self.ms_per_cost += self.smoothing * (elapsed_ms / cost - self.ms_per_cost)
+
+async def estimated_row_count(client, table: str) -> Optional[float]:
+    """Planner row estimate from pg_class (maintained by ANALYZE/autovacuum)"""
+    result = await client.execute_query(
+        "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)", [table]
+    )
+    if result["success"] and result["data"] and result["data"][0]["reltuples"] is not None:
+        rows = float(result["data"][0]["reltuples"])
+        return rows if rows > 0 else None
+    return None
+
+def sample_percent(estimated_ms: float, budget_ms: float, minimum: float = 0.01) -> float:
+    """TABLESAMPLE percentage expected to finish within ``budget_ms`` (with 20% headroom)"""
+    if estimated_ms <= 0:
+        return 100.0
+    return max(minimum, min(100.0, 100.0 * 0.8 * budget_ms / estimated_ms))
+
+def sampled_moments_query(table: str, column: str, group_by: Optional[str],
+                          percent: float, where: Optional[str] = None) -> str:
+    """
+    Per-group sample count, sum and sum of squares that the estimators scale up.
+
+    ``where`` is applied as an aggregate FILTER so that ``sampled_rows`` counts
+    every sampled row; SYSTEM sampling picks whole pages, so the realised
+    fraction is derived from it rather than taken from ``percent``.
+    """
+    value = f"CAST({column} AS DOUBLE PRECISION)"
+    condition = f" FILTER (WHERE {where})" if where else ""
+    moments = [f"COUNT(*){condition} AS n", "SUM(COUNT(*)) OVER () AS sampled_rows"]
+    if column != "*":
+        moments += [
+            f"COUNT({column}){condition} AS n_value",
+            f"SUM({value}){condition} AS s",
+            f"SUM({value} * {value}){condition} AS ss"
+        ]
+    select = ", ".join(([f"{group_by} AS group_key"] if group_by else []) + moments)
+    group_clause = f"GROUP BY {group_by}" if group_by else ""
+    return f"""
+    SELECT {select}
+    FROM {table} TABLESAMPLE SYSTEM ({percent:.4f})
+    {group_clause}
+    """
+
+async def sampled_fraction(client, table: str, rows: List[Dict[str, Any]], percent: float) -> float:
+    """Fraction of ``table`` a sampled_moments_query actually read (``percent`` if unknown)"""
+    fraction = percent / 100.0
+    table_rows = await estimated_row_count(client, table)
+    sampled_rows = float(rows[0]["sampled_rows"]) if rows else 0.0
+    if table_rows and sampled_rows:
+        fraction = min(1.0, sampled_rows / table_rows)
+    return fraction
+
+def _estimate(row: Dict[str, Any], function: str, column: str, fraction: float) -> tuple:
+    """(estimate, standard error) for one group under Bernoulli-style sampling"""
+    n = float(row["n"])
+    if function == "COUNT":
+        count = n if column == "*" else float(row["n_value"])
+        return count / fraction, math.sqrt(count * (1 - fraction)) / fraction
+
+    n_value = float(row["n_value"] or 0)
+    s = float(row["s"] or 0)
+    ss = float(row["ss"] or 0)
+    if function == "SUM":
+        return (s / fraction if n_value else None), math.sqrt(max(ss, 0) * (1 - fraction)) / fraction
+
+    if not n_value:
+        return None, None
+    mean = s / n_value
+    if n_value < 2:
+        return mean, None
+    variance = max(ss - s * s / n_value, 0) / (n_value - 1)
+    return mean, math.sqrt(variance / n_value * (1 - fraction))
+
+def scale_sampled_rows(rows: List[Dict[str, Any]], function: str, column: str,
+                       group_by: Optional[str], fraction: float, limit: int = 100) -> List[Dict[str, Any]]:
+    """Turn sampled moments into estimates with confidence intervals, ordered like the exact query"""
+    value_key = f"{function.lower()}_value"
+    results = []
+
+    for row in rows:
+        if not row["n"]:
+            continue
+        estimate, stderr = _estimate(row, function, column, fraction)
+        result = {group_by: row["group_key"]} if group_by else {}
+        result[value_key] = estimate
+        if estimate is not None and stderr is not None:
+            result["ci_low"] = estimate - CONFIDENCE_Z * stderr
+            result["ci_high"] = estimate + CONFIDENCE_Z * stderr
+        else:
+            result["ci_low"] = result["ci_high"] = None
+        result["sample_rows"] = row["n"]
+        results.append(result)
+
+    results.sort(key=lambda r: (r[value_key] is None, -(r[value_key] or 0)))
+    return results[:limit]
+
+async def approximate_aggregation(client, estimator: LatencyEstimator, exact_query: str,
+                                  table: str, column: str, function: str,
+                                  group_by: Optional[str], max_latency_ms: float,
+                                  where: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run ``exact_query`` if the planner says it fits ``max_latency_ms``,
+    otherwise a TABLESAMPLE estimate of the same aggregation.
+
+    Returns:
+        Query result dict with ``mode`` set to ``exact`` or ``approximate``
+    """
+    function = function.upper()
+    cost = await estimator.plan_cost(client, exact_query)
+    estimated_ms = estimator.estimate_ms(cost) if cost is not None else None
+
+    # MIN/MAX cannot be scaled from a sample, and without a plan there is nothing to budget against
+    if estimated_ms is None or estimated_ms <= max_latency_ms or function not in SAMPLED_FUNCTIONS:
+        result = await client.execute_query(exact_query)
+        if result["success"] and cost is not None:
+            estimator.observe(cost, result["execution_time_ms"])
+        result.update({"mode": "exact", "estimated_exact_ms": estimated_ms})
+        return result
+
+    percent = sample_percent(estimated_ms, max_latency_ms)
+    sample_query = sampled_moments_query(table, column, group_by, percent, where)
+
+    # The moments query costs more per row than the plain aggregate; rescale once by its own plan
+    sample_cost = await estimator.plan_cost(client, sample_query)
+    if sample_cost:
+        percent = sample_percent(estimator.estimate_ms(sample_cost) * 100.0 / percent, max_latency_ms)
+        sample_query = sampled_moments_query(table, column, group_by, percent, where)
+
+    result = await client.execute_query(sample_query)
+    if result["success"]:
+        fraction = await sampled_fraction(client, table, result["data"], percent)
+        result["data"] = scale_sampled_rows(result["data"], function, column, group_by, fraction)
+        result["row_count"] = len(result["data"])
+        percent = fraction * 100.0
+
+    result.update({
+        "mode": "approximate",
+        "estimated_exact_ms": estimated_ms,
+        "sample_percent": percent,
+        "confidence_level": CONFIDENCE_LEVEL
+    })
+    return result
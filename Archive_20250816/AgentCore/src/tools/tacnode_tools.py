@@ -4,26 +4,288 @@ Custom tools for interacting with Tacnode Context Lake
 """
 
 import os
+import re
 import json
+import time
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from contextlib import aclosing
+from typing import Dict, Any, List, Optional, AsyncIterator, Union
 import aiohttp
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import asyncpg
+import ijson
 from strands.tools import tool
 
+from tools.tacnode_change_feed import (
+    ChangeFeed, NotifyChangeFeed, PollingChangeFeed, TableCache
+)
+from tools.tacnode_query_guard import QueryGuard, is_read_only, skip_quoted
+from tools.tacnode_rollups import RollupManager, DEFAULT_ROLLUPS
+from tools.tacnode_sampling import LatencyEstimator, approximate_aggregation
+from tools.tacnode_embeddings import EmbeddingService, EmbeddingCache, create_embedding_provider
+
 logger = logging.getLogger(__name__)
 
+class TacnodeQueryError(Exception):
+    """Raised by streaming queries, which cannot report failure through a result dict"""
+    pass
+
+def _to_positional(query: str, parameters: Optional[Any]) -> tuple:
+    """
+    Convert psycopg-style placeholders to asyncpg's positional ``$n`` form.
+
+    ``%(name)s`` placeholders are resolved from a parameter dict; bare ``%s``
+    placeholders consume the dict values (or a list/tuple) in order, and ``%%``
+    is a literal ``%``. Comments and quoted strings are copied unchanged, so a
+    ``%s`` inside ``LIKE 'x%s'`` is not a placeholder.
+
+    Raises:
+        ValueError: If the placeholders and the parameters do not match up
+    """
+    if not parameters:
+        return query, []
+
+    # Text pieces, with placeholders as (name,) tuples; None stands for a bare %s
+    pieces: List[Any] = []
+    i = 0
+    while i < len(query):
+        skipped = skip_quoted(query, i)
+        if skipped is not None:
+            pieces.append(query[i:skipped])
+            i = skipped
+            continue
+        named = re.match(r"%\((\w+)\)s", query[i:])
+        if named:
+            pieces.append((named.group(1),))
+            i += named.end()
+        elif query.startswith("%s", i):
+            pieces.append((None,))
+            i += 2
+        elif query.startswith("%%", i):
+            pieces.append("%")
+            i += 2
+        else:
+            pieces.append(query[i])
+            i += 1
+
+    names = {piece[0] for piece in pieces if isinstance(piece, tuple) and piece[0] is not None}
+    bare = sum(1 for piece in pieces if piece == (None,))
+    if isinstance(parameters, dict):
+        missing = names - parameters.keys()
+        if missing:
+            raise ValueError(f"No parameter for placeholder(s): {', '.join(sorted(missing))}")
+        # Bare %s placeholders take the values no named placeholder uses, in order
+        unnamed = [v for k, v in parameters.items() if k not in names]
+        if bare > len(unnamed):
+            raise ValueError(f"Query has {bare} %s placeholders but only {len(unnamed)} unnamed parameters")
+    else:
+        if names:
+            raise ValueError(f"Named placeholders need a parameter dict, got {type(parameters).__name__}")
+        unnamed = list(parameters)
+        if bare != len(unnamed):
+            raise ValueError(f"Query has {bare} %s placeholders but {len(unnamed)} parameters were given")
+
+    args = []
+    named_positions = {}
+    remaining = iter(unnamed)
+    parts = []
+    for piece in pieces:
+        if not isinstance(piece, tuple):
+            parts.append(piece)
+        elif piece[0] is None:
+            args.append(next(remaining))
+            parts.append(f"${len(args)}")
+        else:
+            if piece[0] not in named_positions:
+                args.append(parameters[piece[0]])
+                named_positions[piece[0]] = len(args)
+            parts.append(f"${named_positions[piece[0]]}")
+    return "".join(parts), args
+
+class PostgresWireTransport:
+    """
+    Direct PostgreSQL wire-protocol transport for Tacnode Context Lake.
+
+    Queries run over a shared asyncpg pool instead of the HTTP JSON API. asyncpg
+    decodes results with the binary protocol and keeps a per-connection cache of
+    server-side prepared statements, so fixed tool templates (data freshness,
+    aggregations) are parsed and planned once per connection and reused after.
+    """
+    
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10,
+                 statement_cache_size: int = 100, command_timeout: float = 30):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        self.pool: Optional[asyncpg.Pool] = None
+        self._lock = asyncio.Lock()
+    
+    async def open(self):
+        """Create the connection pool on first use"""
+        async with self._lock:
+            if self.pool is None:
+                self.pool = await asyncpg.create_pool(
+                    self.dsn,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    statement_cache_size=self.statement_cache_size,
+                    command_timeout=self.command_timeout
+                )
+                logger.info(f"Opened Tacnode wire pool (min={self.min_size}, max={self.max_size})")
+    
+    async def close(self):
+        """Close the connection pool"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+    
+    async def execute_query(self, query: str, parameters: Optional[Any] = None) -> Dict[str, Any]:
+        """Execute a SQL query over the pool, returning the same shape as the HTTP API"""
+        try:
+            await self.open()
+            sql, args = _to_positional(query, parameters)
+            
+            start = time.perf_counter()
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(sql, *args)
+            execution_time_ms = (time.perf_counter() - start) * 1000
+            
+            return {
+                "success": True,
+                "data": [dict(row) for row in rows],
+                "columns": list(rows[0].keys()) if rows else [],
+                "row_count": len(rows),
+                "execution_time_ms": execution_time_ms
+            }
+            
+        except Exception as e:
+            logger.error(f"Wire query execution failed: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def execute_query_stream(self, query: str, parameters: Optional[Any] = None,
+                                   batch_size: Optional[int] = None) -> AsyncIterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Stream rows through a server-side cursor, fetching ``batch_size`` rows per round trip"""
+        await self.open()
+        sql, args = _to_positional(query, parameters)
+        
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    cursor = conn.cursor(sql, *args, prefetch=batch_size or 1000)
+                    batch = []
+                    async for row in cursor:
+                        if batch_size is None:
+                            yield dict(row)
+                            continue
+                        
+                        batch.append(dict(row))
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+                    
+                    if batch:
+                        yield batch
+        except asyncpg.PostgresError as e:
+            raise TacnodeQueryError(str(e)) from e
+    
+    async def vector_search(self, query_vector: List[float], table: str,
+                            vector_column: str = "embedding", top_k: int = 10,
+                            filters: Optional[Dict] = None) -> Dict[str, Any]:
+        """Perform pgvector cosine similarity search over the pool"""
+        try:
+            await self.open()
+            
+            args = ["[" + ",".join(str(float(v)) for v in query_vector) + "]", top_k]
+            conditions = []
+            for column, value in (filters or {}).items():
+                args.append(value)
+                conditions.append(f"{column} = ${len(args)}")
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            
+            sql = f"""
+            SELECT *, {vector_column} <=> $1::vector as distance
+            FROM {table}
+            {where}
+            ORDER BY distance
+            LIMIT $2
+            """
+            
+            start = time.perf_counter()
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(sql, *args)
+            execution_time_ms = (time.perf_counter() - start) * 1000
+            
+            results = []
+            for row in rows:
+                record = dict(row)
+                record.pop(vector_column, None)
+                results.append(record)
+            
+            return {
+                "success": True,
+                "results": results,
+                "execution_time_ms": execution_time_ms
+            }
+            
+        except Exception as e:
+            logger.error(f"Wire vector search failed: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
 class TacnodeClient:
-    """Client for interacting with Tacnode Context Lake"""
+    """
+    Client for interacting with Tacnode Context Lake
+
+    ``transport`` selects how queries reach Tacnode: ``"http"`` uses the JSON
+    query API at ``endpoint``; ``"postgres"`` connects directly over the
+    PostgreSQL wire protocol to ``dsn`` through a pooled PostgresWireTransport.
+
+    With a ``guard``, statements run with ``guard=True`` (agent-written SQL)
+    are checked by the QueryGuard first: rejected statements come back as
+    failed results carrying the reason. SQL the tools build themselves runs
+    unguarded.
+    """
     
-    def __init__(self, endpoint: str, api_key: str):
+    def __init__(self, endpoint: str, api_key: str, transport: str = "http",
+                 dsn: Optional[str] = None, pool_min_size: int = 1, pool_max_size: int = 10,
+                 statement_cache_size: int = 100, guard: Optional[QueryGuard] = None):
+        if transport not in ("http", "postgres"):
+            raise ValueError(f"Unsupported transport: {transport}. Must be 'http' or 'postgres'")
+        
         self.endpoint = endpoint.rstrip('/')
         self.api_key = api_key
+        self.transport = transport
+        self.dsn = dsn
+        self.guard = guard
         self.session = None
+        # None until the first execute_many call probes the batch endpoint
+        self._batch_supported: Optional[bool] = None
+        # The pool outlives individual `async with` blocks; call close() to release it
+        self.wire = PostgresWireTransport(
+            dsn or "",
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            statement_cache_size=statement_cache_size
+        ) if transport == "postgres" else None
+    
+    def is_configured(self) -> bool:
+        """Whether the selected transport has the settings it needs"""
+        if self.wire:
+            return bool(self.dsn)
+        return bool(self.endpoint and self.api_key)
         
     async def __aenter__(self):
+        if self.wire:
+            await self.wire.open()
+            return self
+        
         self.session = aiohttp.ClientSession(
             headers={
                 "Authorization": f"Bearer {self.api_key}",
@@ -35,9 +297,34 @@ class TacnodeClient:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
+            self.session = None
+    
+    async def close(self):
+        """Release the wire transport's connection pool, if any"""
+        if self.wire:
+            await self.wire.close()
     
-    async def execute_query(self, query: str, parameters: Optional[Dict] = None) -> Dict[str, Any]:
-        """Execute a SQL query against Tacnode Context Lake"""
+    async def execute_query(self, query: str, parameters: Optional[Dict] = None,
+                            guard: bool = False) -> Dict[str, Any]:
+        """Execute a SQL query against Tacnode Context Lake; ``guard`` applies the QueryGuard"""
+        if not (guard and self.guard):
+            return await self._run_query(query, parameters)
+        
+        decision = await self.guard.check(self, query, parameters)
+        if not decision.allowed:
+            logger.warning(decision.reason)
+            return {"success": False, "error": decision.reason, "guard": decision.to_dict()}
+        
+        result = await self._run_query(decision.query, parameters)
+        if decision.reason:
+            result["guard"] = decision.to_dict()
+        return result
+    
+    async def _run_query(self, query: str, parameters: Optional[Dict] = None) -> Dict[str, Any]:
+        """Execute a statement without the query guard"""
+        if self.wire:
+            return await self.wire.execute_query(query, parameters)
+        
         try:
             payload = {
                 "query": query,
@@ -68,10 +355,196 @@ class TacnodeClient:
                 "error": str(e)
             }
     
+    async def execute_query_stream(self, query: str, parameters: Optional[Dict] = None,
+                                   batch_size: Optional[int] = None,
+                                   guard: bool = False) -> AsyncIterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Stream the rows of a SQL query as they are decoded from the response body.
+
+        Rows are parsed incrementally from the ``data`` array with ijson, so the
+        full result set is never held in memory. Yields one row dict at a time, or
+        lists of up to ``batch_size`` rows when ``batch_size`` is given.
+
+        Raises:
+            TacnodeQueryError: If the server or (with ``guard``) the query guard rejects the query
+        """
+        if guard and self.guard:
+            # Streaming exists to read large results, so only the cost check applies
+            decision = await self.guard.check(self, query, parameters, inject_limit=False)
+            if not decision.allowed:
+                raise TacnodeQueryError(decision.reason)
+            query = decision.query
+        
+        if self.wire:
+            async with aclosing(self.wire.execute_query_stream(query, parameters, batch_size)) as stream:
+                async for item in stream:
+                    yield item
+            return
+        
+        payload = {
+            "query": query,
+            "parameters": parameters or {}
+        }
+
+        async with self.session.post(f"{self.endpoint}/api/v1/query", json=payload) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise TacnodeQueryError(f"HTTP {response.status}: {error_text}")
+
+            batch = []
+            async for row in ijson.items_async(response.content, "data.item", use_float=True):
+                if batch_size is None:
+                    yield row
+                    continue
+
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+            if batch:
+                yield batch
+
+    async def execute_many(self, queries: List[Any], concurrency: int = 5,
+                           use_batch: bool = True, guard: bool = False) -> List[Dict[str, Any]]:
+        """
+        Execute several independent queries and return their results in order.
+
+        Each entry in ``queries`` is either a SQL string or a ``(query, parameters)``
+        tuple. When the server exposes ``/api/v1/query/batch`` all statements are
+        sent in a single request; otherwise they are sent concurrently over the
+        shared session, with at most ``concurrency`` requests in flight.
+
+        Every result carries the usual ``execute_query`` fields plus ``index``,
+        ``query`` and the client-side ``elapsed_ms`` for that statement. A failing
+        query does not affect the others. ``guard`` checks every statement with
+        the QueryGuard first.
+        """
+        normalized = []
+        for item in queries:
+            if isinstance(item, (tuple, list)):
+                query, parameters = item[0], (item[1] if len(item) > 1 else None)
+            else:
+                query, parameters = item, None
+            normalized.append((query, parameters))
+
+        if not normalized:
+            return []
+
+        # Guard every statement up front so the batch request only carries allowed ones
+        guarded: Dict[int, Dict[str, Any]] = {}
+        if guard and self.guard:
+            decisions = await asyncio.gather(*(
+                self.guard.check(self, query, parameters) for query, parameters in normalized
+            ))
+            for index, decision in enumerate(decisions):
+                guarded[index] = decision.to_dict()
+                if decision.allowed:
+                    normalized[index] = (decision.query, normalized[index][1])
+
+        def finish(index: int, entry: Dict[str, Any]) -> Dict[str, Any]:
+            if index in guarded and guarded[index]["reason"]:
+                entry["guard"] = guarded[index]
+            return entry
+
+        pending = [i for i in range(len(normalized)) if guarded.get(i, {}).get("allowed", True)]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(normalized)
+        for index in set(range(len(normalized))) - set(pending):
+            results[index] = finish(index, {
+                "index": index, "query": normalized[index][0], "elapsed_ms": 0.0,
+                "success": False, "error": guarded[index]["reason"]
+            })
+
+        # The batch endpoint is an HTTP API feature; the wire transport relies on the pool
+        if use_batch and not self.wire and self._batch_supported is not False and len(pending) > 1:
+            batch_results = await self._execute_batch([normalized[i] for i in pending])
+            if batch_results is not None:
+                for index, entry in zip(pending, batch_results):
+                    entry["index"] = index
+                    results[index] = finish(index, entry)
+                return results
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_one(index: int, query: str, parameters: Optional[Dict]) -> Dict[str, Any]:
+            async with semaphore:
+                start = time.perf_counter()
+                result = await self._run_query(query, parameters)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            return finish(index, {"index": index, "query": query, "elapsed_ms": elapsed_ms, **result})
+
+        for entry in await asyncio.gather(*(run_one(i, *normalized[i]) for i in pending)):
+            results[entry["index"]] = entry
+        return results
+
+    async def _execute_batch(self, normalized: List[tuple]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Send all statements as one batch request.
+
+        Returns None (run them one by one instead) if the server lacks batch
+        support, or if the batch failed and every statement is read-only. A
+        failed batch containing writes may have partly executed, so each
+        statement then gets the batch error rather than being re-run.
+        """
+        def failed(error: str) -> Optional[List[Dict[str, Any]]]:
+            if all(is_read_only(query) for query, _ in normalized):
+                logger.warning(f"{error}; re-running the read-only statements as concurrent requests")
+                return None
+            logger.warning(f"{error}; not retried, the batch contains writes that may have run")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            return [{"index": index, "query": query, "elapsed_ms": elapsed_ms, "success": False, "error": error}
+                    for index, (query, _) in enumerate(normalized)]
+
+        payload = {
+            "queries": [
+                {"query": query, "parameters": parameters or {}}
+                for query, parameters in normalized
+            ]
+        }
+
+        start = time.perf_counter()
+        try:
+            async with self.session.post(f"{self.endpoint}/api/v1/query/batch", json=payload) as response:
+                if response.status in (404, 405, 501):
+                    logger.info("Batch query endpoint not available, falling back to concurrent requests")
+                    self._batch_supported = False
+                    return None
+                if response.status != 200:
+                    error_text = await response.text()
+                    return failed(f"Batch query failed with HTTP {response.status}: {error_text}")
+                result = await response.json()
+        except Exception as e:
+            return failed(f"Batch query failed: {type(e).__name__}: {e}")
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._batch_supported = True
+
+        items = result.get("results", [])
+        results = []
+        for index, (query, _) in enumerate(normalized):
+            item = items[index] if index < len(items) else {"error": "Missing result in batch response"}
+            entry = {"index": index, "query": query, "elapsed_ms": elapsed_ms}
+            if item.get("error"):
+                entry.update({"success": False, "error": item["error"]})
+            else:
+                entry.update({
+                    "success": True,
+                    "data": item.get("data", []),
+                    "columns": item.get("columns", []),
+                    "row_count": item.get("row_count", 0),
+                    "execution_time_ms": item.get("execution_time_ms", 0)
+                })
+            results.append(entry)
+
+        return results
+
     async def vector_search(self, query_vector: List[float], table: str, 
                           vector_column: str = "embedding", top_k: int = 10,
                           filters: Optional[Dict] = None) -> Dict[str, Any]:
         """Perform vector similarity search"""
+        if self.wire:
+            return await self.wire.vector_search(query_vector, table, vector_column, top_k, filters)
+        
         try:
             payload = {
                 "query_vector": query_vector,
@@ -104,43 +577,221 @@ class TacnodeClient:
             }
 
 # Initialize Tacnode client
+# TACNODE_TRANSPORT=postgres switches from the HTTP API to a pooled wire connection to TACNODE_DSN
+# Agent-written SQL (tacnode_query, tacnode_batch_query) is bounded before it runs; SQL the tools
+# build themselves (rollup backfills, aggregates, freshness checks) is not. TACNODE_QUERY_GUARD=off disables it
+_guard_mode = os.getenv("TACNODE_QUERY_GUARD", "reject").lower()
+query_guard = QueryGuard(
+    max_rows=int(os.getenv("TACNODE_MAX_ROWS", "1000")),
+    max_cost=float(os.getenv("TACNODE_MAX_QUERY_COST", "1000000")),
+    on_expensive=_guard_mode
+) if _guard_mode != "off" else None
+
 tacnode_client = TacnodeClient(
     endpoint=os.getenv("TACNODE_ENDPOINT", ""),
-    api_key=os.getenv("TACNODE_API_KEY", "")
+    api_key=os.getenv("TACNODE_API_KEY", ""),
+    transport=os.getenv("TACNODE_TRANSPORT", "http"),
+    dsn=os.getenv("TACNODE_DSN"),
+    pool_min_size=int(os.getenv("TACNODE_POOL_MIN_SIZE", "1")),
+    pool_max_size=int(os.getenv("TACNODE_CONNECTION_POOL_SIZE", "10")),
+    statement_cache_size=int(os.getenv("TACNODE_STATEMENT_CACHE_SIZE", "100")),
+    guard=query_guard
 )
 
+# Schema and aggregation results; entries stay valid until the change feed reports a write
+result_cache = TableCache(ttl_seconds=float(os.getenv("TACNODE_CACHE_TTL_SECONDS", "3600")))
+change_feed: Optional[ChangeFeed] = None
+
+async def start_change_feed(feed: Optional[ChangeFeed] = None) -> Optional[ChangeFeed]:
+    """
+    Start the change feed and subscribe the tool result cache to it.
+
+    Without an explicit feed, TACNODE_CHANGE_FEED selects one: ``notify`` installs
+    triggers on TACNODE_WATCH_TABLES and LISTENs on TACNODE_DSN; ``poll`` polls
+    their watermarks over the configured transport. Unset disables caching, since
+    nothing would tell the cache when results go stale.
+    """
+    global change_feed
+    
+    if feed is None:
+        mode = os.getenv("TACNODE_CHANGE_FEED", "")
+        tables = [t.strip() for t in os.getenv("TACNODE_WATCH_TABLES", "test").split(",") if t.strip()]
+        
+        if mode == "notify":
+            feed = NotifyChangeFeed(tacnode_client.dsn or "")
+            # Schema entries are only invalidated by the DDL event trigger (needs superuser)
+            await feed.install_triggers(tables, include_ddl=True)
+        elif mode == "poll":
+            poll_client = TacnodeClient(
+                tacnode_client.endpoint, tacnode_client.api_key,
+                transport=tacnode_client.transport, dsn=tacnode_client.dsn
+            )
+            feed = PollingChangeFeed(
+                poll_client, tables,
+                interval=float(os.getenv("TACNODE_CHANGE_POLL_SECONDS", "5")),
+                owns_client=True
+            )
+        else:
+            return None
+    
+    feed.subscribe(result_cache.on_change)
+    await feed.start()
+    change_feed = feed
+    return feed
+
+# Calibrated EXPLAIN-cost latency model for approximate aggregations
+latency_estimator = LatencyEstimator()
+
+# Query embeddings: cache misses from concurrent searches are encoded together
+_embedding_service: Optional[EmbeddingService] = None
+
+def get_embedding_service() -> EmbeddingService:
+    """
+    Shared EmbeddingService, built on the first vector search.
+
+    Creating the provider opens a Bedrock client or loads a local model, and the
+    cache may open its SQLite file, so importing the tools does none of that.
+    """
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService(
+            create_embedding_provider(),
+            EmbeddingCache(
+                max_entries=int(os.getenv("EMBEDDINGS_CACHE_SIZE", "10000")),
+                path=os.getenv("EMBEDDINGS_CACHE_PATH")
+            ),
+            max_batch_size=int(os.getenv("EMBEDDINGS_BATCH_SIZE", "64")),
+            max_wait_ms=float(os.getenv("EMBEDDINGS_BATCH_WAIT_MS", "5"))
+        )
+    return _embedding_service
+
+# Aggregations matching an installed rollup read from it instead of scanning the base table
+rollup_manager = RollupManager(tacnode_client, mode=os.getenv("TACNODE_ROLLUP_MODE", "trigger"))
+for _spec in DEFAULT_ROLLUPS:
+    if rollup_manager.mode == "trigger" or _spec.watermark_column:
+        rollup_manager.register(_spec)
+
+async def install_rollups():
+    """Create and backfill every registered rollup that is missing or outdated so aggregations can be routed to it"""
+    async with tacnode_client:
+        await rollup_manager.install_all()
+
+async def _cached_query(key: Any, query: str, parameters: Optional[Dict], tables: List[str]) -> Dict[str, Any]:
+    """Run a query through result_cache when a change feed keeps it fresh"""
+    if change_feed is not None:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+    # A change notified while the query runs must keep its (possibly pre-change) result out of the cache
+    generation = result_cache.generation(tables)
+    
+    async with tacnode_client as client:
+        result = await client.execute_query(query, parameters)
+    
+    if change_feed is not None and result["success"]:
+        result_cache.set(key, result, tables, generation)
+    return result
+
 @tool
-async def tacnode_query(query: str, parameters: Optional[Dict] = None) -> str:
+async def tacnode_query(query: str, parameters: Optional[Dict] = None,
+                        max_rows: Optional[int] = None) -> str:
     """
     Execute a SQL query against Tacnode Context Lake.
     
     Args:
         query: SQL query string
         parameters: Optional query parameters for parameterized queries
+        max_rows: Optional cap on returned rows; the result is streamed and
+            truncated so large result sets are never fully loaded
         
     Returns:
         JSON string containing query results
     """
-    if not tacnode_client.endpoint or not tacnode_client.api_key:
+    if not tacnode_client.is_configured():
         return json.dumps({
-            "error": "Tacnode configuration missing. Please set TACNODE_ENDPOINT and TACNODE_API_KEY."
+            "error": "Tacnode configuration missing. Please set TACNODE_ENDPOINT and TACNODE_API_KEY (or TACNODE_DSN for the postgres transport)."
         })
     
+    if max_rows is not None:
+        rows = []
+        truncated = False
+        try:
+            async with tacnode_client as client:
+                async with aclosing(client.execute_query_stream(query, parameters, guard=True)) as stream:
+                    async for row in stream:
+                        if len(rows) >= max_rows:
+                            truncated = True
+                            break
+                        rows.append(row)
+        except Exception as e:
+            logger.error(f"Streaming query failed: {e}")
+            return json.dumps({
+                "error": str(e)
+            })
+        
+        return json.dumps({
+            "data": rows,
+            "row_count": len(rows),
+            "truncated": truncated
+        }, indent=2, default=str)
+    
     async with tacnode_client as client:
-        result = await client.execute_query(query, parameters)
+        result = await client.execute_query(query, parameters, guard=True)
         
     if result["success"]:
-        return json.dumps({
+        response = {
             "data": result["data"],
             "columns": result["columns"],
             "row_count": result["row_count"],
             "execution_time_ms": result["execution_time_ms"]
-        }, indent=2)
+        }
+        if "guard" in result:
+            response["query_guard"] = result["guard"]["reason"]
+        return json.dumps(response, indent=2, default=str)
     else:
         return json.dumps({
             "error": result["error"]
         })
 
+@tool
+async def tacnode_batch_query(queries: List[str], concurrency: int = 5) -> str:
+    """
+    Execute several independent SQL queries against Tacnode Context Lake in one call.
+    
+    Args:
+        queries: List of SQL query strings that do not depend on each other
+        concurrency: Maximum number of queries in flight at once
+        
+    Returns:
+        JSON string containing one result per query, in the order given
+    """
+    if not tacnode_client.is_configured():
+        return json.dumps({
+            "error": "Tacnode configuration missing. Please set TACNODE_ENDPOINT and TACNODE_API_KEY (or TACNODE_DSN for the postgres transport)."
+        })
+    
+    start = time.perf_counter()
+    async with tacnode_client as client:
+        results = await client.execute_many(queries, concurrency=concurrency, guard=True)
+    
+    return json.dumps({
+        "results": [
+            {
+                "query": r["query"],
+                "data": r["data"],
+                "row_count": r["row_count"],
+                "elapsed_ms": r["elapsed_ms"],
+                **({"query_guard": r["guard"]["reason"]} if "guard" in r else {})
+            } if r["success"] else {
+                "query": r["query"],
+                "error": r["error"],
+                "elapsed_ms": r["elapsed_ms"]
+            }
+            for r in results
+        ],
+        "total_elapsed_ms": (time.perf_counter() - start) * 1000
+    }, indent=2, default=str)
+
 @tool
 async def tacnode_vector_search(query_text: str, table: str, 
                               vector_column: str = "embedding", 
@@ -157,18 +808,15 @@ async def tacnode_vector_search(query_text: str, table: str,
     Returns:
         JSON string containing search results
     """
-    # Note: In a real implementation, you would convert query_text to embeddings
-    # using a model like Amazon Bedrock Titan Embeddings
-    
-    # For demo purposes, we'll use a placeholder vector
-    # In production, you would do something like:
-    # query_vector = await get_embeddings(query_text)
-    
-    placeholder_vector = [0.1] * 1536  # Typical embedding dimension
+    try:
+        embedding_service = get_embedding_service()
+        query_vector = await embedding_service.embed(query_text)
+    except Exception as e:
+        return json.dumps({"error": f"Failed to embed query text: {e}"})
     
     async with tacnode_client as client:
         result = await client.vector_search(
-            query_vector=placeholder_vector,
+            query_vector=query_vector,
             table=table,
             vector_column=vector_column,
             top_k=top_k
@@ -177,9 +825,10 @@ async def tacnode_vector_search(query_text: str, table: str,
     if result["success"]:
         return json.dumps({
             "query_text": query_text,
+            "embedding_model": embedding_service.model_id,
             "results": result["results"],
             "execution_time_ms": result["execution_time_ms"]
-        }, indent=2)
+        }, indent=2, default=str)
     else:
         return json.dumps({
             "error": result["error"]
@@ -213,15 +862,17 @@ async def tacnode_schema_info(table_name: Optional[str] = None) -> str:
         """
         parameters = None
     
-    async with tacnode_client as client:
-        result = await client.execute_query(query, parameters)
+    # Any change to the table (or DDL, reported as all tables) invalidates its schema entry
+    result = await _cached_query(
+        ("schema", table_name), query, parameters, [table_name] if table_name else []
+    )
     
     if result["success"]:
         return json.dumps({
             "table_name": table_name,
             "schema_info": result["data"],
             "execution_time_ms": result["execution_time_ms"]
-        }, indent=2)
+        }, indent=2, default=str)
     else:
         return json.dumps({
             "error": result["error"]
@@ -251,7 +902,7 @@ async def tacnode_real_time_stats() -> str:
         return json.dumps({
             "system_stats": stats,
             "execution_time_ms": result["execution_time_ms"]
-        }, indent=2)
+        }, indent=2, default=str)
     else:
         return json.dumps({
             "error": result["error"]
@@ -288,7 +939,7 @@ async def tacnode_data_freshness(table_name: str, timestamp_column: str = "creat
             "table_name": table_name,
             "freshness_info": freshness_info,
             "execution_time_ms": result["execution_time_ms"]
-        }, indent=2)
+        }, indent=2, default=str)
     else:
         return json.dumps({
             "error": result["error"]
@@ -297,7 +948,10 @@ async def tacnode_data_freshness(table_name: str, timestamp_column: str = "creat
 @tool
 async def tacnode_aggregation_query(table_name: str, group_by: str, 
                                   aggregate_column: str, 
-                                  aggregate_function: str = "COUNT") -> str:
+                                  aggregate_function: str = "COUNT",
+                                  where: Optional[str] = None,
+                                  approximate: bool = False,
+                                  max_latency_ms: Optional[float] = None) -> str:
     """
     Perform aggregation queries on Tacnode Context Lake data.
     
@@ -306,9 +960,14 @@ async def tacnode_aggregation_query(table_name: str, group_by: str,
         group_by: Column to group by
         aggregate_column: Column to aggregate (use '*' for COUNT)
         aggregate_function: Aggregation function (COUNT, SUM, AVG, MAX, MIN)
+        where: Optional filter condition applied before grouping (e.g. "is_active = true")
+        approximate: Allow a sampled estimate when the exact query would be slow
+        max_latency_ms: Latency budget; implies approximate. Exact results are
+            still returned when the estimated cost fits the budget
         
     Returns:
-        JSON string containing aggregation results
+        JSON string containing aggregation results, with "mode" set to
+        "exact" or "approximate" (approximate results carry 95% confidence intervals)
     """
     # Validate aggregate function
     valid_functions = ["COUNT", "SUM", "AVG", "MAX", "MIN"]
@@ -327,22 +986,48 @@ async def tacnode_aggregation_query(table_name: str, group_by: str,
         {group_by},
         {aggregate_expr} as {aggregate_function.lower()}_value
     FROM {table_name}
+    {f"WHERE {where}" if where else ""}
     GROUP BY {group_by}
     ORDER BY {aggregate_expr} DESC
     LIMIT 100
     """
     
-    async with tacnode_client as client:
-        result = await client.execute_query(query)
+    rollup_table = None
+    try:
+        async with tacnode_client:
+            routed = await rollup_manager.route(table_name, group_by, aggregate_function, aggregate_column, where)
+        if routed:
+            query, spec = routed
+            rollup_table = spec.rollup_table
+    except Exception as e:
+        logger.warning(f"Rollup routing failed, querying {table_name} directly: {e}")
+    
+    if (approximate or max_latency_ms) and rollup_table is None:
+        budget_ms = max_latency_ms or float(os.getenv("TACNODE_APPROX_BUDGET_MS", "1000"))
+        async with tacnode_client as client:
+            result = await approximate_aggregation(
+                client, latency_estimator, query, table_name, aggregate_column,
+                aggregate_function, group_by, budget_ms, where
+            )
+    else:
+        result = await _cached_query(("aggregation", query), query, None, [table_name])
+        result["mode"] = "exact"
     
     if result["success"]:
-        return json.dumps({
+        response = {
             "table_name": table_name,
             "group_by": group_by,
+            "where": where,
             "aggregate_function": aggregate_function,
             "results": result["data"],
+            "rollup_table": rollup_table,
+            "mode": result["mode"],
             "execution_time_ms": result["execution_time_ms"]
-        }, indent=2)
+        }
+        for key in ("estimated_exact_ms", "sample_percent", "confidence_level"):
+            if key in result:
+                response[key] = result[key]
+        return json.dumps(response, indent=2, default=str)
     else:
         return json.dumps({
             "error": result["error"]
@@ -351,9 +1036,12 @@ async def tacnode_aggregation_query(table_name: str, group_by: str,
 # Export all tools for easy import
 __all__ = [
     "tacnode_query",
+    "tacnode_batch_query",
     "tacnode_vector_search", 
     "tacnode_schema_info",
     "tacnode_real_time_stats",
     "tacnode_data_freshness",
-    "tacnode_aggregation_query"
+    "tacnode_aggregation_query",
+    "start_change_feed",
+    "install_rollups"
 ]
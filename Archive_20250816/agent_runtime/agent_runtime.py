@@ -8,7 +8,11 @@ import asyncio
 import json
 import logging
 import os
+import re
+import sys
+import time
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, Any, List, Optional
 
 import boto3
@@ -18,6 +22,14 @@ from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 from pydantic import BaseModel
 
+# Sampling estimators are shared with AgentCore's tacnode_aggregation_query; the
+# container image copies tools/ next to this file instead
+sys.path.append(str(Path(__file__).resolve().parent.parent / "AgentCore" / "src"))
+from tools.tacnode_sampling import (
+    CONFIDENCE_LEVEL, LatencyEstimator, sample_percent, sampled_fraction,
+    sampled_moments_query, scale_sampled_rows
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,6 +47,21 @@ class AgentResponse(BaseModel):
     session_id: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
+class TACNodeSQLClient:
+    """``execute_query`` over the MCP execute_sql tool, as the shared sampling helpers expect"""
+    
+    def __init__(self, runtime: "TACNodeAgentRuntime"):
+        self.runtime = runtime
+    
+    async def execute_query(self, query: str, parameters: Optional[List[Any]] = None) -> Dict[str, Any]:
+        # execute_sql takes no bind parameters, so %s placeholders are inlined as string literals
+        if parameters:
+            query = query % tuple("'" + str(p).replace("'", "''") + "'" for p in parameters)
+        records = await self.runtime.execute_tacnode_sql(query)
+        if records is None:
+            return {"success": False, "error": "TACNode query failed"}
+        return {"success": True, "data": records}
+
 class TACNodeAgentRuntime:
     """Custom AgentCore Runtime for TACNode Context Lake integration"""
     
@@ -44,6 +71,30 @@ class TACNodeAgentRuntime:
         self.gateway_id = "tacnodecontextlakegateway-bkq6ozcvxp"
         self.tacnode_token = os.getenv('TACNODE_TOKEN')
         
+        # Query results are cached per SQL; a background poll of the watched tables'
+        # catalog statistics evicts them once TACNode data changes, so the TTL can be long
+        self.cache_ttl = float(os.getenv('TACNODE_CACHE_TTL_SECONDS', '3600'))
+        self.change_poll_interval = float(os.getenv('TACNODE_CHANGE_POLL_SECONDS', '5'))
+        self.watch_tables = [t.strip().lower() for t in os.getenv('TACNODE_WATCH_TABLES', 'test').split(',') if t.strip()]
+        self.result_cache: Dict[str, Dict[str, Any]] = {}
+        self.table_watermarks: Dict[str, Any] = {}
+        self._change_poll_task: Optional[asyncio.Task] = None
+        
+        # Summary and trend questions read trigger-maintained rollups (see
+        # tools/tacnode_rollups.py) instead of re-aggregating the whole table
+        self.use_rollups = os.getenv('TACNODE_ROLLUPS_ENABLED', 'false').lower() == 'true'
+        self.rollup_sources = {
+            'rollup_test_active_by_category': 'test',
+            'rollup_test_by_date': 'test'
+        }
+        
+        # Exploratory summary/trend requests may trade exactness for latency: when the
+        # request context sets max_latency_ms (or approximate) and EXPLAIN predicts the
+        # exact query would overrun it, the aggregate is estimated from a TABLESAMPLE
+        self.latency_estimator = LatencyEstimator()
+        self.sql_client = TACNodeSQLClient(self)
+        self.default_latency_budget_ms = float(os.getenv('TACNODE_APPROX_BUDGET_MS', '1000'))
+        
         # Setup routes
         self.setup_routes()
         
@@ -52,6 +103,17 @@ class TACNodeAgentRuntime:
     def setup_routes(self):
         """Setup FastAPI routes for the agent runtime"""
         
+        @self.app.on_event("startup")
+        async def start_change_watch():
+            """Start polling TACNode table watermarks for cache invalidation"""
+            if self.change_poll_interval > 0 and self.tacnode_token:
+                self._change_poll_task = asyncio.create_task(self.watch_table_changes())
+        
+        @self.app.on_event("shutdown")
+        async def stop_change_watch():
+            if self._change_poll_task:
+                self._change_poll_task.cancel()
+        
         @self.app.get("/health")
         async def health_check():
             """Health check endpoint"""
@@ -101,7 +163,7 @@ class TACNodeAgentRuntime:
         # Step 2: Get TACNode data if needed
         tacnode_data = None
         if needs_data:
-            tacnode_data = await self.get_tacnode_data(request.message)
+            tacnode_data = await self.get_tacnode_data(request.message, request.context)
         
         # Step 3: Generate Claude response with context
         response = await self.generate_claude_response(request.message, tacnode_data, request.context)
@@ -119,14 +181,115 @@ class TACNodeAgentRuntime:
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in data_keywords)
     
-    async def get_tacnode_data(self, query: str) -> Optional[Dict[str, Any]]:
+    async def get_tacnode_data(self, query: str, context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """Get relevant data from TACNode Context Lake"""
+        # Determine what type of data query to make based on the user query
+        sql_query = self.generate_sql_query(query)
+        
+        context = context or {}
+        template = self.sampling_template(query)
+        if template and (context.get('approximate') or context.get('max_latency_ms')):
+            budget_ms = float(context.get('max_latency_ms') or self.default_latency_budget_ms)
+            approximate = await self.get_approximate_data(sql_query, template, budget_ms)
+            if approximate is not None:
+                return approximate
+        
+        # Only trust the cache while the change watcher is running to invalidate it
+        cached = self.result_cache.get(sql_query) if self.cache_enabled() else None
+        if cached and time.monotonic() - cached['cached_at'] < self.cache_ttl:
+            logger.info(f"Serving {len(cached['records'])} TACNode records from cache")
+            return {"records": cached['records'], "query": sql_query, "mode": cached['mode']}
+        
+        logger.info("Fetching data from TACNode Context Lake...")
+        data = await self.execute_tacnode_sql(sql_query)
+        if data is None:
+            return None
+        
+        logger.info(f"Retrieved {len(data)} records from TACNode")
+        if self.cache_enabled():
+            self.result_cache[sql_query] = {
+                "records": data,
+                "mode": "exact",
+                "cached_at": time.monotonic(),
+                "tables": {
+                    self.rollup_sources.get(t.lower(), t.lower())
+                    for t in re.findall(r'\bFROM\s+(\w+)', sql_query, re.IGNORECASE)
+                }
+            }
+        return {"records": data, "query": sql_query, "mode": "exact"}
+    
+    def sampling_template(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """Sampled form of the summary/trend templates (None for other queries or when rollups serve them)"""
+        query_lower = user_query.lower()
+        if self.use_rollups:
+            return None
+        if 'summary' in query_lower or 'overview' in query_lower:
+            return {
+                "table": "test", "group": "category", "alias": "category", "where": "is_active = true",
+                "columns": [("COUNT", "*", "count"), ("AVG", "value", "avg_value"), ("SUM", "value", "total_value")],
+                "order_by": "total_value"
+            }
+        if ('recent' in query_lower or 'latest' in query_lower or
+                ('high' in query_lower and 'value' in query_lower)):
+            return None
+        if 'trend' in query_lower or 'time' in query_lower:
+            return {
+                "table": "test", "group": "DATE(created_date)", "alias": "date", "where": None,
+                "columns": [("COUNT", "*", "records"), ("AVG", "value", "avg_value")],
+                "order_by": "date"
+            }
+        return None
+    
+    def scale_sampled_template(self, rows: List[Dict[str, Any]], template: Dict[str, Any],
+                               fraction: float) -> List[Dict[str, Any]]:
+        """One record per group with every template column estimated from the same sample"""
+        alias = template['alias']
+        records: Dict[Any, Dict[str, Any]] = {}
+        for function, column, name in template['columns']:
+            for row in scale_sampled_rows(rows, function, column, alias, fraction, limit=len(rows)):
+                record = records.setdefault(row[alias], {alias: row[alias]})
+                record[name] = row[f"{function.lower()}_value"]
+                record[f"{name}_ci"] = [row['ci_low'], row['ci_high']]
+        
+        # Descending like the exact query, groups without an estimate last
+        order = template['order_by']
+        ranked = sorted((r for r in records.values() if r[order] is not None), key=lambda r: r[order], reverse=True)
+        return ranked + [r for r in records.values() if r[order] is None]
+    
+    async def get_approximate_data(self, sql_query: str, template: Dict[str, Any],
+                                   budget_ms: float) -> Optional[Dict[str, Any]]:
+        """Sampled summary/trend data, or None when the exact query fits the budget"""
+        cost = await self.latency_estimator.plan_cost(self.sql_client, sql_query)
+        estimated_ms = self.latency_estimator.estimate_ms(cost) if cost is not None else None
+        if estimated_ms is None or estimated_ms <= budget_ms:
+            return None
+        
+        percent = sample_percent(estimated_ms, budget_ms)
+        sampled_query = sampled_moments_query(template['table'], "value", template['group'], percent, template['where'])
+        rows = await self.execute_tacnode_sql(sampled_query)
+        if rows is None:
+            return None
+        
+        fraction = await sampled_fraction(self.sql_client, template['table'], rows, percent)
+        data = self.scale_sampled_template(rows, template, fraction)
+        logger.info(f"Estimated {len(data)} groups from a {fraction * 100:.2f}% sample "
+                    f"(exact query estimated at {estimated_ms:.0f}ms, budget {budget_ms:.0f}ms)")
+        return {
+            "records": data,
+            "query": sampled_query,
+            "mode": "approximate",
+            "sample_percent": fraction * 100,
+            "confidence_level": CONFIDENCE_LEVEL,
+            "estimated_exact_ms": estimated_ms
+        }
+    
+    def cache_enabled(self) -> bool:
+        """Whether the change watcher is alive to keep cached results fresh"""
+        return self._change_poll_task is not None and not self._change_poll_task.done()
+    
+    async def execute_tacnode_sql(self, sql_query: str) -> Optional[List[Dict[str, Any]]]:
+        """Run one SQL statement through the TACNode MCP server"""
         try:
-            logger.info("Fetching data from TACNode Context Lake...")
-            
-            # Determine what type of data query to make based on the user query
-            sql_query = self.generate_sql_query(query)
-            
             headers = {
                 'Authorization': f'Bearer {self.tacnode_token}',
                 'Content-Type': 'application/json'
@@ -155,20 +318,64 @@ class TACNodeAgentRuntime:
                 if response.status_code == 200:
                     result = response.json()
                     if 'result' in result and 'content' in result['result']:
-                        data = json.loads(result['result']['content'][0]['text'])
-                        logger.info(f"Retrieved {len(data)} records from TACNode")
-                        return {"records": data, "query": sql_query}
+                        return json.loads(result['result']['content'][0]['text'])
                     
         except Exception as e:
             logger.error(f"Error fetching TACNode data: {e}")
         
         return None
     
+    def watermark_query(self) -> str:
+        """Catalog-stats watermark for every watched table, as AgentCore's PollingChangeFeed reads it"""
+        names = ", ".join("'" + name.replace("'", "''") + "'" for name in self.watch_tables)
+        # Write counters, relfilenode (moved by TRUNCATE) and a column fingerprint (moved by
+        # ALTER TABLE) come from the catalogs, so a poll never scans the tables themselves
+        return f"""
+        SELECT c.relname AS table_name, c.relfilenode::bigint AS relfilenode,
+               s.n_tup_ins, s.n_tup_upd, s.n_tup_del,
+               (SELECT md5(string_agg(a.attname || ':' || format_type(a.atttypid, a.atttypmod), ',' ORDER BY a.attnum))
+                FROM pg_attribute a
+                WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped) AS columns
+        FROM pg_class c
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE c.relname IN ({names}) AND pg_table_is_visible(c.oid)
+        """
+    
+    async def watch_table_changes(self):
+        """Poll the watched tables' watermarks and evict cached results when one moves"""
+        while True:
+            records = await self.execute_tacnode_sql(self.watermark_query())
+            if records is not None:
+                rows = {row['table_name']: row for row in records}
+                for table in self.watch_tables:
+                    # A dropped table has no row; that moves its watermark too
+                    row = rows.get(table)
+                    watermark = json.dumps(row, sort_keys=True, default=str) if row else None
+                    previous = self.table_watermarks.get(table, "unset")
+                    self.table_watermarks[table] = watermark
+                    
+                    if previous != "unset" and previous != watermark:
+                        stale = [sql for sql, entry in self.result_cache.items() if table in entry['tables']]
+                        for sql in stale:
+                            del self.result_cache[sql]
+                        logger.info(f"TACNode table '{table}' changed, invalidated {len(stale)} cached results")
+            
+            await asyncio.sleep(self.change_poll_interval)
+    
     def generate_sql_query(self, user_query: str) -> str:
         """Generate appropriate SQL query based on user request"""
         query_lower = user_query.lower()
         
-        if 'summary' in query_lower or 'overview' in query_lower:
+        if ('summary' in query_lower or 'overview' in query_lower) and self.use_rollups:
+            return """
+            SELECT category, row_count as count,
+                   sum_0 / NULLIF(count_0, 0) as avg_value,
+                   CASE WHEN count_0 > 0 THEN sum_0 END as total_value
+            FROM rollup_test_active_by_category
+            WHERE row_count > 0
+            ORDER BY total_value DESC
+            """
+        elif 'summary' in query_lower or 'overview' in query_lower:
             return """
             SELECT category, COUNT(*) as count, 
                    AVG(CAST(value AS DECIMAL)) as avg_value,
@@ -193,6 +400,14 @@ class TACNodeAgentRuntime:
             WHERE CAST(value AS DECIMAL) > 100 
             ORDER BY CAST(value AS DECIMAL) DESC
             """
+        elif ('trend' in query_lower or 'time' in query_lower) and self.use_rollups:
+            return """
+            SELECT date, row_count as records,
+                   sum_0 / NULLIF(count_0, 0) as avg_value
+            FROM rollup_test_by_date
+            WHERE row_count > 0
+            ORDER BY date DESC
+            """
         elif 'trend' in query_lower or 'time' in query_lower:
             return """
             SELECT DATE(created_date) as date, 
@@ -238,11 +453,18 @@ Always provide specific, actionable insights based on the real data available.""
         user_prompt = message
         
         if tacnode_data and tacnode_data.get('records'):
+            approximation_note = ""
+            if tacnode_data.get('mode') == 'approximate':
+                approximation_note = (
+                    f" (estimated from a {float(tacnode_data['sample_percent']):.2f}% sample; "
+                    f"*_ci columns are [low, high] {tacnode_data['confidence_level']:.0%} confidence intervals)"
+                )
             data_context = f"""
 
 REAL-TIME DATA FROM TACNODE CONTEXT LAKE:
 Query executed: {tacnode_data.get('query', 'N/A')}
 Records retrieved: {len(tacnode_data['records'])}
+Result mode: {tacnode_data.get('mode', 'exact')}{approximation_note}
 
 Data:
 {json.dumps(tacnode_data['records'], indent=2)}
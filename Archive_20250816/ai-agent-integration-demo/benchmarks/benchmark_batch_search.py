@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batched similarity search throughput
+Loads synthetic documents through TacnodeVectorStore and compares queries
+per second of one similarity_search call per query with
+similarity_search_batch at increasing batch sizes, on pgvector and on the
+in-memory backend. Every run uses fresh query texts so the embedding cache
+does not hide the encode cost.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from stage3_tacnode_complete import TacnodeVectorStore
+from benchmark_ingestion import WORDS, clear, make_documents
+
+def make_queries(count: int, run: int) -> list:
+    return [f"{WORDS[(run + i) % len(WORDS)]} {WORDS[(run * 7 + i * 3) % len(WORDS)]} question {run}-{i}"
+            for i in range(count)]
+
+async def run_single(store: TacnodeVectorStore, queries: list, k: int) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        await store.similarity_search(query, k=k, threshold=0.0)
+    return time.perf_counter() - start
+
+async def run_batched(store: TacnodeVectorStore, queries: list, k: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        await store.similarity_search_batch(queries[offset:offset + batch_size], k=k, threshold=0.0)
+    return time.perf_counter() - start
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure similarity search throughput vs batch size")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--documents", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--batch-sizes", default="1,8,32,128,512")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    store = TacnodeVectorStore(pool)
+    await store.initialize()
+
+    print("📊 BATCH SEARCH BENCHMARK: queries/second vs batch size")
+    print("=" * 78)
+    await clear(store)
+    await store.add_documents(make_documents(args.documents))
+    await store.index_manager.ensure_index(wait=True)
+    print(f"Documents: {args.documents:,}, queries per run: {args.queries}, k: {args.k}, "
+          f"index: {store.index_manager.current}")
+
+    rows = []
+    run = 0
+    backends = [("pgvector", False), ("memory", True)]
+    for backend, use_memory in backends:
+        store.search_backend = backend
+        if use_memory:
+            await store.select_backend()
+
+        run += 1
+        seconds = await run_single(store, make_queries(args.queries, run), args.k)
+        rows.append((backend, "similarity_search", 1, args.queries / seconds))
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            run += 1
+            seconds = await run_batched(store, make_queries(args.queries, run), args.k, batch_size)
+            rows.append((backend, "similarity_search_batch", batch_size, args.queries / seconds))
+        store.memory_index.clear()
+
+    await clear(store)
+    await pool.close()
+
+    print()
+    print(f"{'Backend':<10} {'Call':<24} {'Batch':>6} {'Queries/s':>11} {'Speedup':>8}")
+    print("-" * 64)
+    baseline = {}
+    for backend, call, batch_size, qps in rows:
+        baseline.setdefault(backend, qps)
+        print(f"{backend:<10} {call:<24} {batch_size:>6} {qps:>11.0f} {qps / baseline[backend]:>7.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
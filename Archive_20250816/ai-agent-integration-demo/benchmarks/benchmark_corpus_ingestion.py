@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming corpus ingestion
+Writes a synthetic JSONL corpus (a share of long articles that get chunked),
+then streams it through CorpusIngestionPipeline with 1..N encode worker
+processes and reports documents/second per stage (read+chunk, encode, write)
+plus the peak RSS of the run, which should stay flat as the corpus grows.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import resource
+import tempfile
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from stage3_tacnode_complete import TacnodeVectorStore
+from corpus_ingestion import CorpusIngestionPipeline
+from benchmark_ingestion import WORDS
+
+def write_corpus(path: str, records: int, long_share: float):
+    with open(path, "w") as f:
+        for i in range(records):
+            length = 900 if (i % 100) < long_share * 100 else 60
+            words = " ".join(WORDS[(i * k + k // 7) % len(WORDS)] for k in range(1, length))
+            f.write(json.dumps({
+                "id": f"bench_{i:07d}",
+                "title": f"Corpus article {i}",
+                "content": f"Article {i}. {words}",
+                "category": WORDS[i % len(WORDS)],
+                "tags": [WORDS[(i + 3) % len(WORDS)]]
+            }) + "\n")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure streaming corpus ingestion throughput")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--long-share", type=float, default=0.1, help="Share of records long enough to be chunked")
+    parser.add_argument("--workers", default=",".join(str(w) for w in sorted({1, os.cpu_count() or 1})))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    store = TacnodeVectorStore(pool)
+    store.search_backend = "pgvector"
+    await store.initialize()
+
+    print("📊 CORPUS INGESTION BENCHMARK: docs/s per stage vs encode workers")
+    print("=" * 78)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus.jsonl")
+        write_corpus(corpus, args.records, args.long_share)
+        print(f"Corpus: {args.records:,} records, {os.path.getsize(corpus) / 1024 / 1024:.0f}MB, "
+              f"CPU cores: {os.cpu_count()}")
+
+        for workers in (int(w) for w in args.workers.split(",")):
+            async with pool.acquire() as conn:
+                await conn.execute("DELETE FROM knowledge_embeddings WHERE content_id LIKE 'bench_%'")
+            pipeline = CorpusIngestionPipeline(store, workers=workers, batch_size=args.batch_size)
+            summary = await pipeline.ingest(corpus, checkpoint_path=os.path.join(tmp, "checkpoint.json"), resume=False)
+            rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+            rows.append((workers, summary, rss))
+
+    async with pool.acquire() as conn:
+        await conn.execute("DELETE FROM knowledge_embeddings WHERE content_id LIKE 'bench_%'")
+    await store.index_manager.stop()
+    await pool.close()
+
+    print()
+    print(f"{'Workers':>7} {'Documents':>10} {'Total/s':>9} {'Read/s':>9} {'Encode/s':>9} {'Write/s':>9} {'Peak RSS MB':>12}")
+    print("-" * 72)
+    for workers, s, rss in rows:
+        print(f"{workers:>7} {s['documents']:>10,} {s['docs_per_second']:>9.0f} {s['read_docs_per_second']:>9.0f} "
+              f"{s['encode_docs_per_second']:>9.0f} {s['write_docs_per_second']:>9.0f} {rss:>12.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: embedding model backends for the Stage 3 agent
+Each backend runs in a fresh interpreter so startup time and memory are not
+shared. Reports agent-side startup (registry handle), model load time, RSS
+after load, per-query encode latency, and how long the event loop stays
+responsive while queries are encoded in the worker pool.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+QUERIES = [
+    "How do I reset my password?",
+    "My premium subscription isn't working with the new mobile app",
+    "Integration issues with third-party APIs causing data sync problems",
+    "What are the benefits of upgrading to premium?",
+    "I can't activate my account and need help with mobile app setup"
+]
+
+async def loop_lag_ms(model, rounds: int) -> float:
+    """Worst event-loop stall while encodes run in the worker pool"""
+    worst = 0.0
+    stop = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst = max(worst, (time.perf_counter() - start) * 1000 - 1)
+
+    task = asyncio.create_task(ticker())
+    for i in range(rounds):
+        await model.encode_async(QUERIES[i % len(QUERIES)])
+    stop.set()
+    await task
+    return worst
+
+def child(backend: str, model_name: str, rounds: int) -> dict:
+    from embedding_models import get_embedding_model, _rss_mb
+
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    model = get_embedding_model(model_name, backend)
+    handle_ms = (time.perf_counter() - start) * 1000
+
+    model.load()
+    model.encode(QUERIES[0])  # warm-up
+
+    latencies = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        model.encode(QUERIES[i % len(QUERIES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "backend": backend,
+        "handle_ms": handle_ms,
+        "load_s": model.load_time,
+        "rss_mb": _rss_mb() - rss_start,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "loop_lag_ms": asyncio.run(loop_lag_ms(model, rounds))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding model backends")
+    parser.add_argument("--backends", default="torch,int8,onnx")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.model, args.rounds)))
+        return
+
+    print("📊 EMBEDDING MODEL BENCHMARK: startup, memory and encode latency per backend")
+    print("=" * 86)
+    print(f"Model: {args.model}, queries: {args.rounds}, CPU cores: {os.cpu_count()}")
+
+    rows = []
+    for backend in args.backends.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", backend.strip(), "--model", args.model,
+             "--rounds", str(args.rounds)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"   {backend}: failed ({proc.stderr.strip().splitlines()[-1] if proc.stderr else 'no output'})")
+            continue
+        rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print()
+    print(f"{'Backend':<8} {'Handle ms':>10} {'Load s':>8} {'RSS MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'Loop lag ms':>12}")
+    print("-" * 68)
+    for r in rows:
+        print(f"{r['backend']:<8} {r['handle_ms']:>10.3f} {r['load_s']:>8.2f} {r['rss_mb']:>8.0f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['loop_lag_ms']:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark: graph backends on identical synthetic graphs
+For each graph size, loads the same power-law graph from
+benchmark_graph_traversal into a scratch edge table and, for every backend
+of graph_backends that can run here, measures:
+- setup: initialize plus building the in-process graph / Neo4j mirror
+- memory: what the backend keeps in this process (tracemalloc) and the edge
+  table with its indexes in Postgres
+- p50/p95 latency of a k-hop lookup from one entity, per depth
+- overlap: the share of the csr backend's edges per lookup that the backend
+  returns too (the CTE expands a node once per path, so it can differ)
+- throughput of depth-2 lookups with --concurrency lookups in flight
+sql-bfs is the csr backend above GRAPH_CACHE_MAX_EDGES (expansion in SQL).
+Backends whose package or server is missing are skipped with a note. The
+summary names the fastest backend per size.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from graph_traversal import GraphTraversal
+from graph_backends import PostgresCTEBackend, NetworkXTraversal, Neo4jBackend
+from benchmark_graph_traversal import EDGES_TABLE, edge_key, load_graph, make_edges, overlap
+
+BACKENDS = ("csr", "sql-bfs", "cte", "networkx", "neo4j")
+
+def create_backend(pool: TacnodeConnectionPool, name: str):
+    if name == "csr":
+        return GraphTraversal(pool, edges_table=EDGES_TABLE, cache_max_edges=sys.maxsize, check_interval=3600)
+    if name == "sql-bfs":
+        return GraphTraversal(pool, edges_table=EDGES_TABLE, cache_max_edges=0, check_interval=3600)
+    if name == "cte":
+        return PostgresCTEBackend(pool, edges_table=EDGES_TABLE)
+    if name == "networkx":
+        return NetworkXTraversal(pool, edges_table=EDGES_TABLE, cache_max_edges=sys.maxsize, check_interval=3600)
+    return Neo4jBackend(pool, edges_table=EDGES_TABLE, check_interval=3600)
+
+async def setup(pool: TacnodeConnectionPool, name: str, measure_memory: bool):
+    """Initialized backend with its graph built; with ``measure_memory``, also the bytes it retains"""
+    backend = create_backend(pool, name)
+    start = time.perf_counter()
+    if measure_memory:
+        tracemalloc.start()
+    async with pool.acquire() as conn:
+        await backend.initialize(conn)
+    if isinstance(backend, GraphTraversal):
+        await backend.adjacency()
+    if isinstance(backend, Neo4jBackend):
+        # The mirror is rebuilt in the background; lookups would run in SQL until it is done
+        await backend.wait_for_mirror()
+    memory = tracemalloc.get_traced_memory()[0] if measure_memory else 0
+    if measure_memory:
+        tracemalloc.stop()
+    return backend, time.perf_counter() - start, memory
+
+async def latency(backend, seeds: list, depth: int) -> dict:
+    """Latency percentiles, plus each seed's result edges for the overlap"""
+    latencies, results = [], {}
+    for seed in seeds:
+        start = time.perf_counter()
+        rows = await backend.traverse(seed, max_depth=depth)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[seed] = {edge_key(row) for row in rows}
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95)),
+            "results": results}
+
+async def throughput(backend, seeds: list, concurrency: int) -> float:
+    queue = list(seeds)
+
+    async def worker():
+        while queue:
+            await backend.traverse(queue.pop(), max_depth=2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(seeds) / (time.perf_counter() - start)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare graph backends on identical synthetic graphs")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Edges per graph; nodes are a fifth of that")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--depths", default="1,2,3")
+    parser.add_argument("--requests", type=int, default=100, help="Lookups per depth and for the throughput run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass (it doubles setup time)")
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=args.concurrency)
+    await pool.open()
+
+    print("📊 GRAPH BACKEND BENCHMARK: k-hop latency, throughput and memory per graph size")
+    print("=" * 78)
+    depths = [int(d) for d in args.depths.split(",")]
+    rows = []
+    skipped = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        sources, targets, types, strengths = make_edges(max(size // 5, 10), size)
+        await load_graph(pool, sources, targets, types, strengths)
+        degrees = np.bincount(np.concatenate([sources, targets]))
+        rng = np.random.default_rng(11)
+        seeds = [f"n{i}" for i in rng.choice(np.flatnonzero(degrees), args.requests)]
+        print(f"Graph: {size:,} edges over {size // 5:,} nodes")
+
+        for name in args.backends.split(","):
+            if name in skipped:
+                continue
+            try:
+                memory = 0
+                if not args.no_memory and name in ("csr", "networkx"):
+                    backend, _, memory = await setup(pool, name, measure_memory=True)
+                    await backend.close()
+                backend, setup_seconds, _ = await setup(pool, name, measure_memory=False)
+            except Exception as e:
+                skipped[name] = f"{type(e).__name__}: {e}"
+                print(f"  {name}: skipped ({skipped[name]})")
+                continue
+
+            # The edge table with the indexes initialize adds: the Postgres footprint of every backend
+            async with pool.acquire() as conn:
+                table_bytes = await conn.fetchval("SELECT pg_total_relation_size($1)", EDGES_TABLE)
+            result = {"setup_s": setup_seconds, "client_mb": memory / 1024 / 1024,
+                      "server_mb": table_bytes / 1024 / 1024}
+            for depth in depths:
+                result[depth] = await latency(backend, seeds, depth)
+            result["qps"] = await throughput(backend, seeds, args.concurrency)
+            await backend.close()
+            # Against the csr results of this size; NaN when csr was not measured
+            reference = result if name == "csr" else next((r for s, n, r in rows if s == size and n == "csr"), None)
+            for depth in depths:
+                result[depth]["overlap"] = (overlap(result[depth]["results"], reference[depth]["results"])
+                                            if reference else float("nan"))
+            rows.append((size, name, result))
+            print(f"  {name}: done in {setup_seconds:.1f}s setup")
+
+        async with pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {EDGES_TABLE}")
+            await conn.execute("DELETE FROM graph_versions WHERE table_name = $1", EDGES_TABLE)
+    await pool.close()
+
+    print()
+    header = " ".join(f"{f'd{d} p50':>8} {f'd{d} p95':>8} {f'd{d} ovl':>7}" for d in depths)
+    print(f"{'Edges':>10} {'Backend':<9} {'Setup s':>8} {'Client MB':>10} {'PG MB':>7} {header} {'q/s':>8}")
+    print("-" * (57 + 26 * len(depths)))
+    for size, name, r in rows:
+        timings = " ".join(f"{r[d]['p50_ms']:>8.2f} {r[d]['p95_ms']:>8.2f} {r[d]['overlap']:>7.2f}" for d in depths)
+        print(f"{size:>10,} {name:<9} {r['setup_s']:>8.2f} {r['client_mb']:>10.1f} {r['server_mb']:>7.1f} "
+              f"{timings} {r['qps']:>8,.0f}")
+
+    print()
+    ranked_depth = 2 if 2 in depths else depths[0]
+    print(f"Fastest backend per size (depth-{ranked_depth} p50 / throughput):")
+    for size in dict.fromkeys(size for size, _, _ in rows):
+        measured = [(name, r) for s, name, r in rows if s == size]
+        by_latency = min(measured, key=lambda m: m[1][ranked_depth]['p50_ms'])
+        by_throughput = max(measured, key=lambda m: m[1]['qps'])
+        print(f"  {size:>10,} edges: {by_latency[0]} / {by_throughput[0]}")
+    for name, reason in skipped.items():
+        print(f"Not measured: {name} ({reason})")
+    print("ovl: share of the csr backend's edges per lookup the backend also returns (1.00 = same edges).")
+    print("GRAPH_BACKEND selects the backend; sql-bfs is GRAPH_BACKEND=csr with GRAPH_CACHE_MAX_EDGES below that size.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk graph loading
+Creates scratch copies of graph_nodes / graph_edges (same schema, foreign
+keys and indexes as TacnodeGraphStore) and measures:
+- the old row-by-row INSERT on a small sample, for reference
+- GraphBulkLoader on the full synthetic power-law graph (10M edges by
+  default) with secondary indexes and foreign keys deferred, in edges/s
+- an incremental re-load of a slice (existing edges plus new ones) with all
+  indexes live, checking that re-loaded edges are merged, not duplicated
+- compaction of injected duplicates by ensure_unique_edges
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from graph_loader import GraphBulkLoader, ensure_unique_edges
+from graph_traversal import GraphTraversal
+from benchmark_graph_traversal import RELATIONSHIP_TYPES, make_edges
+
+NODES_TABLE = "graph_bench_nodes"
+EDGES_TABLE = "graph_bench_edges"
+
+async def create_tables(pool: TacnodeConnectionPool):
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {EDGES_TABLE}")
+        await conn.execute(f"DROP TABLE IF EXISTS {NODES_TABLE}")
+        await conn.execute(f"""
+            CREATE TABLE {NODES_TABLE} (
+                id SERIAL PRIMARY KEY,
+                node_id VARCHAR(100) UNIQUE NOT NULL,
+                node_type VARCHAR(50) NOT NULL,
+                properties JSONB,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        await conn.execute(f"""
+            CREATE TABLE {EDGES_TABLE} (
+                id SERIAL PRIMARY KEY,
+                source_node_id VARCHAR(100) NOT NULL,
+                target_node_id VARCHAR(100) NOT NULL,
+                relationship_type VARCHAR(50) NOT NULL,
+                properties JSONB,
+                strength FLOAT DEFAULT 1.0,
+                created_at TIMESTAMP DEFAULT NOW(),
+                FOREIGN KEY (source_node_id) REFERENCES {NODES_TABLE}(node_id),
+                FOREIGN KEY (target_node_id) REFERENCES {NODES_TABLE}(node_id)
+            )
+        """)
+        await conn.execute(f"CREATE INDEX ON {EDGES_TABLE}(source_node_id)")
+        await conn.execute(f"CREATE INDEX ON {EDGES_TABLE}(target_node_id)")
+        await ensure_unique_edges(conn, EDGES_TABLE)
+        await GraphTraversal(pool, edges_table=EDGES_TABLE).initialize(conn)
+
+def edge_records(sources, targets, types, strengths):
+    for s, t, r, w in zip(sources, targets, types, strengths):
+        yield {"source": f"n{s}", "target": f"n{t}", "type": RELATIONSHIP_TYPES[r], "strength": float(w)}
+
+async def row_by_row(pool: TacnodeConnectionPool, edges: list) -> float:
+    """The per-edge INSERT add_sample_data used to run; returns edges/s"""
+    start = time.perf_counter()
+    async with pool.acquire() as conn:
+        for edge in edges:
+            await conn.execute(f"""
+                INSERT INTO {EDGES_TABLE} (source_node_id, target_node_id, relationship_type, strength)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT DO NOTHING
+            """, edge["source"], edge["target"], edge["type"], edge["strength"])
+    return len(edges) / (time.perf_counter() - start)
+
+async def edge_count(pool: TacnodeConnectionPool) -> int:
+    async with pool.acquire() as conn:
+        return await conn.fetchval(f"SELECT COUNT(*) FROM {EDGES_TABLE}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure bulk graph loading throughput")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--nodes", type=int, default=1000000)
+    parser.add_argument("--edges", type=int, default=10000000)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--incremental", type=int, default=1000000, help="Edges in the re-load slice")
+    parser.add_argument("--row-sample", type=int, default=5000)
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+
+    print("📊 GRAPH LOADING BENCHMARK: COPY + merge vs row-by-row")
+    print("=" * 78)
+    sources, targets, types, strengths = make_edges(args.nodes, args.edges)
+    await create_tables(pool)
+    loader = GraphBulkLoader(pool, batch_size=args.batch_size, nodes_table=NODES_TABLE, edges_table=EDGES_TABLE)
+
+    nodes = await loader.load_nodes({"node_id": f"n{i}", "node_type": "entity"} for i in range(args.nodes))
+    print(f"Nodes: {nodes['nodes']:,} in {nodes['seconds']:.1f}s ({nodes['nodes_per_second']:,.0f}/s)")
+
+    sample = list(edge_records(sources[:args.row_sample], targets[:args.row_sample],
+                               types[:args.row_sample], strengths[:args.row_sample]))
+    row_rate = await row_by_row(pool, sample)
+    print(f"Row-by-row INSERT: {row_rate:,.0f} edges/s ({args.row_sample:,} edges)")
+
+    def report(summary):
+        if summary["edges"] % (args.batch_size * 20) == 0:
+            print(f"  {summary['edges']:>12,} edges, {summary['edges'] / summary['seconds']:,.0f} edges/s")
+
+    bulk = await loader.load_edges(edge_records(sources, targets, types, strengths),
+                                   defer_constraints=True, progress=report)
+    stored = await edge_count(pool)
+    print(f"Bulk load: {bulk['edges']:,} edges in {bulk['seconds']:.1f}s = {bulk['edges_per_second']:,.0f} edges/s "
+          f"(COPY {bulk['copy_seconds']:.1f}s, merge {bulk['merge_seconds']:.1f}s, "
+          f"index rebuild + FK validation {bulk['rebuild_seconds']:.1f}s); {stored:,} unique edges stored")
+
+    # Half the slice re-loads stored edges with new strengths, half is new edges
+    rng = np.random.default_rng(3)
+    half = args.incremental // 2
+    existing = rng.choice(args.edges, half, replace=False)
+    new_sources, new_targets, new_types, new_strengths = make_edges(args.nodes, half, seed=99)
+    slice_records = list(edge_records(sources[existing], targets[existing], types[existing],
+                                      rng.uniform(0.3, 1.0, half).round(3)))
+    slice_records += list(edge_records(new_sources, new_targets, new_types, new_strengths))
+    incremental = await loader.load_edges(slice_records)
+    grown = await edge_count(pool) - stored
+    print(f"Incremental upsert (indexes live): {incremental['edges']:,} edges in {incremental['seconds']:.1f}s "
+          f"= {incremental['edges_per_second']:,.0f} edges/s; table grew by {grown:,} "
+          f"(at most {half:,} new edges offered)")
+
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP INDEX idx_{EDGES_TABLE}_unique")
+        injected = int((await conn.execute(f"""
+            INSERT INTO {EDGES_TABLE} (source_node_id, target_node_id, relationship_type, strength)
+            SELECT source_node_id, target_node_id, relationship_type, strength
+            FROM {EDGES_TABLE} TABLESAMPLE SYSTEM (10)
+        """)).split()[-1])
+        start = time.perf_counter()
+        removed = await ensure_unique_edges(conn, EDGES_TABLE)
+        print(f"Compaction: {removed:,} of {injected:,} injected duplicates removed and unique index rebuilt "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        await conn.execute(f"DROP TABLE IF EXISTS {EDGES_TABLE}")
+        await conn.execute(f"DROP TABLE IF EXISTS {NODES_TABLE}")
+        await conn.execute("DELETE FROM graph_versions WHERE table_name = $1", EDGES_TABLE)
+    await pool.close()
+
+    print()
+    print(f"Bulk loader vs row-by-row: {bulk['edges_per_second'] / row_rate:,.0f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
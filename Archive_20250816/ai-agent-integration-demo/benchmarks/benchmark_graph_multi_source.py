@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: graph step latency by number of entities in a request
+On the synthetic power-law graph from benchmark_graph_traversal, measures
+p50/p95 latency of looking up 1..N seed entities:
+- serially, one traversal per entity (the workflow's old loop)
+- with traverse_many, one set-based traversal seeded with every entity
+for both the SQL expansion and the CSR adjacency cache. The set-based
+lookup issues one query per depth however many seeds it has.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from graph_traversal import GraphTraversal
+from benchmark_graph_traversal import EDGES_TABLE, load_graph, make_edges
+
+async def measure(traversal: GraphTraversal, seed_sets: list, depth: int, batched: bool) -> dict:
+    latencies = []
+    for seeds in seed_sets:
+        start = time.perf_counter()
+        if batched:
+            await traversal.traverse_many(seeds, max_depth=depth)
+        else:
+            for seed in seeds:
+                await traversal.traverse(seed, max_depth=depth)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95))}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare per-entity and set-based graph lookups")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--edges", type=int, default=1000000)
+    parser.add_argument("--entities", default="1,2,4,8,16")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+
+    print("📊 MULTI-SOURCE GRAPH LOOKUP BENCHMARK: per-entity loop vs one traversal")
+    print("=" * 78)
+    sources, targets, types, strengths = make_edges(args.nodes, args.edges)
+    await load_graph(pool, sources, targets, types, strengths)
+    degrees = np.bincount(np.concatenate([sources, targets]), minlength=args.nodes)
+    connected = np.flatnonzero(degrees)
+    print(f"Graph: {args.edges:,} edges over {args.nodes:,} nodes, depth {args.depth}, {args.requests} requests per row")
+
+    sql = GraphTraversal(pool, edges_table=EDGES_TABLE, cache_max_edges=0, check_interval=3600)
+    cached = GraphTraversal(pool, edges_table=EDGES_TABLE, cache_max_edges=sys.maxsize, check_interval=3600)
+    async with pool.acquire() as conn:
+        await cached.initialize(conn)
+    await cached.adjacency()
+
+    rng = np.random.default_rng(11)
+    rows = []
+    for count in (int(c) for c in args.entities.split(",")):
+        seed_sets = [[f"n{i}" for i in rng.choice(connected, count, replace=False)] for _ in range(args.requests)]
+        for backend, traversal in (("SQL", sql), ("CSR cache", cached)):
+            serial = await measure(traversal, seed_sets, args.depth, batched=False)
+            batched = await measure(traversal, seed_sets, args.depth, batched=True)
+            rows.append((count, backend, serial, batched))
+
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {EDGES_TABLE}")
+        await conn.execute("DELETE FROM graph_versions WHERE table_name = $1", EDGES_TABLE)
+    await pool.close()
+
+    print()
+    print(f"{'Entities':>8} {'Backend':<10} {'Loop p50':>10} {'Loop p95':>10} {'Many p50':>10} {'Many p95':>10} {'Speedup':>8}")
+    print("-" * 72)
+    for count, backend, serial, batched in rows:
+        print(f"{count:>8} {backend:<10} {serial['p50_ms']:>10.2f} {serial['p95_ms']:>10.2f} "
+              f"{batched['p50_ms']:>10.2f} {batched['p95_ms']:>10.2f} {serial['p50_ms'] / batched['p50_ms']:>7.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
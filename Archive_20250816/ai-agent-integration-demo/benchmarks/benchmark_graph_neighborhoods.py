@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: materialized neighborhoods for hot entities
+Replays a skewed (Zipf) lookup workload over the synthetic 1M-edge graph,
+two entities per request at depth 2, with a trickle of edge inserts between
+requests. For the SQL traversal and the CSR adjacency cache it reports p50/p95
+request latency without and with the NeighborhoodMaterializer, plus its hit
+rate and how many neighborhoods the edge triggers invalidated. While the
+adjacency cache is current the materializer only counts lookups (an in-process
+traversal is cheaper than the round trip); it serves them while the cache is
+behind a write, so that row shows both what it bypassed and what it served.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from graph_traversal import GraphTraversal
+from graph_neighborhoods import NeighborhoodMaterializer
+from benchmark_graph_traversal import EDGES_TABLE, RELATIONSHIP_TYPES, load_graph, make_edges
+
+async def replay(pool: TacnodeConnectionPool, traversal: GraphTraversal, materializer: NeighborhoodMaterializer,
+                 requests: list, writes: list, write_every: int, refresh_every: int) -> dict:
+    latencies = []
+    for number, seeds in enumerate(requests, start=1):
+        start = time.perf_counter()
+        found = await materializer.lookup(seeds, 2, 20)
+        remaining = [seed for seed in seeds if seed not in found]
+        if remaining:
+            await traversal.traverse_many(remaining, max_depth=2, limit=20)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        if number % write_every == 0 and writes:
+            async with pool.acquire() as conn:
+                await conn.executemany(f"""
+                    INSERT INTO {EDGES_TABLE} (source_node_id, target_node_id, relationship_type, strength)
+                    VALUES ($1, $2, $3, $4)
+                """, writes.pop())
+        if materializer.enabled and number % refresh_every == 0:
+            await materializer.refresh()
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95)),
+            **materializer.stats()}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure materialized neighborhoods on a skewed lookup workload")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--edges", type=int, default=1000000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--entities", type=int, default=1000, help="Distinct entities the workload draws from")
+    parser.add_argument("--zipf", type=float, default=1.3)
+    parser.add_argument("--write-every", type=int, default=50, help="Requests between batches of 20 edge inserts")
+    parser.add_argument("--refresh-every", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=50)
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+
+    print("📊 MATERIALIZED NEIGHBORHOOD BENCHMARK: skewed lookups with concurrent edge writes")
+    print("=" * 78)
+    sources, targets, types, strengths = make_edges(args.nodes, args.edges)
+    degrees = np.bincount(np.concatenate([sources, targets]), minlength=args.nodes)
+    connected = np.flatnonzero(degrees)
+
+    rng = np.random.default_rng(11)
+    entities = [f"n{i}" for i in rng.choice(connected, args.entities, replace=False)]
+    ranks = np.minimum(rng.zipf(args.zipf, (args.requests, 2)), args.entities) - 1
+    requests = [[entities[a], entities[b]] for a, b in ranks]
+    distinct = len({seed for seeds in requests for seed in seeds})
+    print(f"Graph: {args.edges:,} edges; {args.requests:,} requests over {distinct} distinct entities "
+          f"(zipf {args.zipf}), 20 edge inserts every {args.write_every} requests")
+
+    rows = []
+    for backend in ("SQL", "CSR cache"):
+        for top_n in (0, args.top_n):
+            # Same graph, same writes for every run
+            await load_graph(pool, sources, targets, types, strengths)
+            traversal = GraphTraversal(pool, edges_table=EDGES_TABLE, check_interval=1.0,
+                                       cache_max_edges=0 if backend == "SQL" else None)
+            materializer = NeighborhoodMaterializer(pool, traversal, top_n=top_n, min_lookups=3,
+                                                    refresh_interval=float("inf"))
+            async with pool.acquire() as conn:
+                await traversal.initialize(conn)
+                await materializer.initialize(conn)
+            await traversal.adjacency()
+
+            write_rng = np.random.default_rng(5)
+            writes = [[(f"n{s}", f"n{t}", RELATIONSHIP_TYPES[r], float(w)) for s, t, r, w in zip(
+                write_rng.choice(connected, 20), write_rng.choice(connected, 20),
+                write_rng.integers(0, len(RELATIONSHIP_TYPES), 20), write_rng.uniform(0.3, 1.0, 20)
+            )] for _ in range(args.requests // args.write_every)]
+            result = await replay(pool, traversal, materializer, requests, writes,
+                                  args.write_every, args.refresh_every)
+            rows.append((backend, top_n, result))
+
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {EDGES_TABLE}")
+        await conn.execute("DELETE FROM graph_neighborhoods WHERE edges_table = $1", EDGES_TABLE)
+        await conn.execute("DELETE FROM graph_versions WHERE table_name = $1", EDGES_TABLE)
+    await pool.close()
+
+    print()
+    print(f"{'Traversal':<10} {'Top-N':>6} {'p50 ms':>9} {'p95 ms':>9} {'Hit rate':>9} {'Materialized':>13} {'Invalidated':>12} {'Bypassed':>9}")
+    print("-" * 84)
+    for backend, top_n, r in rows:
+        print(f"{backend:<10} {top_n:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['hit_rate']:>9.1%} "
+              f"{r['materialized']:>13} {r['invalidated']:>12} {r['bypassed']:>9}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
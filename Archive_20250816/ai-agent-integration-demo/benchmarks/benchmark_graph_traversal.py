@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark: relationship traversal on a synthetic power-law graph
+Loads a 1M-edge graph (skewed degrees, so hubs and cycles are common) into a
+scratch edge table and measures p50/p95 latency per max_depth of:
+- the original recursive CTE (no visited set, DISTINCT ... LIMIT at the end)
+- the bounded BFS expanded with one SQL query per depth
+- the bounded BFS served from the in-process CSR adjacency cache
+Seeds are split into random nodes and the highest-degree hubs. CTE runs are
+cut off by --timeout; overlap is the share of the CTE's top-20 edges the BFS
+also returns.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+import asyncpg
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tacnode_pool import TacnodeConnectionPool
+from graph_traversal import GraphTraversal
+
+EDGES_TABLE = "graph_bench_edges"
+RELATIONSHIP_TYPES = ["PURCHASED", "USES", "REPORTED", "INCLUDES", "RELATED_TO", "DEPENDS_ON"]
+
+# The query TacnodeGraphStore.find_relationships ran before the BFS engine
+LEGACY_CTE = f"""
+    WITH RECURSIVE relationship_path AS (
+        SELECT
+            e.source_node_id, e.target_node_id, e.relationship_type,
+            e.properties, e.strength, 1 as depth
+        FROM {EDGES_TABLE} e
+        WHERE e.source_node_id = $1 OR e.target_node_id = $1
+
+        UNION ALL
+
+        SELECT
+            e.source_node_id, e.target_node_id, e.relationship_type,
+            e.properties, e.strength * rp.strength * 0.8 as strength,
+            rp.depth + 1
+        FROM {EDGES_TABLE} e
+        JOIN relationship_path rp ON (
+            e.source_node_id = rp.target_node_id OR
+            e.target_node_id = rp.source_node_id
+        )
+        WHERE rp.depth < $2
+    )
+    SELECT DISTINCT * FROM relationship_path
+    ORDER BY strength DESC, depth ASC
+    LIMIT 20
+"""
+
+def make_edges(nodes: int, edges: int, seed: int = 7, skew: float = 0.8):
+    """Endpoints drawn with probability ~ 1 / rank^skew: a few hubs, a long tail, plenty of cycles"""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, nodes + 1) ** skew
+    weights /= weights.sum()
+    sources = rng.choice(nodes, edges, p=weights)
+    targets = rng.choice(nodes, edges, p=weights)
+    types = rng.integers(0, len(RELATIONSHIP_TYPES), edges)
+    strengths = rng.uniform(0.3, 1.0, edges).round(3)
+    return sources, targets, types, strengths
+
+async def load_graph(pool: TacnodeConnectionPool, sources, targets, types, strengths, table: str = EDGES_TABLE):
+    """(Re)create the scratch edge table and COPY the edges in"""
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {table}")
+        await conn.execute(f"""
+            CREATE TABLE {table} (
+                id SERIAL PRIMARY KEY,
+                source_node_id VARCHAR(100) NOT NULL,
+                target_node_id VARCHAR(100) NOT NULL,
+                relationship_type VARCHAR(50) NOT NULL,
+                properties JSONB,
+                strength FLOAT DEFAULT 1.0,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        records = ((f"n{s}", f"n{t}", RELATIONSHIP_TYPES[r], float(w))
+                   for s, t, r, w in zip(sources, targets, types, strengths))
+        await conn.copy_records_to_table(
+            table, records=records,
+            columns=["source_node_id", "target_node_id", "relationship_type", "strength"]
+        )
+        await conn.execute(f"CREATE INDEX ON {table}(source_node_id)")
+        await conn.execute(f"CREATE INDEX ON {table}(target_node_id)")
+        await conn.execute(f"VACUUM ANALYZE {table}")
+
+def edge_key(row) -> tuple:
+    return (row["source_node_id"], row["target_node_id"], row["relationship_type"])
+
+async def measure_cte(pool: TacnodeConnectionPool, seeds: list, depth: int, timeout_s: float):
+    latencies, results, timeouts = [], {}, 0
+    async with pool.acquire() as conn:
+        await conn.execute(f"SET statement_timeout = '{int(timeout_s * 1000)}ms'")
+        for seed in seeds:
+            start = time.perf_counter()
+            try:
+                rows = await conn.fetch(LEGACY_CTE, seed, depth)
+            except asyncpg.QueryCanceledError:
+                timeouts += 1
+                latencies.append(timeout_s * 1000)
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            results[seed] = {edge_key(row) for row in rows}
+        await conn.execute("RESET statement_timeout")
+    return latencies, results, timeouts
+
+async def measure_bfs(traversal: GraphTraversal, seeds: list, depth: int):
+    latencies, results = [], {}
+    for seed in seeds:
+        start = time.perf_counter()
+        rows = await traversal.traverse(seed, max_depth=depth, limit=20)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[seed] = {edge_key(row) for row in rows}
+    return latencies, results
+
+def overlap(results: dict, reference: dict) -> float:
+    shared = [len(results[s] & reference[s]) / len(reference[s]) for s in reference if reference[s] and s in results]
+    return float(np.mean(shared)) if shared else float("nan")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare the recursive CTE with the bounded BFS traversal")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--edges", type=int, default=1000000)
+    parser.add_argument("--depths", default="2,3")
+    parser.add_argument("--seeds", type=int, default=20, help="Random seeds (plus 5 hubs)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="CTE statement timeout in seconds")
+    parser.add_argument("--skip-cte", action="store_true")
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+
+    print("📊 GRAPH TRAVERSAL BENCHMARK: recursive CTE vs bounded BFS")
+    print("=" * 78)
+    sources, targets, types, strengths = make_edges(args.nodes, args.edges)
+    start = time.perf_counter()
+    await load_graph(pool, sources, targets, types, strengths)
+    degrees = np.bincount(np.concatenate([sources, targets]), minlength=args.nodes)
+    print(f"Loaded {args.edges:,} edges over {args.nodes:,} nodes in {time.perf_counter() - start:.1f}s "
+          f"(max degree {degrees.max():,}, median {int(np.median(degrees[degrees > 0]))})")
+
+    rng = np.random.default_rng(11)
+    groups = {
+        "random": [f"n{i}" for i in rng.choice(np.flatnonzero(degrees), args.seeds, replace=False)],
+        "hubs": [f"n{i}" for i in np.argsort(-degrees)[:5]]
+    }
+
+    sql = GraphTraversal(pool, edges_table=EDGES_TABLE, cache_max_edges=0, check_interval=3600)
+    cached = GraphTraversal(pool, edges_table=EDGES_TABLE, cache_max_edges=sys.maxsize, check_interval=3600)
+    async with pool.acquire() as conn:
+        await cached.initialize(conn)
+    start = time.perf_counter()
+    csr = await cached.adjacency()
+    print(f"Adjacency cache: {time.perf_counter() - start:.1f}s to load and build, {csr.nbytes / 1024 / 1024:.0f}MB")
+    print(f"Fanout per depth: {cached.fanouts}")
+
+    rows = []
+    for depth in (int(d) for d in args.depths.split(",")):
+        for group, seeds in groups.items():
+            reference = {}
+            if not args.skip_cte:
+                latencies, reference, timeouts = await measure_cte(pool, seeds, depth, args.timeout)
+                rows.append((depth, group, "recursive CTE", latencies, timeouts, float("nan")))
+            for name, traversal in (("BFS (SQL per depth)", sql), ("BFS (CSR cache)", cached)):
+                latencies, results = await measure_bfs(traversal, seeds, depth)
+                rows.append((depth, group, name, latencies, 0, overlap(results, reference)))
+
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {EDGES_TABLE}")
+        await conn.execute("DELETE FROM graph_versions WHERE table_name = $1", EDGES_TABLE)
+    await pool.close()
+
+    print()
+    print(f"{'Depth':>5} {'Seeds':<7} {'Method':<22} {'p50 ms':>10} {'p95 ms':>10} {'Timeouts':>9} {'Overlap':>8}")
+    print("-" * 78)
+    for depth, group, name, latencies, timeouts, shared in rows:
+        print(f"{depth:>5} {group:<7} {name:<22} {np.percentile(latencies, 50):>10.2f} "
+              f"{np.percentile(latencies, 95):>10.2f} {timeouts:>9} {shared:>8.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
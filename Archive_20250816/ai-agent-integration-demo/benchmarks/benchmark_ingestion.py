@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: TacnodeVectorStore document ingestion
+Compares the original one-document-at-a-time path (single encode + INSERT
+... ON CONFLICT per document) with the bulk path (batched encode, COPY into
+staging, one set-based upsert per chunk) on CPU.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tacnode_pool import TacnodeConnectionPool
+from stage3_tacnode_complete import TacnodeVectorStore
+
+WORDS = ["password", "reset", "premium", "mobile", "sync", "api", "integration", "login",
+         "subscription", "activation", "webhook", "storage", "analytics", "support", "billing"]
+
+def make_documents(count: int) -> list:
+    documents = []
+    for i in range(count):
+        words = " ".join(WORDS[(i * k) % len(WORDS)] for k in range(1, 40))
+        documents.append({
+            "id": f"bench_{i:07d}",
+            "title": f"Benchmark article {i}",
+            "content": f"Article {i}: {words}",
+            "category": WORDS[i % len(WORDS)],
+            "intent_types": ["general_inquiry"],
+            "tags": [WORDS[i % len(WORDS)], WORDS[(i + 3) % len(WORDS)]],
+            "metadata": {"priority": i % 3}
+        })
+    return documents
+
+async def ingest_one_by_one(store: TacnodeVectorStore, documents: list):
+    """The pre-bulk ingestion path, kept here as the baseline"""
+    async with store.pool.acquire() as conn:
+        for doc in documents:
+            embedding = store.embedding_model.encode(doc['content']).tolist()
+            await conn.execute("""
+                INSERT INTO knowledge_embeddings
+                (content_id, title, content, category, intent_types, tags, embedding, metadata)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                ON CONFLICT (content_id) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    content = EXCLUDED.content,
+                    category = EXCLUDED.category,
+                    intent_types = EXCLUDED.intent_types,
+                    tags = EXCLUDED.tags,
+                    embedding = EXCLUDED.embedding,
+                    metadata = EXCLUDED.metadata,
+                    updated_at = NOW()
+            """,
+                doc['id'], doc['title'], doc['content'], doc['category'],
+                doc['intent_types'], doc['tags'], embedding, json.dumps(doc['metadata'])
+            )
+
+async def clear(store: TacnodeVectorStore):
+    async with store.pool.acquire() as conn:
+        await conn.execute("DELETE FROM knowledge_embeddings WHERE content_id LIKE 'bench_%'")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure vector store ingestion throughput")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--baseline-documents", type=int, default=None,
+                        help="Documents for the one-by-one baseline (defaults to --documents)")
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    store = TacnodeVectorStore(pool)
+    await store.initialize()
+
+    documents = make_documents(args.documents)
+    baseline_documents = documents[:args.baseline_documents or args.documents]
+
+    print("📊 INGESTION BENCHMARK: one-by-one vs bulk (batched encode + COPY + upsert)")
+    print("=" * 78)
+    print(f"CPU cores: {os.cpu_count()}, encode batch size: {store.encode_batch_size}, "
+          f"ingest chunk: {store.ingest_batch_size}")
+
+    rows = []
+
+    await clear(store)
+    start = time.perf_counter()
+    await ingest_one_by_one(store, baseline_documents)
+    rows.append(("one-by-one", len(baseline_documents), time.perf_counter() - start))
+
+    await clear(store)
+    last_report = [0.0]
+
+    def report(done, total):
+        now = time.perf_counter()
+        if now - last_report[0] > 5 or done == total:
+            last_report[0] = now
+            print(f"   bulk: {done:,}/{total:,} documents")
+
+    start = time.perf_counter()
+    await store.add_documents(documents, progress=report)
+    rows.append(("bulk", len(documents), time.perf_counter() - start))
+
+    # Re-ingesting the same ids exercises the update side of the upsert
+    start = time.perf_counter()
+    await store.add_documents(documents)
+    rows.append(("bulk (re-upsert)", len(documents), time.perf_counter() - start))
+
+    await clear(store)
+    await pool.close()
+
+    print()
+    print(f"{'Path':<20} {'Documents':>10} {'Seconds':>10} {'Docs/s':>10}")
+    print("-" * 54)
+    for name, count, seconds in rows:
+        print(f"{name:<20} {count:>10,} {seconds:>10.2f} {count / seconds:>10.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
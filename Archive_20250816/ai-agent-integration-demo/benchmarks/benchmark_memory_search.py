@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: in-memory exact search vs pgvector by corpus size
+For 1k, 10k and 100k clustered 384-d vectors, measures p50/p95 query latency
+(including the round trip for pgvector) of:
+- pgvector exact scan and ivfflat (lean query shape)
+- the in-memory NumPy index in float32 and float16
+Recall is against exact top-k, so the in-memory rows should read 1.000.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from vector_memory_index import InMemoryVectorIndex
+from benchmark_vector_search import LEAN_QUERY, TABLE, build_index, load, make_vectors, measure
+
+def measure_memory(index: InMemoryVectorIndex, queries: np.ndarray, truth: list, k: int) -> dict:
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        matches = index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {index.rows[position]["content_id"] for position, _ in matches})
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": hits / sum(len(e) for e in truth)
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare in-memory exact search with pgvector")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+
+    print("📊 IN-MEMORY VECTOR SEARCH BENCHMARK: NumPy exact vs pgvector")
+    print("=" * 78)
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = make_vectors(size, args.dimension, clusters=max(size // 1000, 16), seed=7)
+        rng = np.random.default_rng(11)
+        queries = vectors[rng.integers(0, size, args.queries)] + \
+            0.05 * rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        truth = []
+        for query in queries:
+            top = np.argpartition(-(vectors @ query), args.k)[:args.k]
+            truth.append({int(i) for i in top})
+
+        await load(pool, vectors)
+        rows.append((size, "pgvector exact", await measure(pool, LEAN_QUERY, queries, truth, args.k, -1.0, {})))
+        lists = max(size // 1000, 10)
+        await build_index(pool, f"""
+            CREATE INDEX {TABLE}_embedding_idx ON {TABLE}
+            USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})
+        """)
+        probes = max(int(np.sqrt(lists)), 1)
+        rows.append((size, f"pgvector ivfflat p={probes}", await measure(
+            pool, LEAN_QUERY, queries, truth, args.k, -1.0, {"ivfflat.probes": probes})))
+
+        for dtype in ("float32", "float16"):
+            index = InMemoryVectorIndex(args.dimension, dtype=dtype, path="")
+            start = time.perf_counter()
+            index.upsert([{"content_id": i} for i in range(size)], vectors)
+            build_ms = (time.perf_counter() - start) * 1000
+            result = measure_memory(index, queries, truth, args.k)
+            result["note"] = f"{index.nbytes / 1024 / 1024:.1f}MB, built in {build_ms:.0f}ms"
+            rows.append((size, f"memory {dtype}", result))
+        print(f"{size:,} vectors done")
+
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await pool.close()
+
+    print()
+    print(f"{'Vectors':>9} {'Backend':<24} {'p50 ms':>9} {'p95 ms':>9} {'Recall@k':>9}  Notes")
+    print("-" * 80)
+    for size, name, r in rows:
+        print(f"{size:>9,} {name:<24} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['recall']:>9.3f}  {r.get('note', '')}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
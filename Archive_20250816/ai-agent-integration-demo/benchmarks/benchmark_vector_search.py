@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vector similarity search latency and recall
+Loads clustered random 384-d vectors into a scratch table and measures p50/p95
+latency and recall@k against exact search for:
+- the original query shape (threshold in WHERE, embeddings returned)
+- the lean query shape (ANN ORDER BY ... LIMIT first, threshold after)
+  across ivfflat.probes and hnsw.ef_search settings
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tacnode_pool import TacnodeConnectionPool
+
+TABLE = "vector_search_bench"
+
+LEGACY_QUERY = f"""
+    SELECT id, embedding, 1 - (embedding <=> $1) AS similarity_score
+    FROM {TABLE}
+    WHERE 1 - (embedding <=> $1) > $2
+    ORDER BY embedding <=> $1
+    LIMIT $3
+"""
+
+LEAN_QUERY = f"""
+    SELECT id, 1 - distance AS similarity_score
+    FROM (
+        SELECT id, embedding <=> $1 AS distance
+        FROM {TABLE}
+        ORDER BY embedding <=> $1
+        LIMIT $3
+    ) nearest
+    WHERE distance < 1 - $2::float8
+    ORDER BY distance
+"""
+
+def make_vectors(count: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+async def load(pool: TacnodeConnectionPool, vectors: np.ndarray):
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.execute(f"CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY, embedding vector({vectors.shape[1]}))")
+        await conn.execute("CREATE TEMP TABLE IF NOT EXISTS vector_search_bench_staging (id INTEGER, embedding REAL[])")
+        for offset in range(0, len(vectors), 50000):
+            chunk = vectors[offset:offset + 50000]
+            await conn.copy_records_to_table(
+                "vector_search_bench_staging",
+                records=[(offset + i, v.tolist()) for i, v in enumerate(chunk)]
+            )
+            await conn.execute(f"INSERT INTO {TABLE} SELECT id, embedding::vector FROM vector_search_bench_staging")
+            await conn.execute("TRUNCATE vector_search_bench_staging")
+        await conn.execute(f"ANALYZE {TABLE}")
+
+async def build_index(pool: TacnodeConnectionPool, ddl: str) -> float:
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP INDEX IF EXISTS {TABLE}_embedding_idx")
+        await conn.execute("SET maintenance_work_mem = '1GB'")
+        start = time.perf_counter()
+        await conn.execute(ddl)
+        return time.perf_counter() - start
+
+async def measure(pool: TacnodeConnectionPool, sql: str, queries: np.ndarray, truth: list,
+                  k: int, threshold: float, settings: dict) -> dict:
+    latencies = []
+    hits = 0
+    async with pool.acquire() as conn:
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            async with conn.transaction():
+                for name, value in settings.items():
+                    await conn.execute(f"SET LOCAL {name} = {value}")
+                rows = await conn.fetch(sql, query.tolist(), threshold, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & {row["id"] for row in rows})
+
+    expected_total = sum(len(e) for e in truth)
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": hits / expected_total if expected_total else 1.0
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure vector search latency and recall")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--vectors", type=int, default=1000000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.0,
+                        help="Similarity threshold; recall is measured against exact top-k above it")
+    parser.add_argument("--skip-hnsw", action="store_true", help="HNSW builds are slow on few cores")
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+
+    print("📊 VECTOR SEARCH BENCHMARK: latency and recall@k vs exact search")
+    print("=" * 78)
+    print(f"Vectors: {args.vectors:,} x {args.dimension}, queries: {args.queries}, k: {args.k}")
+
+    vectors = make_vectors(args.vectors, args.dimension, clusters=max(args.vectors // 1000, 16), seed=7)
+    # Queries are perturbed corpus vectors, like a user rephrasing an existing article
+    rng = np.random.default_rng(11)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)] + \
+        0.05 * rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    await load(pool, vectors)
+    print(f"Loaded in {time.perf_counter() - start:.1f}s")
+
+    # Exact ground truth in NumPy (cosine similarity on unit vectors)
+    truth = []
+    for query in queries:
+        similarity = vectors @ query
+        top = np.argpartition(-similarity, args.k)[:args.k]
+        truth.append({int(i) for i in top if similarity[i] > args.threshold})
+
+    rows = []
+    rows.append(("exact (no index)", "lean", await measure(pool, LEAN_QUERY, queries, truth, args.k, args.threshold, {})))
+
+    lists = max(int(np.sqrt(args.vectors)), 10)
+    build = await build_index(pool, f"""
+        CREATE INDEX {TABLE}_embedding_idx ON {TABLE}
+        USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})
+    """)
+    print(f"ivfflat (lists={lists}) built in {build:.1f}s")
+    rows.append((f"ivfflat probes=1", "original", await measure(
+        pool, LEGACY_QUERY, queries, truth, args.k, args.threshold, {"ivfflat.probes": 1})))
+    for probes in (1, 4, 10, 20, 40):
+        rows.append((f"ivfflat probes={probes}", "lean", await measure(
+            pool, LEAN_QUERY, queries, truth, args.k, args.threshold, {"ivfflat.probes": probes})))
+
+    if not args.skip_hnsw:
+        build = await build_index(pool, f"""
+            CREATE INDEX {TABLE}_embedding_idx ON {TABLE}
+            USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+        """)
+        print(f"hnsw (m=16, ef_construction=64) built in {build:.1f}s")
+        for ef_search in (20, 40, 100, 200):
+            rows.append((f"hnsw ef_search={ef_search}", "lean", await measure(
+                pool, LEAN_QUERY, queries, truth, args.k, args.threshold, {"hnsw.ef_search": ef_search})))
+
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await pool.close()
+
+    print()
+    print(f"{'Index':<22} {'Query':<10} {'p50 ms':>10} {'p95 ms':>10} {'Recall@k':>10}")
+    print("-" * 66)
+    for name, shape, r in rows:
+        print(f"{name:<22} {shape:<10} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['recall']:>10.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
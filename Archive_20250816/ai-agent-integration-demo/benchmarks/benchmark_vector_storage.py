@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compact embedding storage options
+Loads clustered random 384-d vectors into a scratch table and, for each
+VECTOR_STORAGE option (full, half, pca, binary), reports bytes per stored
+vector, index size, p50/p95 latency and recall@k against exact search of the
+full-precision vectors. Compact options rank a shortlist on their own column
+and re-rank it with full-precision cosine distance, as the vector store does.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tacnode_pool import TacnodeConnectionPool
+from vector_storage import STORAGE_OPTIONS, create_vector_storage, pgvector_version
+from benchmark_vector_search import TABLE, load, make_vectors
+
+def search_sql(storage, k: int) -> str:
+    if not storage.compact:
+        source = TABLE
+    else:
+        source = f"""(
+            SELECT * FROM {TABLE}
+            ORDER BY {storage.distance_sql("$3")}
+            LIMIT {k * storage.rerank_factor}
+        ) shortlist"""
+    return f"""
+        SELECT id FROM {source}
+        ORDER BY embedding <=> $1
+        LIMIT $2
+    """
+
+async def measure(pool: TacnodeConnectionPool, storage, queries: np.ndarray, truth: list,
+                  k: int, probes: int) -> dict:
+    sql = search_sql(storage, k)
+    latencies = []
+    hits = 0
+    async with pool.acquire() as conn:
+        for query, expected in zip(queries, truth):
+            params = [query.tolist(), k] + ([storage.query_param(query)] if storage.compact else [])
+            start = time.perf_counter()
+            async with conn.transaction():
+                await conn.execute(f"SET LOCAL ivfflat.probes = {probes}")
+                rows = await conn.fetch(sql, *params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & {row["id"] for row in rows})
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": hits / sum(len(e) for e in truth)
+    }
+
+async def prepare(pool: TacnodeConnectionPool, storage, lists: int) -> dict:
+    """Add and fill the compact column, then index it; returns sizes and build time"""
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP INDEX IF EXISTS {TABLE}_storage_idx")
+        if storage.compact:
+            await conn.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS {storage.column}")
+        if storage.name == "pca" and await conn.fetchval("SELECT to_regclass('vector_pca_models') IS NOT NULL"):
+            # Fit on this run's vectors, not a model saved by an earlier run
+            await conn.execute("DELETE FROM vector_pca_models WHERE name = $1", f"{TABLE}.{storage.column}")
+        # initialize fits PCA on the table and fills the compact column
+        await storage.initialize(conn, TABLE)
+        filled = await conn.fetchval(f"SELECT COUNT({storage.column}) FROM {TABLE}") if storage.compact else 0
+        await conn.execute(f"VACUUM ANALYZE {TABLE}")
+
+        build = 0.0
+        if storage.opclass:
+            await conn.execute("SET maintenance_work_mem = '1GB'")
+            start = time.perf_counter()
+            await conn.execute(f"""
+                CREATE INDEX {TABLE}_storage_idx ON {TABLE}
+                USING ivfflat ({storage.column} {storage.opclass}) WITH (lists = {lists})
+            """)
+            build = time.perf_counter() - start
+
+        column_bytes = await conn.fetchval(f"SELECT AVG(pg_column_size({storage.column})) FROM {TABLE}")
+        index_bytes = await conn.fetchval(f"SELECT pg_relation_size(to_regclass('{TABLE}_storage_idx'))")
+    return {"filled": filled, "build_s": build, "column_bytes": float(column_bytes or 0),
+            "index_mb": (index_bytes or 0) / 1024 / 1024}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare compact embedding storage options")
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--probes", type=int, default=10)
+    parser.add_argument("--options", default=",".join(STORAGE_OPTIONS))
+    parser.add_argument("--rerank-factors", default="",
+                        help="Comma-separated shortlist multiples to sweep (default: each option's own)")
+    args = parser.parse_args()
+
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+
+    print("📊 VECTOR STORAGE BENCHMARK: size, latency and recall@k per storage option")
+    print("=" * 78)
+    print(f"Vectors: {args.vectors:,} x {args.dimension}, queries: {args.queries}, k: {args.k}, probes: {args.probes}")
+
+    vectors = make_vectors(args.vectors, args.dimension, clusters=max(args.vectors // 1000, 16), seed=7)
+    rng = np.random.default_rng(11)
+    queries = vectors[rng.integers(0, args.vectors, args.queries)] + \
+        0.05 * rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    await load(pool, vectors)
+    print(f"Loaded in {time.perf_counter() - start:.1f}s")
+
+    truth = []
+    for query in queries:
+        top = np.argpartition(-(vectors @ query), args.k)[:args.k]
+        truth.append({int(i) for i in top})
+
+    async with pool.acquire() as conn:
+        version = await pgvector_version(conn)
+    lists = max(int(np.sqrt(args.vectors)), 10)
+
+    rows = []
+    for name in args.options.split(","):
+        storage = create_vector_storage(name, args.dimension)
+        if name == "half" and version < (0, 7, 0):
+            print(f"Skipping half: pgvector {'.'.join(map(str, version))} has no halfvec (needs 0.7.0)")
+            continue
+        prepared = await prepare(pool, storage, lists)
+        index = "ivfflat" if storage.opclass else "scan"
+        print(f"{name}: filled {prepared['filled']:,} rows, {index} built in {prepared['build_s']:.1f}s")
+        factors = [int(f) for f in args.rerank_factors.split(",") if f] if storage.compact else []
+        for factor in factors or [storage.rerank_factor]:
+            storage.rerank_factor = factor
+            result = await measure(pool, storage, queries, truth, args.k, args.probes)
+            rows.append((name, index, factor, prepared, result))
+
+    async with pool.acquire() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await pool.close()
+
+    print()
+    print(f"{'Storage':<10} {'Index':<8} {'Rerank':>7} {'Bytes/vec':>10} {'Index MB':>10} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'Recall@k':>9}")
+    print("-" * 80)
+    for name, index, factor, prepared, r in rows:
+        print(f"{name:<10} {index:<8} {factor:>7} {prepared['column_bytes']:>10.0f} {prepared['index_mb']:>10.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['recall']:>9.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
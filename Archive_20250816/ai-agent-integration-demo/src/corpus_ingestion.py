@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Streaming corpus ingestion for the Stage 3 knowledge base
+
+Reads JSONL or CSV corpora record by record, splits long texts into
+overlapping chunks, encodes batches in a process pool sized to the cores and
+writes them with the vector store's COPY + upsert path. Chunks left over
+from an earlier, longer version of a document are deleted. Progress is
+checkpointed after every committed batch, so a restarted run on the same,
+unmodified file resumes after the last stored record. At most ``workers * 2`` batches are in flight, which
+bounds memory whatever the corpus size.
+
+Usage:
+    python src/corpus_ingestion.py corpus.jsonl [--workers N] [--batch-size N] [--no-resume]
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Callable
+
+import numpy as np
+
+from embedding_models import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "csv")
+DOCUMENT_FIELDS = ("id", "title", "content", "category", "intent_types", "tags", "metadata")
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if extension in ("csv", "tsv"):
+        return "csv"
+    raise ValueError(f"Cannot tell the corpus format of {path}; pass one of {', '.join(FORMATS)}")
+
+def read_records(path: str, fmt: Optional[str] = None, skip: int = 0) -> Iterator[Dict[str, Any]]:
+    """Stream raw records from a JSONL or CSV file, skipping the first ``skip``"""
+    fmt = fmt or detect_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "jsonl":
+            number = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                number += 1
+                if number > skip:
+                    yield json.loads(line)
+        elif fmt == "csv":
+            delimiter = "\t" if path.lower().endswith(".tsv") else ","
+            for number, record in enumerate(csv.DictReader(f, delimiter=delimiter), start=1):
+                if number > skip:
+                    yield record
+        else:
+            raise ValueError(f"Unsupported corpus format: {fmt}. Must be one of {', '.join(FORMATS)}")
+
+def _as_list(value) -> List[str]:
+    """List fields arrive as JSON lists, or as ';'/'|'/','-separated strings in CSV"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    value = str(value).strip()
+    if value.startswith("["):
+        return [str(v) for v in json.loads(value)]
+    for separator in (";", "|", ","):
+        if separator in value:
+            return [part.strip() for part in value.split(separator) if part.strip()]
+    return [value]
+
+def normalize_record(record: Dict[str, Any], number: int, source: str) -> Dict[str, Any]:
+    """Document in the shape ``TacnodeVectorStore`` expects; unknown fields go to metadata"""
+    content = str(record.get("content") or record.get("text") or record.get("body") or "")
+    metadata = record.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata) if metadata.strip() else {}
+    metadata = {**metadata, **{k: v for k, v in record.items()
+                               if k not in DOCUMENT_FIELDS and k not in ("text", "body") and v not in (None, "")}}
+
+    return {
+        "id": str(record.get("id") or f"{source}:{number}"),
+        "title": str(record.get("title") or content[:80]),
+        "content": content,
+        "category": record.get("category") or "general",
+        "intent_types": _as_list(record.get("intent_types")),
+        "tags": _as_list(record.get("tags")),
+        "metadata": metadata
+    }
+
+def chunk_text(text: str, max_chars: int = 2000, overlap: int = 200) -> List[str]:
+    """Split ``text`` into chunks of at most ``max_chars``, breaking at whitespace where possible"""
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Prefer a paragraph, then a sentence, then a word boundary in the back half of the window
+            for separator in ("\n\n", ". ", " "):
+                cut = text.rfind(separator, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+def _document_id(document_id: str) -> str:
+    """content_id of an unchunked document, hashed down to fit VARCHAR(50)"""
+    if len(document_id) <= 50:
+        return document_id
+    return hashlib.sha1(document_id.encode("utf-8")).hexdigest()
+
+def _chunk_id(document_id: str, index: int) -> str:
+    """``id#n`` for chunk n, hashed down to fit content_id VARCHAR(50)"""
+    chunk_id = f"{document_id}#{index}"
+    if len(chunk_id) <= 50:
+        return chunk_id
+    return f"{hashlib.sha1(document_id.encode('utf-8')).hexdigest()[:40]}#{index}"
+
+def chunk_document(document: Dict[str, Any], max_chars: int, overlap: int) -> List[Dict[str, Any]]:
+    chunks = chunk_text(document["content"], max_chars, overlap)
+    if len(chunks) == 1:
+        return [{**document, "id": _document_id(document["id"])}]
+    return [
+        {**document, "id": _chunk_id(document["id"], i), "content": chunk,
+         "metadata": {**document["metadata"], "parent_id": document["id"], "chunk": i, "chunks": len(chunks)}}
+        for i, chunk in enumerate(chunks)
+    ]
+
+# Model handle of a pool worker process, loaded once by the initializer
+_worker_model = None
+
+def _init_worker(model_name: str, backend: str, threads: int):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = get_embedding_model(model_name, backend)
+    _worker_model.load()
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> Tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    embeddings = _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return np.asarray(embeddings, dtype=np.float32), time.perf_counter() - start
+
+class IngestionStats:
+    """Documents and busy seconds per pipeline stage"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.records = 0
+        self.documents = 0
+        self.batches = 0
+        self.read_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+
+        def rate(seconds: float) -> float:
+            return self.documents / seconds if seconds else 0.0
+
+        return {
+            "records": self.records,
+            "documents": self.documents,
+            "batches": self.batches,
+            "seconds": elapsed,
+            "docs_per_second": rate(elapsed),
+            # Encode time is summed over workers; the aggregate rate is what the pool can sustain
+            "read_docs_per_second": rate(self.read_seconds),
+            "encode_docs_per_second_per_worker": rate(self.encode_seconds),
+            "encode_docs_per_second": rate(self.encode_seconds) * self.workers,
+            "write_docs_per_second": rate(self.write_seconds)
+        }
+
+class CorpusIngestionPipeline:
+    """Streams a corpus file into a ``TacnodeVectorStore`` with parallel encoding and checkpoints"""
+
+    def __init__(self, store, workers: Optional[int] = None, batch_size: Optional[int] = None,
+                 chunk_chars: Optional[int] = None, chunk_overlap: Optional[int] = None):
+        self.store = store
+        self.workers = workers or int(os.getenv('CORPUS_INGEST_WORKERS', '0')) or (os.cpu_count() or 1)
+        self.batch_size = batch_size or int(os.getenv('CORPUS_INGEST_BATCH_SIZE', '1000'))
+        self.chunk_chars = chunk_chars or int(os.getenv('CORPUS_CHUNK_CHARS', '2000'))
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else int(os.getenv('CORPUS_CHUNK_OVERLAP', '200'))
+        self.max_in_flight = self.workers * 2
+
+    @staticmethod
+    def source_version(source: str) -> Dict[str, Any]:
+        """Size and modification time identifying the file contents a checkpoint refers to"""
+        stat = os.stat(source)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @classmethod
+    def load_checkpoint(cls, path: str, source: str) -> Tuple[int, int]:
+        """``(records_done, documents_written)`` for ``source``, zeros without a matching checkpoint"""
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return 0, 0
+        if checkpoint.get("source") != source:
+            return 0, 0
+        if {key: checkpoint.get(key) for key in ("size", "mtime_ns")} != cls.source_version(source):
+            # Record numbers in an edited file no longer line up with the checkpoint
+            logger.warning(f"{source} changed since the checkpoint was written; ingesting from the start")
+            return 0, 0
+        return int(checkpoint.get("records_done", 0)), int(checkpoint.get("documents_written", 0))
+
+    @classmethod
+    def save_checkpoint(cls, path: str, source: str, records_done: int, documents_written: int,
+                        finished: bool = False):
+        # Write-then-rename so a crash mid-write never leaves a truncated checkpoint
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"source": source, **cls.source_version(source), "records_done": records_done,
+                       "documents_written": documents_written, "finished": finished,
+                       "updated_at": time.time()}, f)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    async def delete_stale_chunks(conn, parents: Dict[str, List[str]]) -> int:
+        """
+        Delete rows of the given source documents that the new version no longer has:
+        surplus ``id#n`` chunks, the whole-document row of a now chunked document,
+        or the chunks of a now unchunked one.
+
+        Args:
+            parents: Source document id -> content_ids just written for it
+        """
+        keep = [content_id for content_ids in parents.values() for content_id in content_ids]
+        result = await conn.execute("""
+            DELETE FROM knowledge_embeddings k
+            USING unnest($1::text[], $2::text[]) AS d(parent_id, document_id)
+            WHERE (k.metadata->>'parent_id' = d.parent_id OR k.content_id = d.document_id)
+              AND NOT k.content_id = ANY($3::text[])
+        """, list(parents), [_document_id(parent) for parent in parents], keep)
+        return int(result.split()[-1])
+
+    def _batches(self, records: Iterator[Dict[str, Any]], first_record: int, source: str,
+                 stats: IngestionStats) -> Iterator[Tuple[List[Dict[str, Any]], Dict[str, List[str]], int]]:
+        """
+        ``(documents, parents, records_done_after_batch)`` where ``parents`` maps
+        each source document id to its content_ids; a record's chunks never straddle batches
+        """
+        batch: List[Dict[str, Any]] = []
+        parents: Dict[str, List[str]] = {}
+        number = first_record
+        start = time.perf_counter()
+        for record in records:
+            number += 1
+            document = normalize_record(record, number, source)
+            chunks = chunk_document(document, self.chunk_chars, self.chunk_overlap)
+            parents.setdefault(document["id"], []).extend(chunk["id"] for chunk in chunks)
+            batch.extend(chunks)
+            if len(batch) >= self.batch_size:
+                stats.read_seconds += time.perf_counter() - start
+                yield batch, parents, number
+                batch = []
+                parents = {}
+                start = time.perf_counter()
+        if batch:
+            stats.read_seconds += time.perf_counter() - start
+            yield batch, parents, number
+
+    async def ingest(self, path: str, fmt: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                     resume: bool = True,
+                     progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Ingest every record of ``path`` not yet covered by the checkpoint.
+
+        Args:
+            path: JSONL or CSV corpus
+            fmt: ``jsonl`` or ``csv`` (detected from the extension if omitted)
+            checkpoint_path: Progress file (default ``<path>.checkpoint.json``)
+            resume: Skip records the checkpoint says are stored
+            progress: Optional callback receiving the running stats summary after each batch
+
+        Returns:
+            Stats summary with documents/second per stage
+        """
+        source = os.path.abspath(path)
+        checkpoint_path = checkpoint_path or f"{path}.checkpoint.json"
+        skip, documents_written = self.load_checkpoint(checkpoint_path, source) if resume else (0, 0)
+        if skip:
+            logger.info(f"Resuming {path} after record {skip:,}")
+
+        stats = IngestionStats(self.workers)
+        model = self.store.embedding_model
+        loop = asyncio.get_running_loop()
+        executor = None
+        if self.workers > 1:
+            # spawn: forked children would inherit the event loop and any loaded model threads
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model.model_name, model.backend, max(1, (os.cpu_count() or 1) // self.workers))
+            )
+
+        def encode(texts: List[str]):
+            if executor is not None:
+                return loop.run_in_executor(executor, _encode_in_worker, texts, self.store.encode_batch_size)
+
+            async def encode_here():
+                start = time.perf_counter()
+                embeddings = await model.encode_async(texts, batch_size=self.store.encode_batch_size,
+                                                      convert_to_numpy=True, show_progress_bar=False)
+                return np.asarray(embeddings, dtype=np.float32), time.perf_counter() - start
+            return asyncio.ensure_future(encode_here())
+
+        pending: deque = deque()
+        last_log = time.perf_counter()
+        stale_deleted = 0
+
+        async def write_oldest(conn):
+            nonlocal documents_written, last_log, stale_deleted
+            documents, parents, records_done, future = pending.popleft()
+            embeddings, encode_seconds = await future
+            stats.encode_seconds += encode_seconds
+
+            start = time.perf_counter()
+            async with conn.transaction():
+                await self.store.write_embedded(conn, documents, embeddings)
+                stale_deleted += await self.delete_stale_chunks(conn, parents)
+            stats.write_seconds += time.perf_counter() - start
+
+            stats.batches += 1
+            stats.documents += len(documents)
+            stats.records = records_done - skip
+            documents_written += len(documents)
+            self.save_checkpoint(checkpoint_path, source, records_done, documents_written)
+
+            if progress:
+                progress(stats.summary())
+            if time.perf_counter() - last_log > 10:
+                last_log = time.perf_counter()
+                summary = stats.summary()
+                logger.info(f"Ingested {summary['records']:,} records ({summary['documents']:,} documents, "
+                            f"{summary['docs_per_second']:.0f} docs/s)")
+
+        try:
+            async with self.store.pool.acquire() as conn:
+                records = read_records(path, fmt, skip=skip)
+                for documents, parents, records_done in self._batches(records, skip, os.path.basename(path), stats):
+                    pending.append((documents, parents, records_done, encode([doc["content"] for doc in documents])))
+                    # Bounded in-flight work keeps memory flat however large the corpus is
+                    if len(pending) >= self.max_in_flight:
+                        await write_oldest(conn)
+                while pending:
+                    await write_oldest(conn)
+                if stale_deleted:
+                    logger.info(f"Deleted {stale_deleted:,} stale chunks of re-ingested documents")
+                    if self.store.memory_index.loaded:
+                        # Deleted rows only leave the in-memory index on a reload
+                        await self.store.memory_index.sync(conn)
+        finally:
+            for _, _, _, future in pending:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        self.save_checkpoint(checkpoint_path, source, skip + stats.records, documents_written, finished=True)
+        await self.store.select_backend()
+        await self.store.index_manager.ensure_index(wait=False)
+
+        summary = stats.summary()
+        logger.info(f"Ingested {path}: {summary['records']:,} records as {summary['documents']:,} documents "
+                    f"in {summary['seconds']:.1f}s ({summary['docs_per_second']:.0f} docs/s; "
+                    f"read {summary['read_docs_per_second']:.0f}, encode {summary['encode_docs_per_second']:.0f}, "
+                    f"write {summary['write_docs_per_second']:.0f} docs/s)")
+        return summary
+
+async def main():
+    from tacnode_pool import TacnodeConnectionPool
+    from stage3_tacnode_complete import TacnodeVectorStore
+
+    parser = argparse.ArgumentParser(description="Stream a JSONL/CSV corpus into the Tacnode knowledge base")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--chunk-chars", type=int)
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--no-resume", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    store = TacnodeVectorStore(pool)
+    await store.initialize()
+    try:
+        pipeline = CorpusIngestionPipeline(store, workers=args.workers, batch_size=args.batch_size,
+                                           chunk_chars=args.chunk_chars)
+        summary = await pipeline.ingest(args.path, args.format, args.checkpoint, resume=not args.no_resume)
+        await store.index_manager.ensure_index(wait=True)
+    finally:
+        await store.index_manager.stop()
+        await pool.close()
+
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
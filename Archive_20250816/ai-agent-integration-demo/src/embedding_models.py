@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Process-wide embedding model registry for the Stage 3 agent
+
+Models are loaded on first use and shared by every store and agent in the
+process, so constructing an agent no longer pays the model load. Encoding
+runs in a shared worker pool to keep the event loop responsive.
+
+Backends:
+- torch: sentence-transformers on PyTorch (default)
+- int8:  PyTorch with dynamic int8 quantization of the Linear layers
+- onnx:  sentence-transformers ONNX Runtime backend (EMBEDDING_ONNX_FILE selects
+         a pre-quantized export such as onnx/model_qint8_avx2.onnx)
+"""
+
+import os
+import re
+import time
+import asyncio
+import hashlib
+import logging
+import resource
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8", "onnx")
+
+_models: Dict[Tuple[str, str], "EmbeddingModel"] = {}
+_models_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _encode_executor() -> ThreadPoolExecutor:
+    """Shared worker pool for encode calls (PyTorch and ONNX Runtime release the GIL)"""
+    global _executor
+    with _models_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('EMBEDDING_WORKERS', str(min(4, os.cpu_count() or 1)))),
+                thread_name_prefix="embedding"
+            )
+        return _executor
+
+class EmbeddingModel:
+    """Lazily loaded sentence embedding model shared across the process"""
+
+    def __init__(self, model_name: str, backend: str = "torch"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {backend}. Must be one of {', '.join(BACKENDS)}")
+        self.model_name = model_name
+        self.backend = backend
+        self._model = None
+        self._load_lock = threading.Lock()
+        self.load_time = None
+        self.load_rss_mb = None
+        self.encode_calls = 0
+        self.encode_time = 0.0
+        # Single-text encodes only: what a query-cache hit actually avoids
+        self.query_encode_calls = 0
+        self.query_encode_time = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Load the model now instead of on first encode"""
+        if self._model is not None:
+            return self._model
+
+        with self._load_lock:
+            if self._model is None:
+                rss_before = _rss_mb()
+                start = time.time()
+                self._model = self._load_backend()
+                self.load_time = time.time() - start
+                self.load_rss_mb = _rss_mb() - rss_before
+                logger.info(f"Loaded embedding model {self.model_name} ({self.backend}) in "
+                            f"{self.load_time:.2f}s, +{self.load_rss_mb:.0f}MB RSS")
+        return self._model
+
+    def _load_backend(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            onnx_file = os.getenv('EMBEDDING_ONNX_FILE')
+            model_kwargs = {"file_name": onnx_file} if onnx_file else None
+            return SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+        model = SentenceTransformer(self.model_name, device="cpu")
+        if self.backend == "int8":
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """Blocking encode; same arguments as SentenceTransformer.encode"""
+        model = self.load()
+        start = time.time()
+        try:
+            return model.encode(texts, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            self.encode_calls += 1
+            self.encode_time += elapsed
+            if isinstance(texts, str):
+                self.query_encode_calls += 1
+                self.query_encode_time += elapsed
+
+    @property
+    def query_encode_seconds(self) -> float:
+        """Average latency of encoding one query on its own (0 until one has been measured)"""
+        return self.query_encode_time / self.query_encode_calls if self.query_encode_calls else 0.0
+
+    async def encode_async(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """Encode in the shared worker pool so the event loop keeps serving other requests"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_encode_executor(), lambda: self.encode(texts, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "backend": self.backend,
+            "loaded": self.loaded,
+            "load_time": self.load_time,
+            "load_rss_mb": self.load_rss_mb,
+            "encode_calls": self.encode_calls,
+            "avg_encode_ms": self.encode_time / self.encode_calls * 1000 if self.encode_calls else 0.0,
+            "avg_query_encode_ms": self.query_encode_seconds * 1000
+        }
+
+def get_embedding_model(model_name: Optional[str] = None, backend: Optional[str] = None) -> EmbeddingModel:
+    """
+    Shared model handle for ``model_name``/``backend`` (defaults: EMBEDDING_MODEL, EMBEDDING_BACKEND).
+
+    Nothing is loaded until the first encode (or an explicit ``load()``).
+    """
+    model_name = model_name or os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    backend = (backend or os.getenv('EMBEDDING_BACKEND', 'torch')).lower()
+    key = (model_name, backend)
+
+    with _models_lock:
+        if key not in _models:
+            _models[key] = EmbeddingModel(model_name, backend)
+        return _models[key]
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive cache key form of a query (the models used here are uncased)"""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of Stage 3 query embeddings, shared by the agent's
+    request handlers and the embedding worker threads (hence the lock).
+
+    Keys combine model name, backend and the normalized query, so the torch,
+    int8 and onnx backends never serve each other's vectors. With ``path``
+    (EMBEDDING_QUERY_CACHE_PATH) the table also lives in SQLite and a
+    restarted demo answers the questions it has already seen without loading
+    the model at all.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+        self.db: Optional[sqlite3.Connection] = None
+
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+            self.db.commit()
+
+    @staticmethod
+    def key(model: EmbeddingModel, text: str) -> str:
+        model_id = f"{model.model_name}/{model.backend}"
+        return hashlib.sha256(f"{model_id}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None and self.db is not None:
+                row = self.db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+
+            if vector is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)",
+                                (key, vector.tobytes()))
+                self.db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def embed(self, model: EmbeddingModel, text: str) -> Tuple[np.ndarray, bool, float]:
+        """
+        Query embedding from the cache, or from the model on a miss.
+
+        Returns:
+            ``(embedding, cache_hit, seconds_saved)``; seconds saved is the
+            model's average single-query encode time when the lookup was a hit
+        """
+        key = self.key(model, text)
+        cached = self.get(key)
+        if cached is not None:
+            saved = model.query_encode_seconds
+            self.time_saved += saved
+            return cached, True, saved
+
+        # Only the key is normalized; the model sees the query as asked
+        embedding = await model.encode_async(text.strip())
+        self.put(key, embedding)
+        return embedding, False, 0.0
+
+    async def embed_many(self, model: EmbeddingModel, texts: List[str],
+                         batch_size: int = 64) -> Tuple[np.ndarray, int]:
+        """
+        Embeddings for ``texts`` with every cache miss encoded in one batched model call.
+
+        Returns:
+            ``(embeddings, cache_hits)`` with one row per text, in order
+        """
+        keys = [self.key(model, text) for text in texts]
+        vectors = [self.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            # Repeats of one query within the batch are encoded once
+            first: Dict[str, int] = {}
+            for i in missing:
+                first.setdefault(keys[i], i)
+            encoded = await model.encode_async([texts[i].strip() for i in first.values()],
+                                               batch_size=batch_size, convert_to_numpy=True,
+                                               show_progress_bar=False)
+            by_key = dict(zip(first, encoded))
+            for key, vector in by_key.items():
+                self.put(key, vector)
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+
+        hits = len(texts) - len(missing)
+        self.time_saved += hits * model.query_encode_seconds
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1), hits
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "time_saved_ms": self.time_saved * 1000,
+            "persistent": self.db is not None
+        }
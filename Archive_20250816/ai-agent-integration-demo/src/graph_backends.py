@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Graph backends for the Stage 3 graph store
+
+TacnodeGraphStore traverses through the ``GraphBackend`` interface
+(graph_traversal); GRAPH_BACKEND picks the implementation:
+
+- csr:      bounded BFS from an in-process CSR adjacency of the edge table,
+            one SQL query per depth once the graph outgrows
+            GRAPH_CACHE_MAX_EDGES (GraphTraversal, the default)
+- cte:      one cycle-safe recursive CTE per lookup, everything in Postgres
+- networkx: the BFS over an in-process NetworkX MultiGraph
+- neo4j:    the BFS expanded in Neo4j over Bolt, on a mirror of the edge
+            table re-synced in the background when its version changes
+
+All of them score edges the same way (fanout-capped, strength x path x
+decay) and keep Postgres as the source of truth, so the neighborhood
+materializer works with any of them. The BFS backends expand every node once,
+from its strongest path; the CTE expands a node once per path reaching it and
+keeps each edge's best score, so it can rank edges the BFS never reaches.
+benchmarks/benchmark_graph_backends.py compares them on identical graphs and
+reports how much of the csr backend's result each of them returns.
+"""
+
+import os
+import sys
+import time
+import heapq
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from graph_traversal import GraphBackend, GraphTraversal, strongest_edges_sql
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BACKENDS = ("csr", "cte", "networkx", "neo4j")
+
+class PostgresCTEBackend(GraphBackend):
+    """
+    Every lookup is one recursive CTE seeded with all nodes.
+
+    Unlike the original CTE, each step takes only a node's ``fanout(depth)``
+    strongest edges and a path stops at a node it already passed through, so
+    cycles cannot multiply the rows. There is no visited set shared across
+    paths, so a node reached by several paths is expanded once per path.
+    """
+
+    name = "cte"
+
+    def __init__(self, pool, edges_table: str = "graph_edges", fanouts: Optional[List[int]] = None,
+                 decay: float = 0.8):
+        super().__init__(pool, edges_table, fanouts, decay)
+        self.queries = 0
+
+    def _walk_sql(self) -> str:
+        fanout = "($3::int[])[LEAST(w.depth + 1, array_length($3::int[], 1))]"
+        return f"""
+            WITH RECURSIVE walk AS (
+                SELECT seeds.seed, e.id, e.neighbor_id::text AS node_id, e.strength, 1 AS depth,
+                       e.neighbor_id = seeds.seed AS cycle, ARRAY[seeds.seed, e.neighbor_id::text] AS path
+                FROM unnest($1::text[]) AS seeds(seed)
+                CROSS JOIN LATERAL ({strongest_edges_sql(self.edges_table, "seeds.seed", "($3::int[])[1]")}) e
+
+                UNION ALL
+
+                SELECT w.seed, e.id, e.neighbor_id::text, e.strength * w.strength * $4, w.depth + 1,
+                       e.neighbor_id = ANY(w.path), w.path || e.neighbor_id::text
+                FROM walk w
+                CROSS JOIN LATERAL ({strongest_edges_sql(self.edges_table, "w.node_id", fanout)}) e
+                WHERE w.depth < $2 AND NOT w.cycle
+            ),
+            best AS (
+                SELECT DISTINCT ON (seed, id) seed, id, strength, depth
+                FROM walk ORDER BY seed, id, strength DESC, depth
+            ),
+            ranked AS (
+                SELECT seed, id, strength, depth,
+                       ROW_NUMBER() OVER (PARTITION BY seed ORDER BY strength DESC, depth) AS rank
+                FROM best
+            )
+            SELECT r.seed, e.source_node_id, e.target_node_id, e.relationship_type,
+                   e.properties::text AS properties, r.strength, r.depth, NULL::text[] AS reached
+            FROM ranked r JOIN {self.edges_table} e ON e.id = r.id
+            WHERE r.rank <= $5
+            UNION ALL
+            SELECT seed, NULL, NULL, NULL, NULL, NULL, NULL, array_agg(DISTINCT node_id)
+            FROM walk WHERE $6 GROUP BY seed
+        """
+
+    async def traverse_with_reach(self, node_ids: List[str], max_depth: int = 2, limit: int = 20,
+                                  version: Optional[int] = None
+                                  ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, set]]:
+        """The CTE reads the live table, so every ``version`` is the current one"""
+        return await self._walk(list(dict.fromkeys(node_ids)), max_depth, limit, reach=True)
+
+    async def traverse_many(self, node_ids: List[str], max_depth: int = 2,
+                            limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        results, _ = await self._walk(list(dict.fromkeys(node_ids)), max_depth, limit, reach=False)
+        return results
+
+    async def _walk(self, seeds: List[str], max_depth: int, limit: int,
+                    reach: bool) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, set]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(self._walk_sql(), seeds, max_depth, self.fanouts, self.decay, limit, reach)
+        self.queries += 1
+
+        results: Dict[str, List[Dict[str, Any]]] = {seed: [] for seed in seeds}
+        reached: Dict[str, set] = {seed: {seed} for seed in seeds}
+        for row in rows:
+            if row['reached'] is not None:
+                reached[row['seed']].update(row['reached'])
+            else:
+                results[row['seed']].append({key: row[key] for key in (
+                    'source_node_id', 'target_node_id', 'relationship_type', 'properties', 'strength', 'depth'
+                )})
+        for edges in results.values():
+            edges.sort(key=lambda edge: (-edge['strength'], edge['depth']))
+        return results, reached
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "queries": self.queries}
+
+class NetworkXAdjacency:
+    """The edge table as a NetworkX MultiGraph; same interface as CSRAdjacency (properties read by row id)"""
+
+    def __init__(self, rows, version: int = 0):
+        import networkx as nx
+
+        start = time.perf_counter()
+        self.version = version
+        self.graph = nx.MultiGraph()
+        self.graph.add_edges_from(
+            (row['source_node_id'], row['target_node_id'], key, {
+                "relationship_type": row['relationship_type'],
+                "strength": float(row['strength'])
+            }) for key, row in enumerate(rows)
+        )
+        self.endpoints: List[Tuple[str, str]] = [(row['source_node_id'], row['target_node_id']) for row in rows]
+        self.ids: List[int] = [row['id'] for row in rows]
+        self.properties: Dict[int, Optional[str]] = {}
+        self.max_strength = max((strength for _, _, strength in self.graph.edges(data='strength')), default=0.0)
+        self._nbytes: Optional[int] = None
+        self.build_seconds = time.perf_counter() - start
+
+    @property
+    def edge_count(self) -> int:
+        return self.graph.number_of_edges()
+
+    @property
+    def node_count(self) -> int:
+        return self.graph.number_of_nodes()
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the graph's dicts (not the strings they share with the edge rows), computed once"""
+        if self._nbytes is None:
+            adjacency = self.graph._adj
+            size = (sys.getsizeof(adjacency) + sys.getsizeof(self.endpoints) + sys.getsizeof(self.ids)
+                    + sys.getsizeof(self.graph._node))
+            size += sum(sys.getsizeof(attributes) for attributes in self.graph._node.values())
+            for neighbors in adjacency.values():
+                size += sys.getsizeof(neighbors)
+                for keyed in neighbors.values():
+                    size += sys.getsizeof(keyed) + sum(sys.getsizeof(data) for data in keyed.values())
+            self._nbytes = size
+        return self._nbytes
+
+    def expand(self, node_id: str, fanout: int) -> List[Tuple[Any, str, float]]:
+        if node_id not in self.graph:
+            return []
+        # Edges are not kept sorted: rank this node's edges on every expansion
+        return heapq.nlargest(fanout, ((key, neighbor, data['strength'])
+                                       for neighbor, keyed in self.graph.adj[node_id].items()
+                                       for key, data in keyed.items()), key=lambda edge: edge[2])
+
+    def edge(self, edge_key: int) -> Dict[str, Any]:
+        source, target = self.endpoints[edge_key]
+        return {"source_node_id": source, "target_node_id": target, **self.graph.edges[source, target, edge_key]}
+
+    def table_id(self, edge_key: int) -> int:
+        return self.ids[edge_key]
+
+class NetworkXTraversal(GraphTraversal):
+    """The bounded BFS over a NetworkX graph instead of CSR arrays"""
+
+    name = "networkx"
+    adjacency_class = NetworkXAdjacency
+
+class Neo4jBackend(GraphTraversal):
+    """
+    The bounded BFS expanded in Neo4j, one Cypher query per depth.
+
+    Neo4j holds a mirror of the edge table (nodes labelled after the table,
+    ``EDGE`` relationships) that is rebuilt whenever the table's version
+    changes, checked at most every GRAPH_CACHE_CHECK_INTERVAL seconds and
+    rate-limited like the CSR. The rebuild runs as a background task, so no
+    lookup waits for it: while the mirror is behind, lookups run in SQL.
+    The table is streamed to Neo4j ``batch_size`` edges at a time, so the
+    process never holds more than one batch of it.
+    """
+
+    name = "neo4j"
+    # The mirror answers lookups with the edge details, properties included
+    edge_columns = GraphTraversal.edge_columns + ", properties::text AS properties"
+
+    def __init__(self, pool, edges_table: str = "graph_edges", fanouts: Optional[List[int]] = None,
+                 check_interval: Optional[float] = None, decay: float = 0.8, uri: Optional[str] = None,
+                 batch_size: int = 10000):
+        # Every edge is mirrored, however many there are; no CSR is kept in process and the table is streamed
+        super().__init__(pool, edges_table, fanouts, cache_max_edges=sys.maxsize,
+                         check_interval=check_interval, decay=decay)
+        self.uri = uri or os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+        self.auth = (os.getenv('NEO4J_USERNAME', 'neo4j'), os.getenv('NEO4J_PASSWORD', ''))
+        self.batch_size = batch_size
+        self.label = "".join(part.capitalize() for part in edges_table.split("_")) + "Node"
+        self.driver = None
+        self.mirror_version: Optional[int] = None
+        self._mirror_task: Optional[asyncio.Task] = None
+
+    async def initialize(self, conn):
+        await super().initialize(conn)
+        from neo4j import AsyncGraphDatabase
+
+        self.driver = AsyncGraphDatabase.driver(self.uri, auth=self.auth)
+        try:
+            await self.driver.verify_connectivity()
+        except Exception:
+            await self.close()
+            raise
+        async with self.driver.session() as session:
+            await (await session.run(
+                f"CREATE CONSTRAINT {self.label}_id IF NOT EXISTS FOR (n:{self.label}) REQUIRE n.id IS UNIQUE"
+            )).consume()
+
+    async def _mirror(self, session, edges: List[Dict[str, Any]]):
+        await (await session.run(f"""
+            UNWIND $edges AS e
+            MERGE (s:{self.label} {{id: e.source}})
+            MERGE (t:{self.label} {{id: e.target}})
+            CREATE (s)-[:EDGE {{relationship_type: e.type, strength: e.strength, properties: e.properties}}]->(t)
+        """, edges=edges)).consume()
+
+    async def _rebuild(self, conn, version: int) -> None:
+        """Start syncing the Neo4j mirror in the background; the traversal runs remotely once it has caught up"""
+        if self._mirror_task is None or self._mirror_task.done():
+            self._mirror_task = asyncio.create_task(self._sync_mirror())
+        return None
+
+    async def _sync_mirror(self):
+        """Rebuild the mirror until it matches the last version seen (writes may land during a rebuild)"""
+        while self.mirror_version != self.version:
+            version = self.version
+            start = time.perf_counter()
+            try:
+                async with self.pool.acquire() as conn:
+                    await self._mirror_table(conn, version)
+            except Exception as e:
+                # Let the next version check schedule another attempt; lookups stay in SQL until then
+                logger.warning(f"Neo4j graph mirror rebuild failed: {e}")
+                self.built_version = None
+                return
+            self._built_at = time.monotonic()
+            self._build_seconds = time.perf_counter() - start
+
+    async def wait_for_mirror(self):
+        """Wait for a running mirror rebuild to finish"""
+        if self._mirror_task is not None:
+            await asyncio.shield(self._mirror_task)
+
+    async def _mirror_table(self, conn, version: int):
+        """Replace the Neo4j mirror with the edge table, streamed in batches"""
+        start = time.perf_counter()
+        count = 0
+        # The mirror is emptied first, so it matches no version until the stream completes
+        self.mirror_version = None
+        async with self.driver.session() as session:
+            await (await session.run(
+                f"MATCH (n:{self.label}) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF 10000 ROWS"
+            )).consume()
+            batch: List[Dict[str, Any]] = []
+            # Server-side cursors only live inside a transaction
+            async with conn.transaction():
+                async for row in conn.cursor(f"SELECT {self.edge_columns} FROM {self.edges_table}",
+                                             prefetch=self.batch_size):
+                    batch.append({
+                        "source": row['source_node_id'],
+                        "target": row['target_node_id'],
+                        "type": row['relationship_type'],
+                        "strength": float(row['strength']),
+                        "properties": row['properties']
+                    })
+                    if len(batch) == self.batch_size:
+                        await self._mirror(session, batch)
+                        count += len(batch)
+                        batch = []
+            if batch:
+                await self._mirror(session, batch)
+                count += len(batch)
+        self.mirror_version = version
+        logger.info(f"Neo4j graph mirror rebuilt: {count:,} edges in {time.perf_counter() - start:.2f}s "
+                    f"(version {version})")
+
+    async def traverse_with_reach(self, node_ids: List[str], max_depth: int = 2, limit: int = 20,
+                                  version: Optional[int] = None
+                                  ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, set]]:
+        if version is not None and version != self.version:
+            # Check the version now so the mirror starts catching up instead of waiting for the next check
+            self._checked_at = float('-inf')
+        return await super().traverse_with_reach(node_ids, max_depth, limit, version)
+
+    async def _traverse_remote(self, searches, max_depth: int) -> Dict[str, List[Dict[str, Any]]]:
+        if self.mirror_version != self.version:
+            # The mirror has not caught up with the table yet
+            return await super()._traverse_remote(searches, max_depth)
+        # The expansion returns each edge's details, so ranked edges need no second query
+        details: Dict[str, Dict[str, Any]] = {}
+
+        async with self.driver.session() as session:
+            async def expand(nodes: List[str], fanout: int) -> Dict[str, List[Tuple[Any, str, float]]]:
+                result = await session.run(f"""
+                    UNWIND $nodes AS node_id
+                    MATCH (n:{self.label} {{id: node_id}})
+                    CALL {{
+                        WITH n
+                        MATCH (n)-[r:EDGE]-(m)
+                        RETURN r, m ORDER BY r.strength DESC LIMIT $fanout
+                    }}
+                    RETURN node_id, elementId(r) AS key, m.id AS neighbor_id,
+                           startNode(r).id AS source_node_id, endNode(r).id AS target_node_id,
+                           r.relationship_type AS relationship_type, r.properties AS properties,
+                           r.strength AS strength
+                """, nodes=nodes, fanout=fanout)
+                expanded: Dict[str, List[Tuple[Any, str, float]]] = {}
+                async for record in result:
+                    details[record['key']] = {key: record[key] for key in (
+                        'source_node_id', 'target_node_id', 'relationship_type', 'properties', 'strength'
+                    )}
+                    expanded.setdefault(record['node_id'], []).append(
+                        (record['key'], record['neighbor_id'], float(record['strength']))
+                    )
+                return expanded
+
+            async def fetch_edges(edge_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+                return {key: details[key] for key in edge_keys}
+
+            return await self._traverse_expanding(searches, max_depth, expand, fetch_edges)
+
+    async def close(self):
+        if self._mirror_task and not self._mirror_task.done():
+            self._mirror_task.cancel()
+            try:
+                await self._mirror_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+
+def create_graph_backend(pool, name: Optional[str] = None, edges_table: str = "graph_edges") -> GraphBackend:
+    """Graph backend selected by ``name`` or GRAPH_BACKEND (default ``csr``)"""
+    name = (name or os.getenv('GRAPH_BACKEND', 'csr')).lower()
+    if name == "csr":
+        return GraphTraversal(pool, edges_table=edges_table)
+    if name == "cte":
+        return PostgresCTEBackend(pool, edges_table=edges_table)
+    if name == "networkx":
+        return NetworkXTraversal(pool, edges_table=edges_table)
+    if name == "neo4j":
+        return Neo4jBackend(pool, edges_table=edges_table)
+    raise ValueError(f"Unsupported GRAPH_BACKEND: {name}. Must be one of {', '.join(GRAPH_BACKENDS)}")
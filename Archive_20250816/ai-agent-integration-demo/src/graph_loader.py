@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Bulk graph loading for the Stage 3 graph store
+
+Streams node and edge records into ``graph_nodes`` / ``graph_edges`` in
+batches: each batch is COPYed into a temporary staging table and merged with
+one INSERT ... ON CONFLICT, so a batch costs two statements whatever its
+size. Edges are unique on (source_node_id, target_node_id,
+relationship_type); re-loading an edge updates its strength and properties
+instead of adding a duplicate, and ``ensure_unique_edges`` compacts the
+duplicates older trees accumulated before creating that index.
+
+Usage:
+    python src/graph_loader.py --nodes nodes.jsonl --edges edges.csv [--batch-size N] [--defer-constraints]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from itertools import islice
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+NODE_COLUMNS = ("node_id", "node_type", "properties")
+EDGE_COLUMNS = ("source_node_id", "target_node_id", "relationship_type", "strength", "properties")
+
+# Node type given to edge endpoints that were not loaded as nodes (the edge foreign keys need a row)
+PLACEHOLDER_NODE_TYPE = "entity"
+
+def _properties(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return value if isinstance(value, str) else json.dumps(value)
+
+def normalize_node(record: Dict[str, Any]) -> Tuple:
+    """``(node_id, node_type, properties)``; accepts ``id``/``type`` as aliases"""
+    return (
+        str(record.get("node_id") or record["id"]),
+        str(record.get("node_type") or record.get("type") or PLACEHOLDER_NODE_TYPE),
+        _properties(record.get("properties"))
+    )
+
+def normalize_edge(record: Dict[str, Any]) -> Tuple:
+    """``(source, target, relationship_type, strength, properties)``; accepts ``source``/``target``/``type``"""
+    strength = record.get("strength")
+    return (
+        str(record.get("source_node_id") or record["source"]),
+        str(record.get("target_node_id") or record["target"]),
+        str(record.get("relationship_type") or record["type"]),
+        float(strength) if strength not in (None, "") else 1.0,
+        _properties(record.get("properties"))
+    )
+
+async def compact_edges(conn, table: str = "graph_edges") -> int:
+    """Delete duplicate edges, keeping the newest row of each (source, target, relationship_type)"""
+    status = await conn.execute(f"""
+        DELETE FROM {table} WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY source_node_id, target_node_id, relationship_type ORDER BY id DESC
+                ) AS duplicate
+                FROM {table}
+            ) ranked
+            WHERE duplicate > 1
+        )
+    """)
+    return int(status.split()[-1])
+
+async def ensure_unique_edges(conn, table: str = "graph_edges") -> int:
+    """Create the edge uniqueness index, compacting existing duplicates first; returns rows removed"""
+    index = f"idx_{table}_unique"
+    if await conn.fetchval("SELECT to_regclass($1)", index):
+        return 0
+    async with conn.transaction():
+        # Keep concurrent writers from adding a duplicate between the compaction and the index build
+        await conn.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+        removed = await compact_edges(conn, table)
+        await conn.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS {index}
+            ON {table}(source_node_id, target_node_id, relationship_type)
+        """)
+    if removed:
+        logger.info(f"Compacted {removed:,} duplicate edges in {table}")
+    return removed
+
+class GraphBulkLoader:
+    """Batched COPY + merge of node and edge streams into the graph tables"""
+
+    def __init__(self, pool, batch_size: Optional[int] = None, nodes_table: str = "graph_nodes",
+                 edges_table: str = "graph_edges", create_missing_nodes: bool = True):
+        self.pool = pool
+        self.batch_size = batch_size or int(os.getenv('GRAPH_LOAD_BATCH_SIZE', '50000'))
+        self.nodes_table = nodes_table
+        self.edges_table = edges_table
+        self.create_missing_nodes = create_missing_nodes
+
+    @staticmethod
+    def _batches(records: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+        records = iter(records)
+        while batch := list(islice(records, size)):
+            yield batch
+
+    async def load_nodes(self, nodes: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Upsert nodes by node_id (type and properties of a later record win)"""
+        start = time.perf_counter()
+        read = written = 0
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {self.nodes_table}_staging (
+                    seq BIGINT, node_id TEXT, node_type TEXT, properties TEXT
+                )
+            """)
+            for batch in self._batches((normalize_node(node) for node in nodes), self.batch_size):
+                async with conn.transaction():
+                    await conn.execute(f"TRUNCATE {self.nodes_table}_staging")
+                    await conn.copy_records_to_table(
+                        f"{self.nodes_table}_staging", columns=("seq",) + NODE_COLUMNS,
+                        records=[(read + i,) + node for i, node in enumerate(batch)]
+                    )
+                    status = await conn.execute(f"""
+                        INSERT INTO {self.nodes_table} (node_id, node_type, properties)
+                        SELECT DISTINCT ON (node_id) node_id, node_type, properties::jsonb
+                        FROM {self.nodes_table}_staging
+                        ORDER BY node_id, seq DESC
+                        ON CONFLICT (node_id) DO UPDATE SET
+                            node_type = EXCLUDED.node_type,
+                            properties = COALESCE(EXCLUDED.properties, {self.nodes_table}.properties)
+                    """)
+                read += len(batch)
+                written += int(status.split()[-1])
+
+        seconds = time.perf_counter() - start
+        return {"nodes": read, "written": written, "duplicates": read - written, "seconds": seconds,
+                "nodes_per_second": read / seconds if seconds else 0.0}
+
+    async def _drop_deferrable(self, conn) -> List[Tuple[str, ...]]:
+        """Drop the edge indexes ON CONFLICT does not need and the foreign keys; returns how to restore them"""
+        restore = []
+        for row in await conn.fetch("""
+            SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS definition
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = $1::regclass AND NOT i.indisunique AND NOT i.indisprimary
+        """, self.edges_table):
+            await conn.execute(f"DROP INDEX IF EXISTS {row['name']}")
+            restore.append(("index", row['name'], row['definition']))
+        if self.create_missing_nodes:
+            # Every endpoint gets a node row in the batch, so the keys can be validated once at the end
+            for row in await conn.fetch("""
+                SELECT conname AS name, pg_get_constraintdef(oid) AS definition
+                FROM pg_constraint WHERE conrelid = $1::regclass AND contype = 'f'
+            """, self.edges_table):
+                await conn.execute(f"ALTER TABLE {self.edges_table} DROP CONSTRAINT {row['name']}")
+                restore.append(("foreign_key", row['name'], row['definition']))
+        return restore
+
+    async def _restore_deferred(self, conn, restore: List[Tuple[str, ...]]):
+        for kind, name, definition in restore:
+            if kind == "index":
+                await conn.execute(definition)
+            else:
+                # NOT VALID + VALIDATE checks the existing rows with one join instead of a trigger per row
+                await conn.execute(f"ALTER TABLE {self.edges_table} ADD CONSTRAINT {name} {definition} NOT VALID")
+                await conn.execute(f"ALTER TABLE {self.edges_table} VALIDATE CONSTRAINT {name}")
+
+    async def load_edges(self, edges: Iterable[Dict[str, Any]], defer_constraints: bool = False,
+                         progress=None) -> Dict[str, Any]:
+        """
+        Upsert edges on (source, target, relationship_type).
+
+        Args:
+            edges: Edge records (see ``normalize_edge``)
+            defer_constraints: Drop the non-unique edge indexes and (when
+                missing nodes are created) the foreign keys for the load,
+                then rebuild and validate them once at the end; much faster
+                for large loads, but traversals scan without the indexes
+                meanwhile
+            progress: Optional callback receiving the running summary after each batch
+
+        Returns:
+            Summary with edges read, written, duplicates merged and edges/s
+        """
+        start = time.perf_counter()
+        read = written = 0
+        copy_seconds = merge_seconds = rebuild_seconds = 0.0
+        async with self.pool.acquire() as conn:
+            await ensure_unique_edges(conn, self.edges_table)
+            await conn.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {self.edges_table}_staging (
+                    seq BIGINT, source_node_id TEXT, target_node_id TEXT, relationship_type TEXT,
+                    strength FLOAT, properties TEXT
+                )
+            """)
+            deferred = await self._drop_deferrable(conn) if defer_constraints else []
+
+            try:
+                for batch in self._batches((normalize_edge(edge) for edge in edges), self.batch_size):
+                    async with conn.transaction():
+                        step = time.perf_counter()
+                        await conn.execute(f"TRUNCATE {self.edges_table}_staging")
+                        await conn.copy_records_to_table(
+                            f"{self.edges_table}_staging", columns=("seq",) + EDGE_COLUMNS,
+                            records=[(read + i,) + edge for i, edge in enumerate(batch)]
+                        )
+                        copy_seconds += time.perf_counter() - step
+
+                        step = time.perf_counter()
+                        if self.create_missing_nodes:
+                            await conn.execute(f"""
+                                INSERT INTO {self.nodes_table} (node_id, node_type)
+                                SELECT node_id, '{PLACEHOLDER_NODE_TYPE}' FROM (
+                                    SELECT source_node_id AS node_id FROM {self.edges_table}_staging
+                                    UNION
+                                    SELECT target_node_id FROM {self.edges_table}_staging
+                                ) endpoints
+                                ON CONFLICT (node_id) DO NOTHING
+                            """)
+                        status = await conn.execute(f"""
+                            INSERT INTO {self.edges_table}
+                                (source_node_id, target_node_id, relationship_type, strength, properties)
+                            SELECT DISTINCT ON (source_node_id, target_node_id, relationship_type)
+                                source_node_id, target_node_id, relationship_type, strength, properties::jsonb
+                            FROM {self.edges_table}_staging
+                            ORDER BY source_node_id, target_node_id, relationship_type, seq DESC
+                            ON CONFLICT (source_node_id, target_node_id, relationship_type) DO UPDATE SET
+                                strength = EXCLUDED.strength,
+                                properties = COALESCE(EXCLUDED.properties, {self.edges_table}.properties)
+                        """)
+                        merge_seconds += time.perf_counter() - step
+                    read += len(batch)
+                    written += int(status.split()[-1])
+                    if progress:
+                        progress({"edges": read, "written": written,
+                                  "seconds": time.perf_counter() - start})
+            finally:
+                step = time.perf_counter()
+                await self._restore_deferred(conn, deferred)
+                rebuild_seconds = time.perf_counter() - step
+            await conn.execute(f"ANALYZE {self.edges_table}")
+
+        seconds = time.perf_counter() - start
+        summary = {
+            "edges": read,
+            "written": written,
+            # Repeats within a batch collapse before the merge; repeats of stored edges count as written
+            "duplicates": read - written,
+            "seconds": seconds,
+            "edges_per_second": read / seconds if seconds else 0.0,
+            "copy_seconds": copy_seconds,
+            "merge_seconds": merge_seconds,
+            "rebuild_seconds": rebuild_seconds
+        }
+        logger.info(f"Loaded {read:,} edges into {self.edges_table} in {seconds:.1f}s "
+                    f"({summary['edges_per_second']:,.0f} edges/s, {summary['duplicates']:,} duplicates merged)")
+        return summary
+
+async def main():
+    from tacnode_pool import TacnodeConnectionPool
+    from corpus_ingestion import FORMATS, read_records
+    from stage3_tacnode_complete import TacnodeGraphStore
+
+    parser = argparse.ArgumentParser(description="Bulk load JSONL/CSV node and edge files into the Tacnode graph store")
+    parser.add_argument("--nodes", help="Node records: node_id, node_type, properties")
+    parser.add_argument("--edges", help="Edge records: source, target, type (or the column names), strength, properties")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--dsn", default=os.getenv("TACNODE_DSN", (
+        f"postgresql://{os.getenv('TACNODE_USERNAME', 'tacnode_user')}:"
+        f"{os.getenv('TACNODE_PASSWORD', 'tacnode_password')}@"
+        f"{os.getenv('TACNODE_HOST', 'localhost')}:"
+        f"{os.getenv('TACNODE_PORT', '5432')}/"
+        f"{os.getenv('TACNODE_DATABASE', 'ai_agents_demo')}"
+    )))
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--defer-constraints", action="store_true",
+                        help="Rebuild edge indexes and validate foreign keys once after the load")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    pool = TacnodeConnectionPool(args.dsn, min_size=1, max_size=2)
+    await pool.open()
+    try:
+        store = TacnodeGraphStore(pool)
+        await store.initialize()
+        loader = GraphBulkLoader(pool, batch_size=args.batch_size)
+        summary = {}
+        if args.nodes:
+            summary["nodes"] = await loader.load_nodes(read_records(args.nodes, args.format))
+        if args.edges:
+            summary["edges"] = await loader.load_edges(read_records(args.edges, args.format),
+                                                       defer_constraints=args.defer_constraints)
+    finally:
+        await pool.close()
+
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
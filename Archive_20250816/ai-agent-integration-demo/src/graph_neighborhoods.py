@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Materialized k-hop neighborhoods for hot graph entities
+
+A handful of entities (the premium product, the mobile app, top customers)
+are looked up on almost every request. The materializer counts lookups per
+(node, depth, limit), periodically stores the ranked traversal result of the
+top GRAPH_MATERIALIZE_TOP_N in ``graph_neighborhoods`` together with every
+node that traversal reached, and serves later lookups from there.
+
+Invalidation is incremental and happens in the database: statement triggers
+on the edge table collect the endpoints of changed edges (transition tables)
+and delete just the neighborhoods that reached one of them, so a write never
+leaves a stale neighborhood behind, whichever process made it. Counts decay
+by half on each refresh, so the hot set follows recent traffic.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, int, int]
+
+class NeighborhoodMaterializer:
+    """Lookup-frequency driven cache of traversal results, invalidated by edge triggers"""
+
+    def __init__(self, pool, traversal, top_n: Optional[int] = None, min_lookups: Optional[int] = None,
+                 refresh_interval: Optional[float] = None):
+        self.pool = pool
+        self.traversal = traversal
+        self.edges_table = traversal.edges_table
+        self.top_n = top_n if top_n is not None else int(os.getenv('GRAPH_MATERIALIZE_TOP_N', '50'))
+        self.min_lookups = min_lookups if min_lookups is not None else int(os.getenv('GRAPH_MATERIALIZE_MIN_LOOKUPS', '3'))
+        self.refresh_interval = (refresh_interval if refresh_interval is not None
+                                 else float(os.getenv('GRAPH_MATERIALIZE_INTERVAL', '60')))
+
+        self.frequencies: Counter = Counter()
+        # Keys this process materialized; a row may since have been invalidated by a trigger
+        self.materialized: set = set()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.bypassed = 0
+        # Refreshes run for the life of the process, so only the count and the latest are kept
+        self.refreshes = 0
+        self.latest_refresh: Optional[Dict[str, Any]] = None
+        self._last_refresh = time.monotonic()
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_n > 0
+
+    async def initialize(self, conn):
+        """Neighborhood table and the triggers that invalidate it on edge changes"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS graph_neighborhoods (
+                edges_table TEXT NOT NULL,
+                node_id TEXT NOT NULL,
+                max_depth INTEGER NOT NULL,
+                result_limit INTEGER NOT NULL,
+                relationships JSONB NOT NULL,
+                reached TEXT[] NOT NULL,
+                computed_at TIMESTAMP DEFAULT NOW(),
+                PRIMARY KEY (edges_table, node_id, max_depth, result_limit)
+            )
+        """)
+        await conn.execute("CREATE INDEX IF NOT EXISTS idx_graph_neighborhoods_reached ON graph_neighborhoods USING GIN (reached)")
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION invalidate_graph_neighborhoods() RETURNS trigger AS $$
+            DECLARE
+                changed TEXT[];
+            BEGIN
+                -- Serializes with a refresh writing neighborhoods computed from the previous graph; taken
+                -- before the emptiness check so a refresh committing its first rows cannot slip past it
+                PERFORM 1 FROM graph_versions WHERE table_name = TG_TABLE_NAME FOR UPDATE;
+                IF NOT EXISTS (SELECT 1 FROM graph_neighborhoods WHERE edges_table = TG_TABLE_NAME) THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'TRUNCATE' THEN
+                    DELETE FROM graph_neighborhoods WHERE edges_table = TG_TABLE_NAME;
+                    RETURN NULL;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    SELECT array_agg(DISTINCT node_id) INTO changed FROM (
+                        SELECT source_node_id::text AS node_id FROM changed_new
+                        UNION ALL SELECT target_node_id::text FROM changed_new
+                    ) endpoints;
+                    DELETE FROM graph_neighborhoods WHERE edges_table = TG_TABLE_NAME AND reached && changed;
+                END IF;
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    SELECT array_agg(DISTINCT node_id) INTO changed FROM (
+                        SELECT source_node_id::text AS node_id FROM changed_old
+                        UNION ALL SELECT target_node_id::text FROM changed_old
+                    ) endpoints;
+                    DELETE FROM graph_neighborhoods WHERE edges_table = TG_TABLE_NAME AND reached && changed;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        # Transition tables need one trigger per event
+        for event, referencing in (("INSERT", "NEW TABLE AS changed_new"),
+                                   ("UPDATE", "OLD TABLE AS changed_old NEW TABLE AS changed_new"),
+                                   ("DELETE", "OLD TABLE AS changed_old")):
+            await conn.execute(f"""
+                CREATE OR REPLACE TRIGGER {self.edges_table}_neighborhoods_{event.lower()}
+                AFTER {event} ON {self.edges_table} REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION invalidate_graph_neighborhoods()
+            """)
+        await conn.execute(f"""
+            CREATE OR REPLACE TRIGGER {self.edges_table}_neighborhoods_truncate
+            AFTER TRUNCATE ON {self.edges_table}
+            FOR EACH STATEMENT EXECUTE FUNCTION invalidate_graph_neighborhoods()
+        """)
+
+    async def lookup(self, node_ids: List[str], max_depth: int, limit: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Materialized results for whichever of ``node_ids`` have one; records the lookups"""
+        if not self.enabled:
+            return {}
+        node_ids = list(dict.fromkeys(node_ids))
+        self.frequencies.update((node_id, max_depth, limit) for node_id in node_ids)
+
+        if self.traversal.current() is not None:
+            # The graph is traversed in process, which beats a round trip to the table; keep counting
+            # lookups (without refreshing) so the hot set is warm once the cache falls behind or is outgrown
+            self.bypassed += len(node_ids)
+            return {}
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.schedule()
+
+        candidates = [node_id for node_id in node_ids if (node_id, max_depth, limit) in self.materialized]
+        found = {}
+        if candidates:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT node_id, relationships::text AS relationships FROM graph_neighborhoods
+                    WHERE edges_table = $1 AND node_id = ANY($2::text[]) AND max_depth = $3 AND result_limit = $4
+                """, self.edges_table, candidates, max_depth, limit)
+            found = {row['node_id']: json.loads(row['relationships']) for row in rows}
+            for node_id in candidates:
+                if node_id not in found:
+                    # Invalidated by an edge change; the next refresh recomputes it if it is still hot
+                    self.materialized.discard((node_id, max_depth, limit))
+                    self.invalidated += 1
+
+        self.hits += len(found)
+        self.misses += len(node_ids) - len(found)
+        return found
+
+    def schedule(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    def hot_keys(self) -> List[Key]:
+        return [key for key, count in self.frequencies.most_common(self.top_n) if count >= self.min_lookups]
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Materialize the hot keys that have no stored neighborhood and drop the ones that cooled down"""
+        async with self._refresh_lock:
+            start = time.perf_counter()
+            self._last_refresh = time.monotonic()
+            hot = self.hot_keys()
+
+            async with self.pool.acquire() as conn:
+                stored = {(row['node_id'], row['max_depth'], row['result_limit']) for row in await conn.fetch(
+                    "SELECT node_id, max_depth, result_limit FROM graph_neighborhoods WHERE edges_table = $1",
+                    self.edges_table
+                )}
+                version = await conn.fetchval("SELECT version FROM graph_versions WHERE table_name = $1",
+                                              self.edges_table)
+
+            missing = [key for key in hot if key not in stored]
+            rows = []
+            by_shape: Dict[Tuple[int, int], List[str]] = {}
+            for node_id, max_depth, limit in missing:
+                by_shape.setdefault((max_depth, limit), []).append(node_id)
+            for (max_depth, limit), node_ids in by_shape.items():
+                # A stale adjacency cache is bypassed, so results match the version checked on write
+                results, reached = await self.traversal.traverse_with_reach(node_ids, max_depth, limit, version)
+                rows.extend((self.edges_table, node_id, max_depth, limit, json.dumps(results[node_id]),
+                             sorted(reached[node_id])) for node_id in node_ids)
+
+            cold = [key for key in stored if key not in set(hot)]
+            written = 0
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    # If an edge changed since the traversals ran, their results may already be stale
+                    current = await conn.fetchval(
+                        "SELECT version FROM graph_versions WHERE table_name = $1 FOR SHARE", self.edges_table
+                    )
+                    if rows and current == version:
+                        await conn.executemany("""
+                            INSERT INTO graph_neighborhoods
+                                (edges_table, node_id, max_depth, result_limit, relationships, reached)
+                            VALUES ($1, $2, $3, $4, $5::jsonb, $6)
+                            ON CONFLICT (edges_table, node_id, max_depth, result_limit) DO UPDATE SET
+                                relationships = EXCLUDED.relationships,
+                                reached = EXCLUDED.reached,
+                                computed_at = NOW()
+                        """, rows)
+                        written = len(rows)
+                    if cold:
+                        await conn.execute("""
+                            DELETE FROM graph_neighborhoods
+                            WHERE edges_table = $1 AND (node_id, max_depth, result_limit) IN (
+                                SELECT * FROM unnest($2::text[], $3::int[], $4::int[])
+                            )
+                        """, self.edges_table, [k[0] for k in cold], [k[1] for k in cold], [k[2] for k in cold])
+
+            self.materialized = (stored - set(cold)) | {tuple(row[1:4]) for row in rows[:written]}
+            # Halve the counts so entities that stop being looked up fall out of the hot set
+            self.frequencies = Counter({key: count // 2 for key, count in self.frequencies.items() if count > 1})
+
+            refresh = {
+                "hot": len(hot),
+                "materialized": written,
+                "dropped": len(cold),
+                "skipped": len(rows) - written,
+                "seconds": time.perf_counter() - start
+            }
+            self.refreshes += 1
+            self.latest_refresh = refresh
+            logger.info(f"Graph neighborhoods refreshed: {written} materialized, {len(cold)} dropped, "
+                        f"{len(self.materialized)} stored in {refresh['seconds']:.2f}s")
+            return refresh
+
+    async def stop(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "materialized": len(self.materialized),
+            "invalidated": self.invalidated,
+            "bypassed": self.bypassed,
+            "tracked": len(self.frequencies),
+            "refreshes": self.refreshes
+        }
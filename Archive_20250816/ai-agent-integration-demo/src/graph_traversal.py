@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Bounded graph traversal for the Stage 3 graph store
+
+The original recursive CTE walks edges in both directions with no visited
+set, so every cycle and every back-edge multiplies the intermediate result
+before the final DISTINCT ... LIMIT. This engine runs a breadth-first search
+instead:
+
+- every node is expanded at most once (visited set), every edge reported once
+- each depth has a fanout cap: a node contributes only its strongest edges
+- the result limit is pushed into the search: it stops as soon as no deeper
+  edge could outrank the current top ``limit``
+
+Expansion is served from an in-process CSR (compressed sparse row) adjacency
+of the whole edge table while it fits under GRAPH_CACHE_MAX_EDGES, rebuilt
+when a statement trigger bumps the table's version (at most every
+GRAPH_CACHE_REBUILD_INTERVAL seconds; lookups go to SQL while it is behind);
+larger graphs are expanded with one SQL query per depth. The adjacency holds
+no edge properties: they are read for the ranked result edges only.
+
+``GraphBackend`` is the interface TacnodeGraphStore and the neighborhood
+materializer program against; ``GraphTraversal`` is its default
+implementation, the others live in graph_backends.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def strongest_edges_sql(edges_table: str, node: str, limit: str) -> str:
+    """Subquery of the ``limit`` strongest ``(id, neighbor_id, strength)`` of ``node``, either direction"""
+    # Top-N per direction, merged: reads only the strongest index entries even for hubs
+    return f"""
+        (SELECT id, target_node_id AS neighbor_id, strength
+         FROM {edges_table} WHERE source_node_id = {node}
+         ORDER BY strength DESC LIMIT {limit})
+        UNION ALL
+        (SELECT id, source_node_id AS neighbor_id, strength
+         FROM {edges_table} WHERE target_node_id = {node} AND source_node_id <> {node}
+         ORDER BY strength DESC LIMIT {limit})
+        ORDER BY strength DESC
+        LIMIT {limit}
+    """
+
+class CSRAdjacency:
+    """
+    Undirected adjacency of an edge table in CSR form.
+
+    Edges of node ``i`` are ``edge_ids[indptr[i]:indptr[i + 1]]`` (with the
+    opposite endpoint in ``neighbors``), ordered strongest first so a fanout
+    cap is a slice. ``ids`` maps an edge to its row id in the table;
+    ``properties`` holds the properties read so far, by row id.
+    """
+
+    def __init__(self, rows, version: int = 0):
+        start = time.perf_counter()
+        self.version = version
+        count = len(rows)
+
+        # Intern ids with a dict: sorting millions of Python strings (np.unique) is far slower
+        self.positions: Dict[str, int] = {}
+        intern = self.positions.setdefault
+        self.sources = np.fromiter((intern(row['source_node_id'], len(self.positions)) for row in rows),
+                                   dtype=np.int32, count=count)
+        self.targets = np.fromiter((intern(row['target_node_id'], len(self.positions)) for row in rows),
+                                   dtype=np.int32, count=count)
+        self.node_ids: List[str] = list(self.positions)
+        self.strengths = np.fromiter((row['strength'] for row in rows), dtype=np.float64, count=count)
+        types: Dict[str, int] = {}
+        self.relationship_codes = np.fromiter((types.setdefault(row['relationship_type'], len(types)) for row in rows),
+                                              dtype=np.int16, count=count)
+        self.relationship_types: List[str] = list(types)
+        self.ids = np.fromiter((row['id'] for row in rows), dtype=np.int64, count=count)
+        self.properties: Dict[int, Optional[str]] = {}
+
+        # Each edge is listed under both endpoints; self-loops only once
+        loops = self.sources == self.targets
+        endpoints = np.concatenate([self.sources, self.targets[~loops]])
+        others = np.concatenate([self.targets, self.sources[~loops]])
+        edges = np.concatenate([np.arange(count, dtype=np.int32), np.flatnonzero(~loops).astype(np.int32)])
+
+        order = np.lexsort((-self.strengths[edges], endpoints))
+        self.neighbors = others[order]
+        self.edge_ids = edges[order]
+        self.indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(endpoints, minlength=len(self.node_ids)), out=self.indptr[1:])
+        self.max_strength = float(self.strengths.max()) if count else 0.0
+        self.build_seconds = time.perf_counter() - start
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.sources)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.sources, self.targets, self.strengths, self.relationship_codes,
+                                      self.ids, self.neighbors, self.edge_ids, self.indptr))
+
+    def expand(self, node_id: str, fanout: int) -> List[Tuple[Any, str, float]]:
+        """Up to ``fanout`` strongest ``(edge_key, neighbor_id, strength)`` of ``node_id``"""
+        i = self.positions.get(node_id)
+        if i is None:
+            return []
+        start, end = self.indptr[i], min(self.indptr[i + 1], self.indptr[i] + fanout)
+        return [(int(edge), self.node_ids[neighbor], float(self.strengths[edge]))
+                for edge, neighbor in zip(self.edge_ids[start:end], self.neighbors[start:end])]
+
+    def edge(self, edge_key: int) -> Dict[str, Any]:
+        return {
+            "source_node_id": self.node_ids[self.sources[edge_key]],
+            "target_node_id": self.node_ids[self.targets[edge_key]],
+            "relationship_type": self.relationship_types[self.relationship_codes[edge_key]],
+            "strength": float(self.strengths[edge_key])
+        }
+
+    def table_id(self, edge_key: int) -> int:
+        return int(self.ids[edge_key])
+
+class _SeedSearch:
+    """BFS state of one seed: visited nodes, reported edges and the current top results"""
+
+    def __init__(self, seed: str, limit: int):
+        self.seed = seed
+        self.limit = limit
+        self.visited = {seed}
+        self.frontier: Dict[str, float] = {seed: 1.0}
+        self.reached: Dict[Any, Tuple[float, int]] = {}
+        self.top: List[float] = []
+        self.done = False
+
+    def record(self, edge_key, strength: float, depth: int):
+        if edge_key in self.reached:
+            return
+        self.reached[edge_key] = (strength, depth)
+        if len(self.top) < self.limit:
+            heapq.heappush(self.top, strength)
+        elif strength > self.top[0]:
+            heapq.heapreplace(self.top, strength)
+
+    def can_improve(self, bound: float) -> bool:
+        """Whether an edge of strength at most ``bound`` could still enter the top ``limit``"""
+        return len(self.top) < self.limit or bound > self.top[0]
+
+    def results(self) -> List[Tuple[Any, float, int]]:
+        ranked = sorted(((edge_key, strength, depth) for edge_key, (strength, depth) in self.reached.items()),
+                        key=lambda r: (-r[1], r[2]))
+        return ranked[:self.limit]
+
+class GraphBackend(ABC):
+    """
+    Bounded k-hop relationship lookups over an edge table.
+
+    Every backend scores the same way: a node contributes at most
+    ``fanout(depth)`` of its strongest edges, an edge ``d`` hops out scores
+    its own strength x the path to it x ``decay``. The BFS backends expand
+    each node once, from its strongest path; the CTE backend expands it once
+    per path, so its results can differ. The edge table in
+    Postgres stays the source of truth; ``initialize`` adds the strength
+    indexes and the version counter bumped by every statement that changes it.
+    """
+
+    name = "base"
+    # In-process adjacency, when the backend keeps one (lookups then never leave the process)
+    csr = None
+
+    def __init__(self, pool, edges_table: str = "graph_edges", fanouts: Optional[List[int]] = None,
+                 decay: float = 0.8):
+        self.pool = pool
+        self.edges_table = edges_table
+        self.fanouts = fanouts or [int(f) for f in os.getenv('GRAPH_TRAVERSAL_FANOUT', '50,20,10').split(',')]
+        # Strength of an edge d hops out: its own strength x the path to it x decay, as in the original CTE
+        self.decay = decay
+
+    def fanout(self, depth: int) -> int:
+        return self.fanouts[min(depth, len(self.fanouts)) - 1]
+
+    async def initialize(self, conn):
+        """Strength-ordered edge indexes and a version counter bumped by every statement that changes the edge table"""
+        # Fanout-capped expansion reads only a node's strongest edges: an index-ordered top-N even for hubs
+        await conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{self.edges_table}_source_strength
+            ON {self.edges_table}(source_node_id, strength DESC)
+        """)
+        await conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{self.edges_table}_target_strength
+            ON {self.edges_table}(target_node_id, strength DESC)
+        """)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS graph_versions (
+                table_name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                changed_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION bump_graph_version() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO graph_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+                ON CONFLICT (table_name) DO UPDATE SET version = graph_versions.version + 1, changed_at = NOW();
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        await conn.execute(f"""
+            CREATE OR REPLACE TRIGGER {self.edges_table}_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {self.edges_table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_graph_version()
+        """)
+        await conn.execute("""
+            INSERT INTO graph_versions (table_name, version) VALUES ($1, 0)
+            ON CONFLICT (table_name) DO NOTHING
+        """, self.edges_table)
+
+    async def traverse_many(self, node_ids: List[str], max_depth: int = 2,
+                            limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Bounded traversal from each seed.
+
+        Returns:
+            Per seed, up to ``limit`` edges as dicts (source_node_id,
+            target_node_id, relationship_type, properties, strength, depth),
+            strongest first
+        """
+        results, _ = await self.traverse_with_reach(node_ids, max_depth, limit)
+        return results
+
+    @abstractmethod
+    async def traverse_with_reach(self, node_ids: List[str], max_depth: int = 2, limit: int = 20,
+                                  version: Optional[int] = None
+                                  ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, set]]:
+        """
+        ``traverse_many`` plus the set of nodes each seed's search reached.
+
+        An edge change that touches none of a seed's reached nodes cannot
+        change that seed's result. With ``version``, the result must reflect
+        that version of the edge table.
+        """
+
+    async def traverse(self, node_id: str, max_depth: int = 2, limit: int = 20) -> List[Dict[str, Any]]:
+        return (await self.traverse_many([node_id], max_depth, limit))[node_id]
+
+    def current(self) -> Optional[CSRAdjacency]:
+        """The in-process adjacency lookups are served from right now, if any"""
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    async def close(self):
+        """Release connections the backend holds outside the pool"""
+
+class GraphTraversal(GraphBackend):
+    """Bounded BFS over an edge table with a CSR adjacency cache"""
+
+    name = "csr"
+    adjacency_class = CSRAdjacency
+    # Columns the adjacency is built from; properties are read for result edges only
+    edge_columns = "id, source_node_id, target_node_id, relationship_type, strength"
+
+    def __init__(self, pool, edges_table: str = "graph_edges", fanouts: Optional[List[int]] = None,
+                 cache_max_edges: Optional[int] = None, check_interval: Optional[float] = None,
+                 decay: float = 0.8, rebuild_interval: Optional[float] = None):
+        super().__init__(pool, edges_table, fanouts, decay)
+        self.cache_max_edges = (cache_max_edges if cache_max_edges is not None
+                                else int(os.getenv('GRAPH_CACHE_MAX_EDGES', '1000000')))
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv('GRAPH_CACHE_CHECK_INTERVAL', '5')))
+        self.rebuild_interval = (rebuild_interval if rebuild_interval is not None
+                                 else float(os.getenv('GRAPH_CACHE_REBUILD_INTERVAL', '30')))
+
+        self.csr: Optional[CSRAdjacency] = None
+        # Last version seen in graph_versions, and the one the adjacency was last built (or skipped) for
+        self.version: Optional[int] = None
+        self.built_version: Optional[int] = None
+        self.edges = 0
+        self.max_strength = 1.0
+        self._checked_at = float('-inf')
+        self._built_at = float('-inf')
+        self._build_seconds = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self.refreshes = 0
+        self.deferred_refreshes = 0
+        self.cache_traversals = 0
+        self.sql_traversals = 0
+
+    def current(self) -> Optional[CSRAdjacency]:
+        """The CSR cache if it was built from the last version seen, else None"""
+        return self.csr if self.csr is not None and self.built_version == self.version else None
+
+    async def adjacency(self) -> Optional[CSRAdjacency]:
+        """
+        The CSR cache of the current edge table, or None when lookups must go to SQL.
+
+        The version is checked at most every ``check_interval`` seconds. A
+        changed table is re-read at most every ``rebuild_interval`` seconds
+        (and never more often than ten times the last rebuild took), so a
+        steady stream of writes does not keep the process re-fetching it;
+        until then the stale cache is not used. None is also returned while
+        the graph has more than ``cache_max_edges`` edges.
+        """
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self.current()
+
+        async with self._refresh_lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self.current()
+            async with self.pool.acquire() as conn:
+                version = await conn.fetchval(
+                    "SELECT version FROM graph_versions WHERE table_name = $1", self.edges_table
+                ) or 0
+                self._checked_at = time.monotonic()
+                if version == self.built_version:
+                    return self.current()
+
+                if version != self.version:
+                    # The SQL path prunes with the maximum strength, so it is kept current either way
+                    edges, max_strength = await conn.fetchrow(
+                        f"SELECT COUNT(*), COALESCE(MAX(strength), 0) FROM {self.edges_table}"
+                    )
+                    self.version = version
+                    self.edges = edges
+                    self.max_strength = float(max_strength)
+                if self.edges > self.cache_max_edges:
+                    self.csr = None
+                    self.built_version = version
+                    logger.info(f"Graph has {self.edges:,} edges (> {self.cache_max_edges:,}); traversing in SQL")
+                    return None
+                if time.monotonic() - self._built_at < max(self.rebuild_interval, 10 * self._build_seconds):
+                    self.deferred_refreshes += 1
+                    return None
+
+                start = time.perf_counter()
+                self.csr = await self._rebuild(conn, version)
+            self.built_version = version
+            self._built_at = time.monotonic()
+            self._build_seconds = time.perf_counter() - start
+            self.refreshes += 1
+            return self.csr
+
+    async def _rebuild(self, conn, version: int) -> Optional[CSRAdjacency]:
+        """Adjacency of the edge table at ``version``, built off the event loop"""
+        rows = await conn.fetch(f"SELECT {self.edge_columns} FROM {self.edges_table}")
+        csr = await asyncio.get_running_loop().run_in_executor(None, self.adjacency_class, rows, version)
+        logger.info(f"Graph adjacency cache rebuilt: {csr.edge_count:,} edges, "
+                    f"{csr.node_count:,} nodes, {csr.nbytes / 1024 / 1024:.1f}MB "
+                    f"in {csr.build_seconds:.2f}s (version {version})")
+        return csr
+
+    async def _expand_sql(self, conn, nodes: List[str], fanout: int) -> Dict[str, List[Tuple[Any, str, float]]]:
+        """Strongest ``fanout`` edges of each node in one query"""
+        rows = await conn.fetch(f"""
+            SELECT frontier.node_id, e.id, e.neighbor_id, e.strength
+            FROM unnest($1::text[]) AS frontier(node_id)
+            CROSS JOIN LATERAL ({strongest_edges_sql(self.edges_table, "frontier.node_id", "$2")}) e
+        """, nodes, fanout)
+        expanded: Dict[str, List[Tuple[Any, str, float]]] = {}
+        for row in rows:
+            expanded.setdefault(row['node_id'], []).append((row['id'], row['neighbor_id'], float(row['strength'])))
+        return expanded
+
+    async def _edges_sql(self, conn, edge_keys: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        rows = await conn.fetch(f"""
+            SELECT id, source_node_id, target_node_id, relationship_type, properties::text AS properties, strength
+            FROM {self.edges_table} WHERE id = ANY($1::int[])
+        """, edge_keys)
+        return {row['id']: dict(row) for row in rows}
+
+    async def _edge_properties(self, csr, edge_keys: List[Any]) -> Dict[Any, Optional[str]]:
+        """Properties of the ranked ``edge_keys``, read by row id the first time an edge is returned"""
+        missing = list({csr.table_id(edge_key) for edge_key in edge_keys} - csr.properties.keys())
+        if missing:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT id, properties::text AS properties FROM {self.edges_table} WHERE id = ANY($1::int[])
+                """, missing)
+            csr.properties.update((row['id'], row['properties']) for row in rows)
+        return {edge_key: csr.properties.get(csr.table_id(edge_key)) for edge_key in edge_keys}
+
+    async def traverse_with_reach(self, node_ids: List[str], max_depth: int = 2, limit: int = 20,
+                                  version: Optional[int] = None
+                                  ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, set]]:
+        """Bounded BFS; all seeds share one expansion per depth. A cache built from another ``version`` is bypassed"""
+        searches = {seed: _SeedSearch(seed, limit) for seed in dict.fromkeys(node_ids)}
+        csr = await self.adjacency()
+        if csr is not None and version is not None and csr.version != version:
+            csr = None
+        if csr is not None:
+            self.cache_traversals += 1
+            results = await self._traverse(searches, max_depth, csr)
+        else:
+            self.sql_traversals += 1
+            results = await self._traverse_remote(searches, max_depth)
+        return results, {seed: search.visited for seed, search in searches.items()}
+
+    def _step(self, searches: Dict[str, _SeedSearch], depth: int,
+              expanded: Dict[str, List[Tuple[Any, str, float]]]):
+        """Record one depth of edges for every seed and move its frontier outwards"""
+        for search in searches.values():
+            if search.done:
+                continue
+            next_frontier: Dict[str, float] = {}
+            for node, path_strength in search.frontier.items():
+                for edge_key, neighbor, edge_strength in expanded.get(node, ()):
+                    strength = edge_strength if depth == 1 else edge_strength * path_strength * self.decay
+                    search.record(edge_key, strength, depth)
+                    if neighbor not in search.visited and strength > next_frontier.get(neighbor, 0.0):
+                        next_frontier[neighbor] = strength
+            search.visited.update(next_frontier)
+            search.frontier = next_frontier
+
+    def _prune(self, searches: Dict[str, _SeedSearch], max_strength: float):
+        """Stop seeds whose next depth cannot beat their current top ``limit``"""
+        for search in searches.values():
+            bound = max(search.frontier.values(), default=0.0) * max_strength * self.decay
+            if not search.frontier or not search.can_improve(bound):
+                search.done = True
+
+    async def _traverse(self, searches: Dict[str, _SeedSearch], max_depth: int,
+                        csr: CSRAdjacency) -> Dict[str, List[Dict[str, Any]]]:
+        for depth in range(1, max_depth + 1):
+            fanout = self.fanout(depth)
+            frontier = {node for search in searches.values() if not search.done for node in search.frontier}
+            if not frontier:
+                break
+            self._step(searches, depth, {node: csr.expand(node, fanout) for node in frontier})
+            self._prune(searches, csr.max_strength)
+
+        results = {seed: search.results() for seed, search in searches.items()}
+        properties = await self._edge_properties(csr, [edge_key for ranked in results.values()
+                                                       for edge_key, _, _ in ranked])
+        return {seed: [{**csr.edge(edge_key), "properties": properties[edge_key], "strength": strength, "depth": depth}
+                       for edge_key, strength, depth in ranked]
+                for seed, ranked in results.items()}
+
+    async def _traverse_remote(self, searches: Dict[str, _SeedSearch], max_depth: int) -> Dict[str, List[Dict[str, Any]]]:
+        """BFS expanded where the edges live: one SQL query per depth"""
+        async with self.pool.acquire() as conn:
+            return await self._traverse_expanding(
+                searches, max_depth,
+                lambda nodes, fanout: self._expand_sql(conn, nodes, fanout),
+                lambda edge_keys: self._edges_sql(conn, edge_keys)
+            )
+
+    async def _traverse_expanding(self, searches: Dict[str, _SeedSearch], max_depth: int,
+                                  expand, fetch_edges) -> Dict[str, List[Dict[str, Any]]]:
+        """BFS over async ``expand(nodes, fanout)``; the ranked edges' details come from ``fetch_edges(edge_keys)``"""
+        for depth in range(1, max_depth + 1):
+            frontier = {node for search in searches.values() if not search.done for node in search.frontier}
+            if not frontier:
+                break
+            self._step(searches, depth, await expand(list(frontier), self.fanout(depth)))
+            self._prune(searches, self.max_strength)
+
+        results = {seed: search.results() for seed, search in searches.items()}
+        edges = await fetch_edges(list({edge_key for ranked in results.values() for edge_key, _, _ in ranked}))
+        return {seed: [{**edges[edge_key], "strength": strength, "depth": depth}
+                       for edge_key, strength, depth in ranked if edge_key in edges]
+                for seed, ranked in results.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "cached": self.current() is not None,
+            "edges": self.csr.edge_count if self.csr else None,
+            "nodes": self.csr.node_count if self.csr else None,
+            "cache_mb": self.csr.nbytes / 1024 / 1024 if self.csr else 0.0,
+            "version": self.version,
+            "refreshes": self.refreshes,
+            "deferred_refreshes": self.deferred_refreshes,
+            "cache_traversals": self.cache_traversals,
+            "sql_traversals": self.sql_traversals
+        }
@@ -69,6 +69,7 @@ class WorkflowStep:
     duration: float
     output: Any
     error: Optional[str] = None
+    pool_wait: float = 0.0  # seconds of `duration` spent waiting for a database connection
 
 @dataclass
 class EnhancedQueryResult:
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Shared asyncpg connection pool for the Stage 3 Tacnode stores
+
+One pool is created per workflow engine and injected into the vector, graph
+and time series stores, so a workflow run reuses warm connections (and their
+prepared statement caches) instead of opening a new connection per call.
+"""
+
+import os
+import time
+import logging
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+class PoolWaitTracker:
+    """Accumulates time spent waiting for pool connections within one workflow step"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.acquisitions = 0
+
+_current_tracker: contextvars.ContextVar = contextvars.ContextVar("tacnode_pool_wait", default=None)
+
+async def _register_vector_codec(conn: asyncpg.Connection):
+    """Send/receive pgvector values as Python lists (skipped until the extension exists)"""
+    try:
+        await conn.set_type_codec(
+            'vector',
+            encoder=lambda v: '[' + ','.join(str(float(x)) for x in v) + ']',
+            decoder=lambda s: [float(x) for x in s.strip('[]').split(',')] if s != '[]' else [],
+            schema='public',
+            format='text'
+        )
+    except ValueError:
+        pass
+
+class TacnodeConnectionPool:
+    """
+    asyncpg pool with sizing, statement caching and a health check on acquire.
+
+    Connections idle for longer than ``health_check_interval`` seconds are
+    pinged with ``SELECT 1`` before being handed out; a dead connection is
+    terminated and replaced instead of failing the caller's query.
+    """
+
+    def __init__(self, connection_string: str,
+                 min_size: Optional[int] = None,
+                 max_size: Optional[int] = None,
+                 statement_cache_size: Optional[int] = None,
+                 health_check_interval: Optional[float] = None,
+                 acquire_timeout: Optional[float] = None):
+        self.connection_string = connection_string
+        self.min_size = min_size if min_size is not None else int(os.getenv('TACNODE_POOL_MIN_SIZE', '2'))
+        self.max_size = max_size if max_size is not None else int(os.getenv('TACNODE_CONNECTION_POOL_SIZE', '20'))
+        self.statement_cache_size = (statement_cache_size if statement_cache_size is not None
+                                     else int(os.getenv('TACNODE_POOL_STATEMENT_CACHE_SIZE', '100')))
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else float(os.getenv('TACNODE_POOL_HEALTH_CHECK_INTERVAL', '30')))
+        self.acquire_timeout = (acquire_timeout if acquire_timeout is not None
+                                else float(os.getenv('TACNODE_POOL_ACQUIRE_TIMEOUT', '10')))
+
+        self._pool: Optional[asyncpg.Pool] = None
+        self._last_used: Dict[int, float] = {}
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.health_checks = 0
+        self.replaced_connections = 0
+
+    async def open(self):
+        """Create the pool (idempotent)"""
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                self.connection_string,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                statement_cache_size=self.statement_cache_size,
+                max_inactive_connection_lifetime=300.0,
+                init=_register_vector_codec
+            )
+            logger.info(f"Tacnode pool opened (min={self.min_size}, max={self.max_size}, "
+                        f"statement_cache={self.statement_cache_size})")
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            self._last_used.clear()
+
+    async def reset(self):
+        """Recycle connections after extensions or types change (e.g. CREATE EXTENSION vector)"""
+        if self._pool is not None:
+            await self._pool.expire_connections()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a healthy connection, recording how long the caller waited for it"""
+        if self._pool is None:
+            await self.open()
+
+        start = time.perf_counter()
+        conn = await self._healthy_connection()
+        waited = time.perf_counter() - start
+
+        self.acquisitions += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        tracker = _current_tracker.get()
+        if tracker is not None:
+            tracker.seconds += waited
+            tracker.acquisitions += 1
+
+        try:
+            yield conn
+        finally:
+            self._last_used[conn.get_server_pid()] = time.monotonic()
+            await self._pool.release(conn)
+
+    async def _healthy_connection(self) -> asyncpg.Connection:
+        for _ in range(self.max_size + 1):
+            conn = await self._pool.acquire(timeout=self.acquire_timeout)
+            # Pool proxies are per-acquire; the backend pid identifies the physical connection
+            last_used = self._last_used.get(conn.get_server_pid())
+            if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+                return conn
+
+            self.health_checks += 1
+            try:
+                await conn.fetchval("SELECT 1", timeout=self.acquire_timeout)
+                return conn
+            except (asyncpg.PostgresError, OSError, asyncpg.InterfaceError) as e:
+                logger.warning(f"Discarding unhealthy pooled connection: {e}")
+                self.replaced_connections += 1
+                self._last_used.pop(conn.get_server_pid(), None)
+                conn.terminate()
+                await self._pool.release(conn)
+
+        raise ConnectionError("No healthy Tacnode connection available in pool")
+
+    @staticmethod
+    @contextmanager
+    def track_wait():
+        """
+        Collect pool wait time for everything awaited inside the block.
+
+        Usage::
+
+            with pool.track_wait() as wait:
+                await store.similarity_search(...)
+            wait.seconds
+        """
+        tracker = PoolWaitTracker()
+        token = _current_tracker.set(tracker)
+        try:
+            yield tracker
+        finally:
+            _current_tracker.reset(token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self._pool.get_size() if self._pool else 0,
+            "idle": self._pool.get_idle_size() if self._pool else 0,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "acquisitions": self.acquisitions,
+            "avg_wait_ms": self.total_wait / self.acquisitions * 1000 if self.acquisitions else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "health_checks": self.health_checks,
+            "replaced_connections": self.replaced_connections
+        }
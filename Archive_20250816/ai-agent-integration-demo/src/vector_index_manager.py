@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+ANN index lifecycle for the Stage 3 vector store
+
+ivfflat centroids are computed from the rows present when the index is built,
+so an index created on an empty table never clusters well. This manager
+builds the index only once enough rows exist, sizes it from the row count,
+and rebuilds it concurrently (build new, swap, drop old) when the table has
+grown past the size it was tuned for.
+
+Sizing follows the pgvector guidance:
+- ivfflat: lists = rows / 1000 up to 1M rows, sqrt(rows) above; probes = sqrt(lists)
+- hnsw: m / ef_construction / ef_search stepped up for >1M and >10M rows
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class VectorIndexManager:
+    """Decides when and how the vector index is (re)built, and records every build"""
+
+    def __init__(self, pool, table: str = "knowledge_embeddings", column: str = "embedding",
+                 opclass: str = "vector_cosine_ops", index_type: Optional[str] = None,
+                 min_rows: Optional[int] = None, drift_factor: Optional[float] = None):
+        self.pool = pool
+        self.table = table
+        self.column = column
+        self.opclass = opclass
+        self.index_name = f"{table}_vector_idx"
+        self.index_type = (index_type or os.getenv('VECTOR_INDEX_TYPE', 'ivf_flat')).lower()
+        if self.index_type not in ('ivf_flat', 'hnsw'):
+            raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {self.index_type}. Must be 'ivf_flat' or 'hnsw'")
+        self.min_rows = min_rows if min_rows is not None else int(os.getenv('VECTOR_INDEX_MIN_ROWS', '10000'))
+        self.drift_factor = drift_factor or float(os.getenv('VECTOR_INDEX_DRIFT_FACTOR', '2.0'))
+        self.maintenance_work_mem = os.getenv('VECTOR_INDEX_MAINTENANCE_WORK_MEM', '512MB')
+
+        # Parameters of the index currently in place (None: no index, exact scans)
+        self.current: Optional[Dict[str, Any]] = None
+        self.builds: List[Dict[str, Any]] = []
+        self._build_lock = asyncio.Lock()
+        self._build_task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @property
+    def method(self) -> str:
+        return "hnsw" if self.index_type == "hnsw" else "ivfflat"
+
+    def recommend(self, rows: float) -> Dict[str, Any]:
+        """Index parameters for a table of ``rows`` rows"""
+        if self.index_type == "hnsw":
+            if rows > 10_000_000:
+                m, ef_construction, ef_search = 32, 200, 200
+            elif rows > 1_000_000:
+                m, ef_construction, ef_search = 24, 128, 100
+            else:
+                m, ef_construction, ef_search = 16, 64, 40
+            return {"method": "hnsw", "column": self.column, "m": int(os.getenv('VECTOR_HNSW_M', m)),
+                    "ef_construction": int(os.getenv('VECTOR_HNSW_EF_CONSTRUCTION', ef_construction)),
+                    "ef_search": ef_search}
+
+        lists = rows / 1000 if rows <= 1_000_000 else math.sqrt(rows)
+        lists = int(os.getenv('VECTOR_IVFFLAT_LISTS', max(int(lists), 1)))
+        return {"method": "ivfflat", "column": self.column, "lists": lists, "probes": max(int(math.sqrt(lists)), 1)}
+
+    @property
+    def probes(self) -> Optional[int]:
+        return self.current.get("probes") if self.current else None
+
+    @property
+    def ef_search(self) -> Optional[int]:
+        return self.current.get("ef_search") if self.current else None
+
+    @property
+    def lists(self) -> Optional[int]:
+        return self.current.get("lists") if self.current else None
+
+    async def row_count(self, conn) -> float:
+        """Planner row estimate, or an exact count while the table has not been analyzed"""
+        rows = await conn.fetchval("SELECT reltuples FROM pg_class WHERE oid = to_regclass($1)", self.table)
+        if rows is None or rows < 0 or rows < self.min_rows:
+            # Small or never-analyzed tables are cheap to count exactly
+            rows = await conn.fetchval(f"SELECT COUNT(*) FROM {self.table}")
+        return float(rows)
+
+    async def refresh(self) -> Optional[Dict[str, Any]]:
+        """Load the parameters of the existing index (recorded in its comment at build time)"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                SELECT am.amname, c.reloptions, obj_description(c.oid, 'pg_class') AS comment, i.indisvalid
+                FROM pg_class c
+                JOIN pg_index i ON i.indexrelid = c.oid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE c.oid = to_regclass($1)
+            """, self.index_name)
+
+        if row is None or not row["indisvalid"]:
+            self.current = None
+            return None
+
+        try:
+            current = json.loads(row["comment"]) if row["comment"] else {}
+        except ValueError:
+            current = {}
+        if "built_rows" not in current:
+            # Index predates the manager (e.g. created on an empty table); parameters come from reloptions
+            options = dict(option.split("=", 1) for option in (row["reloptions"] or []))
+            current = {"method": row["amname"], "column": "embedding", "built_rows": 0,
+                       **{k: int(v) for k, v in options.items() if v.isdigit()}}
+            if row["amname"] == "ivfflat" and "lists" in current:
+                current["probes"] = max(int(math.sqrt(current["lists"])), 1)
+        self.current = current
+        return current
+
+    async def check(self) -> Dict[str, Any]:
+        """
+        Compare the index in place with what the current row count calls for.
+
+        Returns:
+            Dict with rows, current and recommended parameters, and ``action``
+            (``none``, ``build`` or ``rebuild``) with the reason
+        """
+        await self.refresh()
+        async with self.pool.acquire() as conn:
+            rows = await self.row_count(conn)
+        recommended = self.recommend(rows)
+        current = self.current
+        action, reason = "none", None
+
+        if self.opclass is None:
+            # Storage without an ANN operator class (e.g. binary) is searched by scanning
+            pass
+        elif current is None:
+            if rows >= self.min_rows:
+                action, reason = "build", f"{rows:,.0f} rows and no vector index"
+        elif current.get("method") != recommended["method"]:
+            action, reason = "rebuild", f"index type changed to {recommended['method']}"
+        elif current.get("column", "embedding") != self.column:
+            action, reason = "rebuild", f"vector storage moved to column {self.column}"
+        elif rows >= max(current.get("built_rows", 0), 1) * self.drift_factor:
+            action, reason = "rebuild", (f"table grew from {current.get('built_rows', 0):,.0f} "
+                                         f"to {rows:,.0f} rows since the last build")
+        elif recommended["method"] == "hnsw" and current.get("m") != recommended["m"]:
+            action, reason = "rebuild", f"m {current.get('m')} -> {recommended['m']} for {rows:,.0f} rows"
+
+        return {"rows": rows, "current": current, "recommended": recommended, "action": action, "reason": reason}
+
+    async def ensure_index(self, wait: bool = True) -> Dict[str, Any]:
+        """
+        Build or rebuild the index if the row count calls for it.
+
+        With ``wait=False`` the build is scheduled in the background and
+        searches keep using the existing index (or exact scans) meanwhile.
+        """
+        if self._build_task is not None and not self._build_task.done():
+            # A background build is already running; let it finish instead of starting a second one
+            if not wait:
+                return {"action": "none", "reason": "build in progress", "current": self.current}
+            await self._build_task
+
+        status = await self.check()
+        if status["action"] != "none":
+            if wait:
+                await self._build(status["recommended"], status["rows"], status["reason"])
+            else:
+                self.schedule(status["recommended"], status["rows"], status["reason"])
+        return status
+
+    def schedule(self, params: Dict[str, Any], rows: float, reason: str):
+        if self._build_task is None or self._build_task.done():
+            self._build_task = asyncio.create_task(self._build(params, rows, reason))
+
+    async def _build(self, params: Dict[str, Any], rows: float, reason: str) -> Dict[str, Any]:
+        async with self._build_lock:
+            new_name = f"{self.index_name}_new"
+            old_name = f"{self.index_name}_old"
+            if params["method"] == "hnsw":
+                options = f"m = {params['m']}, ef_construction = {params['ef_construction']}"
+            else:
+                options = f"lists = {params['lists']}"
+            params = {**params, "built_rows": rows}
+
+            logger.info(f"Building {self.index_name} ({options}) concurrently: {reason}")
+            start = time.time()
+            async with self.pool.acquire() as conn:
+                await conn.execute(f"SET maintenance_work_mem = '{self.maintenance_work_mem}'")
+                try:
+                    # CONCURRENTLY builds without blocking inserts or searches on the old index
+                    # Leftovers of an interrupted build
+                    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}")
+                    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}")
+                    await conn.execute(f"""
+                        CREATE INDEX CONCURRENTLY {new_name}
+                        ON {self.table} USING {params['method']} ({self.column} {self.opclass})
+                        WITH ({options})
+                    """)
+                    await conn.execute(f"COMMENT ON INDEX {new_name} IS '{json.dumps(params)}'")
+                    # Swap the names in one transaction so searches always have an index, then drop the old one
+                    async with conn.transaction():
+                        await conn.execute(f"ALTER INDEX IF EXISTS {self.index_name} RENAME TO {old_name}")
+                        await conn.execute(f"ALTER INDEX {new_name} RENAME TO {self.index_name}")
+                    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}")
+                finally:
+                    await conn.execute("RESET maintenance_work_mem")
+
+            build = {
+                "index": self.index_name,
+                "params": params,
+                "rows": rows,
+                "reason": reason,
+                "seconds": time.time() - start,
+                "finished_at": time.time()
+            }
+            self.builds.append(build)
+            self.current = params
+            logger.info(f"Built {self.index_name} over {rows:,.0f} rows in {build['seconds']:.2f}s")
+            return build
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Periodically check for drift and rebuild in the background"""
+        interval = interval or float(os.getenv('VECTOR_INDEX_CHECK_INTERVAL', '600'))
+
+        async def watch():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.ensure_index(wait=True)
+                except Exception as e:
+                    logger.error(f"Vector index check failed: {e}")
+
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(watch())
+
+    async def stop(self):
+        for task in (self._watch_task, self._build_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index_name,
+            "current": self.current,
+            "builds": len(self.builds),
+            "last_build_seconds": self.builds[-1]["seconds"] if self.builds else None,
+            "building": bool(self._build_task and not self._build_task.done())
+        }
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+In-memory exact vector search for small Stage 3 knowledge bases
+
+For a few thousand documents one matrix-vector product over the normalized
+embeddings is cheaper than a pgvector round trip, and it is exact. The
+matrix is kept contiguous (float32, or float16 to halve memory), can be
+memory-mapped from VECTOR_MEMORY_PATH so a restart skips re-reading the
+embeddings, and is kept in sync with ``knowledge_embeddings`` by the store's
+upsert path plus a periodic ``updated_at`` catch-up for writes from other
+processes. ``updated_at = NOW()`` is the writer's transaction start, so a
+transaction that commits after a sync can carry an older timestamp than rows
+already seen; each catch-up therefore re-reads the last
+VECTOR_MEMORY_SYNC_OVERLAP seconds and relies on the upsert being idempotent.
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Columns kept next to each matrix row so results need no extra round trip
+ROW_COLUMNS = ("content_id", "title", "content", "category", "intent_types", "tags", "metadata")
+
+class InMemoryVectorIndex:
+    """Exact cosine top-k over a NumPy matrix of the table's normalized embeddings"""
+
+    def __init__(self, dimension: int, table: str = "knowledge_embeddings",
+                 dtype: Optional[str] = None, path: Optional[str] = None,
+                 sync_overlap: Optional[float] = None):
+        self.dimension = dimension
+        self.table = table
+        self.dtype = np.dtype(dtype or os.getenv('VECTOR_MEMORY_DTYPE', 'float32'))
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported VECTOR_MEMORY_DTYPE: {self.dtype}. Must be 'float32' or 'float16'")
+        self.path = path if path is not None else (os.getenv('VECTOR_MEMORY_PATH') or None)
+        # Longer than any writer transaction, or its rows can be missed until the next reload
+        self.sync_overlap = float(sync_overlap if sync_overlap is not None
+                                  else os.getenv('VECTOR_MEMORY_SYNC_OVERLAP', '300'))
+
+        self.matrix = np.empty((0, dimension), dtype=self.dtype)
+        self.size = 0
+        self.positions: Dict[str, int] = {}
+        self.rows: List[Dict[str, Any]] = []
+        self.loaded = False
+        self.synced_at = None
+        self.last_sync = 0.0
+
+        self.searches = 0
+        self.search_time = 0.0
+        self.load_time = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dimension * self.dtype.itemsize
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if self.path:
+            # Build the new file beside the old one so a live mapping is never truncated
+            matrix = np.lib.format.open_memmap(f"{self.path}.tmp", mode='w+', dtype=self.dtype,
+                                               shape=(capacity, self.dimension))
+            os.replace(f"{self.path}.tmp", self.path)
+            return matrix
+        return np.empty((capacity, self.dimension), dtype=self.dtype)
+
+    def _reserve(self, rows: int):
+        """Grow the matrix geometrically so appends stay amortized O(1)"""
+        if rows <= len(self.matrix):
+            return
+        capacity = max(rows, 2 * len(self.matrix), 1024)
+        current = self.matrix[:self.size]
+        matrix = self._allocate(capacity)
+        matrix[:self.size] = current
+        self.matrix = matrix
+
+    def clear(self):
+        self.matrix = np.empty((0, self.dimension), dtype=self.dtype)
+        self.size = 0
+        self.positions.clear()
+        self.rows.clear()
+        self.loaded = False
+        self.synced_at = None
+
+    def upsert(self, rows: List[Dict[str, Any]], embeddings: np.ndarray):
+        """Insert or replace rows by content_id; later duplicates win, as in the table upsert"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        new_ids = {row["content_id"] for row in rows if row["content_id"] not in self.positions}
+        self._reserve(self.size + len(new_ids))
+
+        for row, embedding in zip(rows, embeddings):
+            position = self.positions.get(row["content_id"])
+            if position is None:
+                position = self.size
+                self.positions[row["content_id"]] = position
+                self.rows.append({})
+                self.size += 1
+            self.matrix[position] = embedding
+            self.rows[position] = {column: row.get(column) for column in ROW_COLUMNS}
+
+    async def load(self, conn):
+        """Read every row of the table (or reopen the memory-mapped copy if it is current)"""
+        start = time.time()
+        count, synced_at = await conn.fetchrow(
+            f"SELECT COUNT(*), MAX(updated_at) FROM {self.table} WHERE embedding IS NOT NULL"
+        )
+        self.clear()
+
+        if self._reopen(count, synced_at):
+            rows = await conn.fetch(f"SELECT {', '.join(ROW_COLUMNS[:-1])}, metadata::text AS metadata FROM {self.table}")
+            for row in rows:
+                position = self.positions.get(row["content_id"])
+                if position is not None:
+                    self.rows[position] = dict(row)
+        else:
+            rows = await conn.fetch(f"""
+                SELECT {', '.join(ROW_COLUMNS[:-1])}, metadata::text AS metadata, embedding::real[] AS embedding
+                FROM {self.table} WHERE embedding IS NOT NULL
+            """)
+            if rows:
+                self.upsert([dict(row) for row in rows], np.array([row["embedding"] for row in rows], dtype=np.float32))
+            self.synced_at = synced_at
+            self._save_manifest()
+
+        self.loaded = True
+        self.last_sync = time.time()
+        self.load_time = time.time() - start
+        logger.info(f"Loaded {self.size} embeddings into memory ({self.nbytes / 1024 / 1024:.1f}MB "
+                    f"{self.dtype.name}) in {self.load_time:.2f}s")
+
+    def _reopen(self, count: int, synced_at) -> bool:
+        """Map the matrix file from a previous run when it matches the table's row count and last update"""
+        if not self.path or not os.path.exists(self.path) or not os.path.exists(f"{self.path}.json"):
+            return False
+        try:
+            with open(f"{self.path}.json") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (len(manifest.get("ids", [])) != count or manifest.get("dtype") != self.dtype.name
+                or manifest.get("synced_at") != (synced_at.isoformat() if synced_at else None)):
+            return False
+
+        self.matrix = np.load(self.path, mmap_mode='r+')
+        self.size = count
+        self.positions = {content_id: i for i, content_id in enumerate(manifest["ids"])}
+        self.rows = [{} for _ in range(count)]
+        self.synced_at = synced_at
+        return True
+
+    def _save_manifest(self):
+        if not self.path:
+            return
+        if not isinstance(self.matrix, np.memmap):
+            self._reserve(max(len(self.matrix) + 1, 1))
+        self.matrix.flush()
+        ids = sorted(self.positions, key=self.positions.get)
+        with open(f"{self.path}.json", "w") as f:
+            json.dump({"ids": ids, "dtype": self.dtype.name,
+                       "synced_at": self.synced_at.isoformat() if self.synced_at else None}, f)
+
+    async def sync(self, conn):
+        """Apply rows changed since the last sync; reload if rows were deleted"""
+        rows = await conn.fetch(f"""
+            SELECT {', '.join(ROW_COLUMNS[:-1])}, metadata::text AS metadata,
+                   embedding::real[] AS embedding, updated_at
+            FROM {self.table}
+            WHERE embedding IS NOT NULL
+              AND ($1::timestamp IS NULL OR updated_at > $1::timestamp - make_interval(secs => $2))
+        """, self.synced_at, self.sync_overlap)
+        if rows:
+            self.upsert([dict(row) for row in rows], np.array([row["embedding"] for row in rows], dtype=np.float32))
+            self.synced_at = max([row["updated_at"] for row in rows] + ([self.synced_at] if self.synced_at else []))
+
+        count = await conn.fetchval(f"SELECT COUNT(*) FROM {self.table} WHERE embedding IS NOT NULL")
+        if count != self.size:
+            await self.load(conn)
+            return
+        if rows:
+            self._save_manifest()
+        self.last_sync = time.time()
+
+    def filter_mask(self, category: Optional[str] = None, intent_types: Optional[List[str]] = None,
+                    tags: Optional[List[str]] = None) -> Optional[np.ndarray]:
+        """Boolean mask of rows matching the metadata filters (None: no filter)"""
+        if not (category or intent_types or tags):
+            return None
+        required_intents = set(intent_types or [])
+        required_tags = set(tags or [])
+        return np.fromiter((
+            (not category or row["category"] == category)
+            and required_intents.issubset(row["intent_types"] or [])
+            and required_tags.issubset(row["tags"] or [])
+            for row in self.rows[:self.size]
+        ), dtype=bool, count=self.size)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of ``query`` to every row"""
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        if self.dtype == np.float32:
+            return self.matrix[:self.size] @ query
+        # NumPy has no BLAS path for float16; upcast in cache-sized blocks
+        scores = np.empty(self.size, dtype=np.float32)
+        for start in range(0, self.size, 16384):
+            end = min(start + 16384, self.size)
+            scores[start:end] = self.matrix[start:end].astype(np.float32) @ query
+        return scores
+
+    def search(self, query, k: int = 5, threshold: float = -1.0,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top ``k`` ``(position, similarity)`` pairs above ``threshold``, best first"""
+        start = time.perf_counter()
+        scores = self.scores(query)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        if k < self.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(self.size)
+        top = top[np.argsort(-scores[top])]
+
+        self.searches += 1
+        self.search_time += time.perf_counter() - start
+        return [(int(i), float(scores[i])) for i in top if scores[i] > threshold]
+
+    def search_many(self, queries: np.ndarray, k: int = 5,
+                    threshold: float = -1.0) -> List[List[Tuple[int, float]]]:
+        """``search`` for a batch of queries with one matrix-matrix product"""
+        start = time.perf_counter()
+        queries = np.asarray(queries, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        if self.dtype == np.float32:
+            scores = self.matrix[:self.size] @ queries.T
+        else:
+            scores = np.empty((self.size, len(queries)), dtype=np.float32)
+            for begin in range(0, self.size, 16384):
+                end = min(begin + 16384, self.size)
+                scores[begin:end] = self.matrix[begin:end].astype(np.float32) @ queries.T
+
+        if k < self.size:
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        else:
+            top = np.tile(np.arange(self.size)[:, None], (1, len(queries)))
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        order = np.argsort(-top_scores, axis=0)
+        top = np.take_along_axis(top, order, axis=0)
+        top_scores = np.take_along_axis(top_scores, order, axis=0)
+
+        self.searches += len(queries)
+        self.search_time += time.perf_counter() - start
+        return [[(int(i), float(score)) for i, score in zip(top[:, q], top_scores[:, q]) if score > threshold]
+                for q in range(len(queries))]
+
+    def result_row(self, position: int, similarity: float, include_embedding: bool = False) -> Dict[str, Any]:
+        """Row in the shape the pgvector query returns"""
+        row = {**self.rows[position], "similarity_score": similarity}
+        if include_embedding:
+            row["embedding"] = self.matrix[position].astype(np.float32).tolist()
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "rows": self.size,
+            "dtype": self.dtype.name,
+            "memory_mb": self.nbytes / 1024 / 1024,
+            "memory_mapped": bool(self.path),
+            "searches": self.searches,
+            "avg_search_ms": self.search_time / self.searches * 1000 if self.searches else 0.0
+        }
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Compact embedding storage options for the Stage 3 vector store
+
+The full-precision ``embedding`` column stays the source of truth (and is
+used to re-rank); a compact option adds a smaller column that the ANN index
+and the first ranking pass run on:
+
+- full:   no extra column, index on vector(d)
+- half:   halfvec(d) float16 copy (pgvector >= 0.7), half the index size
+- pca:    vector(r) projection onto the corpus' top principal components
+- binary: bit(d) sign quantization ranked by Hamming distance, then the
+          shortlist is re-ranked with full-precision cosine distance
+"""
+
+import os
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORAGE_OPTIONS = ("full", "half", "pca", "binary")
+
+def _vector_literal(vector) -> str:
+    return '[' + ','.join(f"{float(x):.6g}" for x in vector) + ']'
+
+async def pgvector_version(conn) -> Tuple[int, ...]:
+    version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    return tuple(int(part) for part in version.split('.')) if version else ()
+
+class VectorStorage:
+    """Full-precision storage; base class for the compact options"""
+
+    name = "full"
+    column = "embedding"
+    column_type: Optional[str] = None
+    opclass: Optional[str] = "vector_cosine_ops"
+    default_rerank_factor = 1
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.rerank_factor = int(os.getenv('VECTOR_RERANK_FACTOR', '0')) or self.default_rerank_factor
+        # Set by backfill once no row with an embedding lacks the compact value
+        self.populated = not self.compact
+
+    @property
+    def compact(self) -> bool:
+        return self.column != "embedding"
+
+    @property
+    def fitted(self) -> bool:
+        """Whether ``encode`` can produce compact values (PCA needs a fitted model first)"""
+        return True
+
+    @property
+    def ready(self) -> bool:
+        """Whether searches can rank on the compact column: it is encodable and filled for every row"""
+        return self.fitted and self.populated
+
+    async def add_column(self, conn, table: str):
+        await conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {self.column} {self.column_type}")
+
+    async def initialize(self, conn, table: str):
+        """Add the compact column and fill it for rows stored before it existed"""
+        if self.compact:
+            await self.add_column(conn, table)
+            await self.backfill(conn, table)
+
+    async def prepare(self, conn, table: str, vectors: np.ndarray):
+        """Called with each ingested batch before ``encode``"""
+
+    def encode(self, vectors: np.ndarray) -> List[Optional[str]]:
+        """Text literals for the compact column, one per row"""
+        return [None] * len(vectors)
+
+    def query_param(self, vector) -> Optional[str]:
+        return None
+
+    def distance_sql(self, param: str) -> str:
+        """Ranking expression for the compact column against query parameter ``param``"""
+        return f"{self.column} <=> {param}"
+
+    async def backfill(self, conn, table: str, batch_size: int = 5000) -> int:
+        """Fill the compact column for rows that do not have it yet"""
+        if not self.compact or not self.fitted:
+            return 0
+
+        filled = 0
+        while True:
+            rows = await conn.fetch(f"""
+                SELECT id, embedding::real[] AS embedding FROM {table}
+                WHERE {self.column} IS NULL AND embedding IS NOT NULL
+                LIMIT {batch_size}
+            """)
+            if not rows:
+                self.populated = True
+                if filled:
+                    logger.info(f"Backfilled {self.column} for {filled} rows of {table}")
+                return filled
+            values = self.encode(np.array([row['embedding'] for row in rows], dtype=np.float32))
+            await conn.executemany(
+                f"UPDATE {table} SET {self.column} = $2::text::{self.column_type} WHERE id = $1",
+                [(row['id'], value) for row, value in zip(rows, values)]
+            )
+            filled += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"storage": self.name, "column": self.column, "rerank_factor": self.rerank_factor}
+
+class HalfPrecisionStorage(VectorStorage):
+    """float16 copy of each embedding (pgvector 0.7+)"""
+
+    name = "half"
+    column = "embedding_half"
+    opclass = "halfvec_cosine_ops"
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self.column_type = f"halfvec({dimension})"
+
+    async def initialize(self, conn, table: str):
+        version = await pgvector_version(conn)
+        if version < (0, 7, 0):
+            raise RuntimeError(
+                f"VECTOR_STORAGE=half needs pgvector 0.7.0 or later for halfvec "
+                f"(installed: {'.'.join(map(str, version)) or 'none'})"
+            )
+        await super().initialize(conn, table)
+
+    def encode(self, vectors: np.ndarray) -> List[Optional[str]]:
+        return [_vector_literal(v) for v in vectors.astype(np.float16)]
+
+    def query_param(self, vector) -> Optional[str]:
+        return _vector_literal(vector)
+
+    def distance_sql(self, param: str) -> str:
+        return f"{self.column} <=> {param}::text::halfvec"
+
+class PCAStorage(VectorStorage):
+    """
+    Projection onto the top ``components`` principal components of the corpus.
+
+    The model (mean and components) is fitted on a sample of stored
+    embeddings and saved in ``vector_pca_models`` so every process projects
+    queries the same way.
+    """
+
+    name = "pca"
+    column = "embedding_pca"
+    default_rerank_factor = 10
+
+    def __init__(self, dimension: int, components: Optional[int] = None):
+        super().__init__(dimension)
+        self.components = components or int(os.getenv('VECTOR_PCA_DIMENSIONS', '128'))
+        self.column_type = f"vector({self.components})"
+        self.mean: Optional[np.ndarray] = None
+        self.basis: Optional[np.ndarray] = None
+        self.explained_variance: Optional[float] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.basis is not None
+
+    async def initialize(self, conn, table: str):
+        await self.add_column(conn, table)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS vector_pca_models (
+                name TEXT PRIMARY KEY,
+                dimension INTEGER NOT NULL,
+                components INTEGER NOT NULL,
+                mean REAL[] NOT NULL,
+                basis REAL[] NOT NULL,
+                explained_variance FLOAT,
+                fitted_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        row = await conn.fetchrow("SELECT * FROM vector_pca_models WHERE name = $1", f"{table}.{self.column}")
+        if row and row['dimension'] == self.dimension and row['components'] == self.components:
+            self.mean = np.array(row['mean'], dtype=np.float32)
+            self.basis = np.array(row['basis'], dtype=np.float32).reshape(self.components, self.dimension)
+            self.explained_variance = row['explained_variance']
+
+        # A corpus stored before PCA was enabled is fitted on right away
+        if not self.fitted:
+            await self.fit_from_table(conn, table)
+        await self.backfill(conn, table)
+
+    def fit(self, vectors: np.ndarray) -> bool:
+        """Fit on ``vectors``; needs at least as many rows as components"""
+        if len(vectors) < self.components:
+            return False
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.mean = vectors.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.basis = vt[:self.components].astype(np.float32)
+        variance = singular_values ** 2
+        self.explained_variance = float(variance[:self.components].sum() / variance.sum())
+        logger.info(f"PCA fitted: {self.dimension} -> {self.components} dimensions, "
+                    f"{self.explained_variance:.1%} of variance kept")
+        return True
+
+    async def prepare(self, conn, table: str, vectors: np.ndarray):
+        # Fit once the stored rows plus this batch are enough, then project the
+        # rows written before; refit later with fit_from_table as the corpus grows
+        if not self.fitted:
+            stored = await self.sample(conn, table)
+            if self.fit(np.concatenate([stored, np.asarray(vectors, dtype=np.float32)])):
+                await self.save(conn, table)
+                await self.backfill(conn, table)
+
+    async def sample(self, conn, table: str, sample_size: int = 20000) -> np.ndarray:
+        """Up to ``sample_size`` stored embeddings, chosen at random"""
+        rows = await conn.fetch(f"""
+            SELECT embedding::real[] AS embedding FROM {table}
+            WHERE embedding IS NOT NULL ORDER BY random() LIMIT {int(sample_size)}
+        """)
+        return np.array([row['embedding'] for row in rows], dtype=np.float32).reshape(-1, self.dimension)
+
+    async def fit_from_table(self, conn, table: str, sample_size: int = 20000) -> bool:
+        """(Re)fit on a sample of the table and re-project every row with the new model"""
+        if not self.fit(await self.sample(conn, table, sample_size)):
+            return False
+        await self.save(conn, table)
+        # Rows projected with a previous model must be re-projected
+        self.populated = False
+        await conn.execute(f"UPDATE {table} SET {self.column} = NULL WHERE {self.column} IS NOT NULL")
+        await self.backfill(conn, table)
+        return True
+
+    async def save(self, conn, table: str):
+        await conn.execute("""
+            INSERT INTO vector_pca_models (name, dimension, components, mean, basis, explained_variance)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (name) DO UPDATE SET
+                dimension = EXCLUDED.dimension, components = EXCLUDED.components,
+                mean = EXCLUDED.mean, basis = EXCLUDED.basis,
+                explained_variance = EXCLUDED.explained_variance, fitted_at = NOW()
+        """, f"{table}.{self.column}", self.dimension, self.components,
+            self.mean.tolist(), self.basis.ravel().tolist(), self.explained_variance)
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.basis.T
+
+    def encode(self, vectors: np.ndarray) -> List[Optional[str]]:
+        if not self.fitted:
+            # These rows are written without a projection; prepare backfills them after the fit
+            self.populated = False
+            return [None] * len(vectors)
+        return [_vector_literal(v) for v in self.project(vectors)]
+
+    def query_param(self, vector) -> Optional[str]:
+        return _vector_literal(self.project(np.asarray([vector]))[0])
+
+    def distance_sql(self, param: str) -> str:
+        return f"{self.column} <=> {param}::text::vector"
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "components": self.components, "explained_variance": self.explained_variance}
+
+class BinaryQuantizedStorage(VectorStorage):
+    """
+    One sign bit per dimension, ranked by Hamming distance.
+
+    pgvector 0.6 has no index for bit columns, so the first pass scans the
+    compact column (d/8 bytes per row instead of 4*d) and only the shortlist
+    is re-ranked against the full-precision vectors.
+    """
+
+    name = "binary"
+    column = "embedding_bits"
+    opclass = None
+    default_rerank_factor = 20
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self.column_type = f"bit({dimension})"
+
+    def encode(self, vectors: np.ndarray) -> List[Optional[str]]:
+        bits = (np.asarray(vectors) > 0).astype(np.uint8)
+        return [''.join('1' if b else '0' for b in row) for row in bits]
+
+    def query_param(self, vector) -> Optional[str]:
+        return self.encode(np.asarray([vector]))[0]
+
+    def distance_sql(self, param: str) -> str:
+        return f"bit_count({self.column} # {param}::text::bit({self.dimension}))"
+
+def create_vector_storage(name: Optional[str] = None, dimension: int = 384) -> VectorStorage:
+    """Storage option selected by ``name`` or VECTOR_STORAGE (default ``full``)"""
+    name = (name or os.getenv('VECTOR_STORAGE', 'full')).lower()
+    if name == "full":
+        return VectorStorage(dimension)
+    if name == "half":
+        return HalfPrecisionStorage(dimension)
+    if name == "pca":
+        return PCAStorage(dimension)
+    if name == "binary":
+        return BinaryQuantizedStorage(dimension)
+    raise ValueError(f"Unsupported VECTOR_STORAGE: {name}. Must be one of {', '.join(STORAGE_OPTIONS)}")
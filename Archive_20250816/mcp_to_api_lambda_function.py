@@ -1,7 +1,89 @@
 import json
+import sys
+import asyncio
 import urllib3
 import os
 
+# The query guard is shared with AgentCore; update_lambda.py packages it next to this file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "AgentCore", "src", "tools"))
+from tacnode_query_guard import GuardDecision, QueryGuard
+
+TACNODE_MCP_URL = "https://mcp-server.tacnode.io/mcp"
+
+# Query guard: agent-generated SQL gets a row cap and an EXPLAIN cost ceiling
+QUERY_GUARD = os.environ.get('QUERY_GUARD', 'reject').lower()  # reject, rewrite or off
+MAX_ROWS = int(os.environ.get('MAX_ROWS', '1000'))
+MAX_QUERY_COST = float(os.environ.get('MAX_QUERY_COST', '1000000'))
+
+# Module level, so cached EXPLAIN results survive across invocations on a warm container
+query_guard = QueryGuard(
+    max_rows=MAX_ROWS, max_cost=MAX_QUERY_COST, on_expensive=QUERY_GUARD, cache_ttl_seconds=300
+) if QUERY_GUARD != 'off' else None
+
+def call_tacnode_query(http, tacnode_token, sql):
+    """Run one statement through the TACNode MCP `query` tool; returns (status, parsed response or error text)"""
+    mcp_payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "tools/call",
+        "params": {
+            "name": "query",
+            "arguments": {"sql": sql}
+        }
+    }
+    
+    response = http.request(
+        'POST',
+        TACNODE_MCP_URL,
+        body=json.dumps(mcp_payload),
+        headers={
+            'Authorization': f'Bearer {tacnode_token}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json, text/event-stream'
+        }
+    )
+    
+    if response.status != 200:
+        return response.status, response.data.decode("utf-8")
+    
+    # Parse TACNode MCP response (handles SSE format)
+    response_text = response.data.decode('utf-8').strip()
+    if response_text.startswith('event: message\ndata: '):
+        # Parse SSE format
+        json_data = response_text.replace('event: message\ndata: ', '')
+        return 200, json.loads(json_data)
+    # Parse direct JSON
+    return 200, json.loads(response_text)
+
+class MCPQueryClient:
+    """``execute_query`` over the TACNode MCP `query` tool, as QueryGuard expects for its EXPLAINs"""
+    
+    def __init__(self, http, tacnode_token):
+        self.http = http
+        self.tacnode_token = tacnode_token
+    
+    async def execute_query(self, sql, parameters=None):
+        try:
+            status, result = call_tacnode_query(self.http, self.tacnode_token, sql)
+            if status != 200 or 'result' not in result or result['result'].get('isError'):
+                return {"success": False, "error": f"TACNode MCP error: {status} - {result}", "data": []}
+            return {"success": True, "data": json.loads(result['result']['content'][0]['text'])}
+        except Exception as e:
+            return {"success": False, "error": str(e), "data": []}
+
+def guard_sql(http, tacnode_token, sql):
+    """
+    Bound an agent-generated statement before it reaches TACNode.
+    
+    Returns the QueryGuard decision: read statements get LIMIT MAX_ROWS (or
+    have a larger LIMIT clamped); statements whose EXPLAIN cost exceeds
+    MAX_QUERY_COST are rejected, or with QUERY_GUARD=rewrite have their LIMIT
+    tightened until the plan fits.
+    """
+    if query_guard is None:
+        return GuardDecision(True, sql)
+    return asyncio.run(query_guard.check(MCPQueryClient(http, tacnode_token), sql))
+
 def lambda_handler(event, context):
     """Translate MCP calls to TACNode API calls"""
     
@@ -35,42 +117,44 @@ def lambda_handler(event, context):
             if tool_name == "executeQuery":
                 # Execute SQL query via TACNode API
                 sql = arguments.get('sql')
-                
-                # Call TACNode MCP endpoint (since TACNode only provides MCP, not separate API)
-                mcp_url = "https://mcp-server.tacnode.io/mcp"
-                mcp_payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "tools/call",
-                    "params": {
-                        "name": "query",
-                        "arguments": {"sql": sql}
+                if not isinstance(sql, str) or not sql.strip():
+                    mcp_error = {
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "error": {
+                            "code": -32602,
+                            "message": "Invalid params: executeQuery requires a non-empty 'sql' string"
+                        }
                     }
-                }
-                
-                response = http.request(
-                    'POST',
-                    mcp_url,
-                    body=json.dumps(mcp_payload),
-                    headers={
-                        'Authorization': f'Bearer {tacnode_token}',
-                        'Content-Type': 'application/json',
-                        'Accept': 'application/json, text/event-stream'
+                    return {
+                        'statusCode': 200,
+                        'headers': {'Content-Type': 'application/json'},
+                        'body': json.dumps(mcp_error)
                     }
-                )
-                
-                if response.status == 200:
-                    # Parse TACNode MCP response (handles SSE format)
-                    response_text = response.data.decode('utf-8').strip()
-
-                    if response_text.startswith('event: message\ndata: '):
-                        # Parse SSE format
-                        json_data = response_text.replace('event: message\ndata: ', '')
-                        tacnode_mcp_response = json.loads(json_data)
-                    else:
-                        # Parse direct JSON
-                        tacnode_mcp_response = json.loads(response_text)
 
+                decision = guard_sql(http, tacnode_token, sql)
+                sql, guard_reason = decision.query, decision.reason
+                if not decision.allowed:
+                    print(f"Query guard: {guard_reason}")
+                    # Returned as a tool error so the agent can reformulate the query
+                    mcp_response = {
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "result": {
+                            "content": [{"type": "text", "text": guard_reason}],
+                            "isError": True
+                        }
+                    }
+                    return {
+                        'statusCode': 200,
+                        'headers': {'Content-Type': 'application/json'},
+                        'body': json.dumps(mcp_response)
+                    }
+                
+                # Call TACNode MCP endpoint (since TACNode only provides MCP, not separate API)
+                status, tacnode_mcp_response = call_tacnode_query(http, tacnode_token, sql)
+                
+                if status == 200:
                     # Forward TACNode MCP response
                     if 'result' in tacnode_mcp_response:
                         mcp_response = {
@@ -78,6 +162,10 @@ def lambda_handler(event, context):
                             "id": request_id,
                             "result": tacnode_mcp_response['result']
                         }
+                        if guard_reason:
+                            mcp_response['result'].setdefault('content', []).append(
+                                {"type": "text", "text": f"Query guard: {guard_reason}"}
+                            )
                     else:
                         # Forward error from TACNode
                         mcp_response = tacnode_mcp_response
@@ -88,7 +176,7 @@ def lambda_handler(event, context):
                         'body': json.dumps(mcp_response)
                     }
                 else:
-                    error_msg = f'TACNode MCP error: {response.status} - {response.data.decode("utf-8")}'
+                    error_msg = f'TACNode MCP error: {status} - {tacnode_mcp_response}'
                     mcp_error = {
                         "jsonrpc": "2.0",
                         "id": request_id,
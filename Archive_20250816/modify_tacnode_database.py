@@ -56,6 +56,7 @@ class TACNodeDatabaseModifier:
         print("   Note: In production, this would call TACNode MCP server")
         print("   to execute: INSERT INTO test (name, description, value, category, created_date, is_active)")
         print(f"   VALUES ('{name}', '{description}', {value}, '{category}', NOW(), true)")
+        self.announce_change("INSERT")
     
     def update_record_value(self, record_id, new_value):
         """Update a record's value"""
@@ -66,6 +67,13 @@ class TACNodeDatabaseModifier:
         print("✅ Record updated successfully (simulated)")
         print("   Note: In production, this would call TACNode MCP server")
         print(f"   to execute: UPDATE test SET value = {new_value} WHERE id = {record_id}")
+        self.announce_change("UPDATE")
+    
+    def announce_change(self, operation):
+        """Describe the change event agent caches rely on for invalidation"""
+        print("   Change feed: the tacnode_change_notify trigger on 'test' publishes")
+        print(f"   {{\"table\": \"test\", \"operation\": \"{operation}\"}} on channel 'tacnode_changes'")
+        print("   (HTTP-only agents see it on their next watermark poll)")
     
     def simulate_business_scenarios(self):
         """Simulate different business scenarios"""
@@ -14,6 +14,8 @@ def update_lambda():
     # Create deployment package
     with zipfile.ZipFile('tacnode-mcp-to-api-proxy-updated.zip', 'w') as zip_file:
         zip_file.write('mcp_to_api_lambda_function.py', 'lambda_function.py')
+        # Shared query guard imported by the handler
+        zip_file.write('AgentCore/src/tools/tacnode_query_guard.py', 'tacnode_query_guard.py')
     
     print("✅ Deployment package created")
     